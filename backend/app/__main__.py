@@ -0,0 +1,12 @@
+# __main__.py - Sobe a API: python -m app
+#
+# Preferível a python -m app.main: os workers do pool de PDF (spawn) reimportam o
+# módulo principal do processo pai, exceto quando ele é o __main__ de um pacote.
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+if __name__ == "__main__":
+    load_dotenv()
+    uvicorn.run("app.main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -1,21 +1,88 @@
 # main.py - FastAPI Backend
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing, asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
+import json
 import os
-import tempfile
 import base64
-import requests
+import time
+import uuid
 from dotenv import load_dotenv
 
-from app.services.chatgpt import analyze_with_chatgpt
-from app.services.parse import parse_chatgpt_response
-from app.services.pdf import make_clinic_pdf
-
+# Antes dos serviços: eles leem as variáveis de ambiente no import (constantes de módulo)
 load_dotenv()
 
-app = FastAPI(title="GlowMetrics Analysis API")
+from app.services.cache import AnalysisCache, make_cache_key
+from app.services.coalesce import IDEMPOTENCY_KEY_MAX_LENGTH, SingleFlight, make_request_key
+from app.services.concurrency import as_completed_bounded
+from app.services.chatgpt import (
+    OPENAI_REPAIR_MODEL,
+    PROMPT_VERSION,
+    analyze_with_chatgpt,
+    backend_latency,
+    get_backend,
+    repair_model_output,
+)
+from app.services.downloads import close_download_client, init_download_client
+from app.services.export import EXPORT_CONCURRENCY, EXPORT_MAX_ITEMS, stream_zip_export
+from app.services.image_cache import ImageCache
+from app.services.images import preprocess_image, preprocess_settings
+from app.services.logs import bind_request_id, configure_logging, get_logger, reset_request_id
+from app.services.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_DURATION, HTTP_REQUESTS, IN_FLIGHT, REGISTRY,
+    add_bytes, cache_collector, gauge_collector, stage
+)
+from app.services.jobs import (
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS,
+    JobQueue, JobStore, QueueFullError
+)
+from app.services.openai_client import close_openai_client, get_openai_client, init_openai_client, pool_stats
+from app.services.parse import ModelOutputError, parse_chatgpt_response
+from app.services.pdf import PDF_TEMPLATE_VERSION, PHOTO_BOX_PT, UNDATED, format_report_date
+from app.services.pdf_cache import PdfCache, make_pdf_cache_key
+from app.services.profiling import PROFILE_HEADER, profiles
+from app.services.progress import bind_progress, progress_streams, report, reset_progress
+from app.services.pdf_images import PrintImageCache
+from app.services.render_pool import RenderPoolBusy, render_pool
+from app.services.uploads import vision_files
+
+configure_logging()
+log = get_logger("api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        init_openai_client()
+    except Exception as e:
+        # Sem token a API ainda sobe; as análises falham com a mensagem de erro
+        log.warning("Cliente OpenAI não inicializado", extra={"reason": str(e)})
+    init_download_client()
+    # Diretórios e índices dos caches: no startup, não no import do app
+    for cache in (analysis_cache, image_cache, print_images, pdf_cache):
+        await asyncio.to_thread(cache.open)
+    await render_pool.start()
+    await analysis_jobs.start()
+    janitors = [
+        asyncio.create_task(vision_files.run_janitor(get_openai_client)),
+        asyncio.create_task(analysis_jobs.run_janitor()),
+    ]
+    try:
+        yield
+    finally:
+        for janitor in janitors:
+            janitor.cancel()
+        await analysis_jobs.stop()
+        await close_openai_client()
+        await close_download_client()
+        await render_pool.stop()
+
+app = FastAPI(title="GlowMetrics Analysis API", lifespan=lifespan)
 
 # CORS
 frontend_urls = [
@@ -52,127 +119,731 @@ else:
         expose_headers=["*"],
     )
 
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """cProfile opcional das rotas da API: header X-Profile com o ADMIN_TOKEN ou PROFILE_SAMPLE_RATE"""
+    path = request.url.path
+    trigger = None
+    if path.startswith("/api/") and not path.startswith("/api/admin/"):
+        trigger = profiles.should_profile(request.headers.get(PROFILE_HEADER))
+    if trigger is None:
+        return await call_next(request)
+    
+    capture, token = profiles.begin(request.method, path, trigger, IN_FLIGHT.value(operation="http") - 1)
+    if capture is None:
+        # Outra captura em andamento (cProfile é um por thread)
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        end_profile(capture, token, 500)
+        raise
+    response.headers["X-Profile-Id"] = capture.id
+    # call_next retorna antes do corpo: StreamingResponse (lote NDJSON, ZIP, SSE) faz o
+    # trabalho enquanto envia, então a captura só termina depois do último chunk
+    response.body_iterator = profile_body(response.body_iterator, capture, token, response.status_code)
+    return response
+
+def end_profile(capture, token, status):
+    profiles.end(capture, token, status)
+    log.info("Perfil capturado", extra=capture.summary())
+
+async def profile_body(body_iterator, capture, token, status):
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        end_profile(capture, token, status)
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """Request id (X-Request-ID recebido ou gerado) nos logs + métricas HTTP por rota"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = bind_request_id(request_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        with IN_FLIGHT.track(operation="http"):
+            response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        # Template da rota (/api/analyze/{job_id}), não o caminho: cardinalidade baixa
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        elapsed = time.perf_counter() - start
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        HTTP_DURATION.observe(elapsed, route=route, method=request.method)
+        if route != "/metrics":
+            log.info("Requisição HTTP", extra={
+                "method": request.method, "route": route, "status": status,
+                "duration_ms": round(elapsed * 1000, 1)
+            })
+        reset_request_id(token)
+
 class AnalysisRequest(BaseModel):
     before_image_url: str
     after_image_url: str
     procedures: List[str] = []
+    # Ignora o cache de resultados (a nova análise ainda atualiza o cache)
+    bypass_cache: bool = False
+
+class BatchItem(AnalysisRequest):
+    # Identificador do item, único no lote (chave para retomar)
+    id: str
+
+class BatchAnalysisRequest(BaseModel):
+    # Reenviar com o mesmo batch_id retoma o lote: itens já concluídos não são reanalisados
+    batch_id: Optional[str] = None
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+
+PDF_FILENAME = "glowmetrics-relatorio.pdf"
+REPORT_FILENAME = "glowmetrics-evolucao.pdf"
+EXPORT_FILENAME = "glowmetrics-relatorios.zip"
+REPORT_MAX_SESSIONS = int(os.getenv("REPORT_MAX_SESSIONS", "24"))
 
 class PDFRequest(BaseModel):
     before_url: str
     after_url: str
     analysis_results: dict
+    # Data impressa no header; padrão = "analyzed_at" da análise (mesmo PDF em novos downloads).
+    # Sem nenhuma das duas, o PDF sai sem data.
+    generated_at: Optional[datetime] = None
+
+class ExportItem(BaseModel):
+    before_url: str
+    after_url: str
+    analysis_results: dict
+    # Nome do PDF dentro do ZIP (padrão: relatorio-001.pdf, ...)
+    filename: Optional[str] = None
+    generated_at: Optional[datetime] = None
+
+class ExportRequest(BaseModel):
+    items: List[ExportItem]
+
+class ReportSession(BaseModel):
+    before_url: str
+    after_url: str
+    analysis_results: dict
+    # Rótulo exibido na página da sessão (ex.: data do atendimento)
+    label: Optional[str] = None
+
+class PatientReportRequest(BaseModel):
+    patient_name: Optional[str] = None
+    # Em ordem cronológica
+    sessions: List[ReportSession]
 
-def download_image(url: str) -> str:
-    """Baixa imagem de URL e salva temporariamente"""
-    if not url or url.strip() == "":
-        raise ValueError(f"URL vazia ou inválida: '{url}'")
+analysis_cache = AnalysisCache()
+image_cache = ImageCache()
+print_images = PrintImageCache()
+pdf_cache = PdfCache()
+analysis_flights = SingleFlight()
+
+# Hit ratio dos caches e filas, lidos dos stats() de cada serviço a cada scrape
+REGISTRY.add_collector(cache_collector({
+    "analysis": analysis_cache.stats,
+    "image": image_cache.stats,
+    "vision_upload": lambda: {"hits": vision_files.hits, "misses": vision_files.uploads},
+    "print_image": print_images.stats,
+    "pdf": pdf_cache.stats,
+}))
+REGISTRY.add_collector(gauge_collector(
+    "glowmetrics_job_queue_pending", "Jobs de análise aguardando worker", lambda: analysis_jobs.pending_count()
+))
+
+async def execute_analysis(request: AnalysisRequest) -> dict:
+    """Executa o pipeline completo: download → cache → ChatGPT → parse"""
+    log.info("Análise iniciada", extra={
+        "before_url": request.before_image_url[:80],
+        "after_url": request.after_image_url[:80],
+        "procedures": request.procedures,
+        "bypass_cache": request.bypass_cache
+    })
+    
+    # Baixar imagens (em paralelo, via cache local com revalidação)
+    with stage("analysis", "download") as fields:
+        before_data, after_data = await image_cache.fetch_pair(
+            request.before_image_url,
+            request.after_image_url
+        )
+        fields.update(before_bytes=len(before_data), after_bytes=len(after_data))
+    add_bytes("image_download", len(before_data) + len(after_data))
+    report("download", before_bytes=len(before_data), after_bytes=len(after_data))
+    
+    # Cache por conteúdo: mesmas fotos + procedimentos não pagam outro run
+    backend = get_backend()
+    cache_key = make_cache_key(
+        before_data,
+        after_data,
+        request.procedures,
+        backend.model_id,
+        PROMPT_VERSION,
+        extra=preprocess_settings()
+    )
+    if not request.bypass_cache:
+        with stage("analysis", "cache_lookup") as fields:
+            cached, tier = await analysis_cache.get(cache_key)
+            fields["tier"] = tier
+        if cached is not None:
+            report("cache_hit", tier=tier)
+            return {**cached, "cache": "HIT", "cache_tier": tier}
+    
+    # Reduzir e recomprimir antes do upload (CPU-bound: roda em thread)
+    with stage("analysis", "preprocess") as fields:
+        before_image, after_image = await asyncio.gather(
+            run_in_threadpool(preprocess_image, before_data),
+            run_in_threadpool(preprocess_image, after_data)
+        )
+        fields.update(before_bytes=len(before_image), after_bytes=len(after_image))
+    report("preprocess", before_bytes=len(before_image), after_bytes=len(after_image))
+    
+    # Analisar com ChatGPT
+    with stage("analysis", "model", backend=backend.name) as fields:
+        response_text = await analyze_with_chatgpt(
+            before_image,
+            after_image,
+            request.procedures,
+            backend=backend.name
+        )
+        fields["response_chars"] = len(response_text)
+    add_bytes("model_response", len(response_text.encode("utf-8")))
+    report("model_response", chars=len(response_text))
+    
+    # Parsear resposta; sem JSON válido, um reparo barato (só texto) em vez de refazer o run
+    parse_error = None
+    with stage("analysis", "parse") as fields:
+        try:
+            analysis_results = parse_chatgpt_response(response_text)
+        except ModelOutputError as e:
+            parse_error = fields["parse_error"] = str(e)
+    if parse_error is not None:
+        if not OPENAI_REPAIR_MODEL:
+            raise Exception(f"Erro ao processar resposta: {parse_error}")
+        report("repair", error=parse_error)
+        repaired_text = await repair_model_output(response_text, parse_error)
+        try:
+            analysis_results = parse_chatgpt_response(repaired_text)
+        except ModelOutputError as e:
+            raise Exception(f"Erro ao processar resposta (após reparo): {e}")
+    report("parse")
+    # Data da análise: viaja com o resultado (e o cache) e vira a data impressa no PDF
+    analysis_results["analyzed_at"] = datetime.now().astimezone().isoformat(timespec="seconds")
+    
+    result = {
+        "analysis": analysis_results,
+        "raw_response": response_text
+    }
+    if parse_error is not None:
+        result["repaired"] = True
+    await analysis_cache.set(cache_key, result)
+    return {**result, "cache": "BYPASS" if request.bypass_cache else "MISS"}
+
+async def run_analysis(request: AnalysisRequest) -> dict:
+    """Pipeline com single-flight: pedidos idênticos simultâneos aguardam a mesma execução
+
+    Retorna uma cópia do resultado; quem reaproveitou uma execução em andamento
+    recebe também "coalesced": True.
+    """
+    key = make_request_key(
+        request.before_image_url,
+        request.after_image_url,
+        request.procedures,
+        request.bypass_cache
+    )
+    if key in analysis_flights:
+        log.info("Análise idêntica em andamento: aguardando o mesmo resultado")
+        report("coalesced")
+    
+    async def execute():
+        with IN_FLIGHT.track(operation="analysis"):
+            return await execute_analysis(request)
     
+    result, shared = await analysis_flights.run(key, execute)
+    if shared:
+        return {**result, "coalesced": True}
+    return {**result}
+
+async def run_analysis_job(job_id: str, payload: dict) -> dict:
+    """Handler dos workers da fila; as etapas vão para o stream de progresso do job"""
+    tracker = progress_streams.get_or_create(job_id)
+    token = bind_progress(tracker)
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Criar arquivo temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            tmp.write(response.content)
-            file_path = tmp.name
-            return file_path
+        report("started")
+        result = await run_analysis(AnalysisRequest(**payload))
     except Exception as e:
+        report("failed", error=f"Erro na análise: {str(e)}")
         raise
+    else:
+        report("completed", cache=result["cache"])
+        return result
+    finally:
+        reset_progress(token)
+
+analysis_jobs = JobQueue(JobStore(), handler=run_analysis_job)
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
 
 @app.post("/api/analyze")
-async def analyze_images(request: AnalysisRequest):
-    """Analisa imagens usando ChatGPT"""
-    before_path = None
-    after_path = None
+async def analyze_images(
+    request: AnalysisRequest,
+    async_mode: bool = Query(False, alias="async"),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Analisa imagens usando ChatGPT
+
+    Com ?async=true a análise é enfileirada e a resposta (202) traz o job_id
+    para acompanhar em GET /api/analyze/{job_id}.
+
+    Com o header Idempotency-Key, repetir a chamada devolve a resposta já entregue
+    (header Idempotent-Replayed: true) em vez de analisar de novo: o resultado no
+    modo síncrono, o mesmo job no modo assíncrono. Falhas não são guardadas.
+    """
+    store = analysis_jobs.store
+    request_key = make_request_key(
+        request.before_image_url,
+        request.after_image_url,
+        request.procedures,
+        request.bypass_cache,
+        async_mode=async_mode
+    )
+    if idempotency_key is not None:
+        if not idempotency_key.strip() or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Idempotency-Key deve ter entre 1 e {IDEMPOTENCY_KEY_MAX_LENGTH} caracteres"
+            )
+        stored = await asyncio.to_thread(store.idempotent_response, idempotency_key)
+        if stored is not None:
+            if stored["request_key"] != request_key:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key já utilizada com outra requisição"
+                )
+            log.info("Resposta reaproveitada por Idempotency-Key", extra={"idempotency_key": idempotency_key[:80]})
+            return JSONResponse(
+                status_code=stored["status_code"],
+                content=stored["response"],
+                headers={"Idempotent-Replayed": "true"}
+            )
+    
+    if async_mode:
+        try:
+            job_id = await analysis_jobs.submit(request.model_dump())
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        progress_streams.get_or_create(job_id).emit("queued")
+        log.info("Análise enfileirada", extra={"job_id": job_id})
+        content = {
+            "success": True,
+            "job_id": job_id,
+            "status": "pending",
+            "status_url": f"/api/analyze/{job_id}",
+            "events_url": f"/api/analyze/{job_id}/events"
+        }
+        if idempotency_key is not None:
+            await asyncio.to_thread(store.save_idempotent, idempotency_key, request_key, 202, content)
+        return JSONResponse(status_code=202, content=content)
+    
     try:
-        print(f"📥 Recebida requisição de análise")
-        print(f"   Before URL: {request.before_image_url[:50] if request.before_image_url else 'VAZIA'}...")
-        print(f"   After URL: {request.after_image_url[:50] if request.after_image_url else 'VAZIA'}...")
-        print(f"   Procedimentos: {request.procedures}")
-        
-        # Baixar imagens
-        print("⬇️ Baixando imagens...")
-        before_path = download_image(request.before_image_url)
-        print(f"   ✓ Before salvo em: {before_path}")
-        after_path = download_image(request.after_image_url)
-        print(f"   ✓ After salvo em: {after_path}")
-        
-        # Analisar com ChatGPT
-        print("🤖 Iniciando análise com ChatGPT...")
-        response_text = analyze_with_chatgpt(
-            before_path,
-            after_path,
-            request.procedures
-        )
-        print(f"   ✓ Resposta recebida ({len(response_text)} chars)")
-        
-        # Parsear resposta
-        print("📊 Parseando resposta...")
-        analysis_results = parse_chatgpt_response(response_text)
-        print("   ✓ Análise parseada com sucesso")
-        
-        return {
+        result = await run_analysis(request)
+        headers = {"X-Analysis-Cache": result["cache"]}
+        if result.get("cache_tier"):
+            headers["X-Analysis-Cache-Tier"] = result["cache_tier"]
+        if result.get("coalesced"):
+            headers["X-Analysis-Coalesced"] = "true"
+        content = {
             "success": True,
-            "analysis": analysis_results,
-            "raw_response": response_text
+            **result
         }
+        if idempotency_key is not None:
+            await asyncio.to_thread(store.save_idempotent, idempotency_key, request_key, 200, content)
+        return JSONResponse(content=content, headers=headers)
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ ERRO na análise:")
-        print(f"   Tipo: {type(e).__name__}")
-        print(f"   Mensagem: {str(e)}")
-        print(f"   Traceback:\n{error_trace}")
+        log.exception("Erro na análise", extra={"error": type(e).__name__})
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
-    finally:
-        # Limpar arquivos temporários
-        if before_path and os.path.exists(before_path):
-            try:
-                os.remove(before_path)
-            except:
-                pass
-        if after_path and os.path.exists(after_path):
-            try:
-                os.remove(after_path)
-            except:
-                pass
 
-@app.post("/api/generate-pdf")
-async def generate_pdf(request: PDFRequest):
-    """Gera PDF a partir dos resultados da análise"""
-    try:
-        # Baixar imagens
-        before_path = download_image(request.before_url)
-        after_path = download_image(request.after_url)
+def _ndjson(data):
+    return json.dumps(data, ensure_ascii=False) + "\n"
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Analisa vários pares antes/depois e transmite cada resultado como uma linha NDJSON
+
+    Cada item vira {"type": "item", "id", "status": "completed" | "failed", ...} assim que
+    termina (ordem de término); a última linha é {"type": "summary", ...}. O desfecho de
+    cada item fica no ledger do lote: repetir a chamada com o mesmo batch_id (também no
+    header X-Batch-Id) devolve os concluídos sem reanalisar e tenta de novo os que falharam.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Informe ao menos um item")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_ITEMS} itens por lote")
+    item_ids = [item.id for item in request.items]
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(status_code=400, detail="Os ids dos itens devem ser únicos no lote")
+    
+    batch_id = request.batch_id or uuid.uuid4().hex
+    concurrency = max(1, min(request.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    store = analysis_jobs.store
+    finished = await asyncio.to_thread(store.batch_items, batch_id)
+    todo = [item for item in request.items if finished.get(item.id, {}).get("status") != "completed"]
+    log.info("Lote recebido", extra={
+        "batch_id": batch_id, "items": len(request.items),
+        "already_completed": len(request.items) - len(todo), "concurrency": concurrency
+    })
+    
+    async def stream():
+        counts = {"completed": 0, "failed": 0, "resumed": 0}
+        for item in request.items:
+            previous = finished.get(item.id)
+            if previous and previous["status"] == "completed":
+                counts["completed"] += 1
+                counts["resumed"] += 1
+                yield _ndjson({
+                    "type": "item", "batch_id": batch_id, "id": item.id,
+                    "status": "completed", "resumed": True, **previous["result"]
+                })
         
-        # Criar PDF temporário
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            pdf_path = tmp.name
+        async with aclosing(as_completed_bounded(todo, run_analysis, concurrency)) as results:
+            async for _, item, result, error, elapsed in results:
+                line = {"type": "item", "batch_id": batch_id, "id": item.id, "elapsed_ms": round(elapsed * 1000, 1)}
+                if error is None:
+                    outcome = {"analysis": result["analysis"], "cache": result["cache"]}
+                    await asyncio.to_thread(
+                        store.record_batch_item, batch_id, item.id, "completed", result=outcome
+                    )
+                    counts["completed"] += 1
+                    line.update(status="completed", **outcome)
+                else:
+                    message = f"Erro na análise: {str(error)}"
+                    log.warning("Item do lote falhou", extra={
+                        "batch_id": batch_id, "item_id": item.id, "error": type(error).__name__, "reason": str(error)
+                    })
+                    await asyncio.to_thread(
+                        store.record_batch_item, batch_id, item.id, "failed", error_message=message
+                    )
+                    counts["failed"] += 1
+                    line.update(status="failed", error=message)
+                yield _ndjson(line)
         
-        # Gerar PDF
-        make_clinic_pdf(
-            before_path,
-            after_path,
-            request.analysis_results,
-            pdf_path
-        )
+        yield _ndjson({"type": "summary", "batch_id": batch_id, "total": len(request.items), **counts})
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id}
+    )
+
+@app.get("/api/analyze/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Consulta o status de uma análise enfileirada"""
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    response = {
+        "success": job["status"] != "failed",
+        "job_id": job["id"],
+        "status": job["status"],
+        "created_at": _iso(job["created_at"]),
+        "started_at": _iso(job["started_at"]),
+        "completed_at": _iso(job["completed_at"]),
+        "error_message": job["error_message"]
+    }
+    if job["status"] == "completed" and job["result"]:
+        response.update(job["result"])
+    return response
+
+def _sse(event):
+    return f"id: {event['id']}\nevent: {event['stage']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.get("/api/analyze/{job_id}/events")
+async def stream_analysis_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Progresso de uma análise enfileirada via Server-Sent Events
+
+    Cada etapa do pipeline (queued, download, preprocess, upload, run_status,
+    model_response, parse, ...) vira um evento; o stream termina em "completed" ou
+    "failed". Reconexões com Last-Event-ID retomam a partir do evento seguinte.
+    """
+    tracker = progress_streams.get(job_id)
+    if tracker is None:
+        job = await analysis_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job não encontrado")
+        # Job de antes de um restart (ou histórico já expirado): só o estado final
+        tracker = progress_streams.get_or_create(job_id)
+        if job["status"] == "completed":
+            tracker.emit("completed")
+        elif job["status"] == "failed":
+            tracker.emit("failed", error=job["error_message"])
+    
+    try:
+        after = int(last_event_id) if last_event_id is not None else -1
+    except ValueError:
+        after = -1
+    
+    async def stream():
+        # Reconexão automática do EventSource em 3 s se a conexão cair
+        yield "retry: 3000\n\n"
+        async with aclosing(tracker.follow(after=after)) as events:
+            async for event in events:
+                yield _sse(event) if event is not None else ": ping\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def analysis_date(analysis_results):
+    """"analyzed_at" gravado pela análise (None se ausente ou inválido)"""
+    try:
+        return datetime.fromisoformat(analysis_results["analyzed_at"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+async def build_clinic_pdf(before_url, after_url, analysis_results, generated_at=None):
+    """Fotos (cache) → derivadas para impressão → PDF renderizado no pool
+
+    A data do header é `generated_at` ou a da análise; sem nenhuma das duas o PDF sai
+    sem data (UNDATED), em vez de um carimbo do relógio que ficaria velho no cache.
+    Retorna (bytes do PDF, "HIT" | "MISS" do cache de PDFs).
+    """
+    # Baixar imagens (em paralelo; normalmente já estão no cache desde a análise)
+    with stage("pdf", "download") as fields:
+        before_data, after_data = await image_cache.fetch_pair(before_url, after_url)
+        fields.update(before_bytes=len(before_data), after_bytes=len(after_data))
+    
+    # Data estável da análise (nunca o relógio): novos downloads acertam o cache
+    generated_at = generated_at or analysis_date(analysis_results) or UNDATED
+    cache_key = make_pdf_cache_key(
+        before_data, after_data, analysis_results, PDF_TEMPLATE_VERSION,
+        UNDATED if generated_at == UNDATED else format_report_date(generated_at),
+        extra={"dpi": print_images.dpi, "quality": print_images.quality, "box": PHOTO_BOX_PT}
+    )
+    with stage("pdf", "cache_lookup") as fields:
+        cached = await pdf_cache.get(cache_key)
+        fields["hit"] = cached is not None
+    if cached is not None:
+        add_bytes("pdf", len(cached))
+        return cached, "HIT"
+    
+    with IN_FLIGHT.track(operation="pdf"):
+        # Recortar/reduzir para a resolução de impressão da caixa (derivadas ficam em cache)
+        with stage("pdf", "prepare_images"):
+            before_print, after_print = await print_images.prepare_pair(
+                before_data, after_data, PHOTO_BOX_PT, run=render_pool.run
+            )
         
-        # Ler PDF e converter para base64
-        with open(pdf_path, 'rb') as f:
-            pdf_base64 = base64.b64encode(f.read()).decode()
+        # Gerar PDF em memória no pool de processos (CPU-bound; inclui a espera por worker)
+        with stage("pdf", "render") as fields:
+            pdf_bytes = await render_pool.render(before_print, after_print, analysis_results, generated_at)
+            fields["pdf_bytes"] = len(pdf_bytes)
+        with stage("pdf", "cache_store"):
+            await pdf_cache.set(cache_key, pdf_bytes)
+    add_bytes("pdf", len(pdf_bytes))
+    return pdf_bytes, "MISS"
+
+def wants_binary_pdf(response_format, accept):
+    """?format=pdf ou Accept: application/pdf pedem o PDF binário em vez do JSON base64"""
+    return response_format == "pdf" or (
+        response_format is None and accept is not None and "application/pdf" in accept
+    )
+
+def pdf_response(pdf_bytes, binary, filename, headers=None):
+    if binary:
+        # Response já envia Content-Length; sem base64 nem cópia extra do documento
+        return Response(
+            content=pdf_bytes,
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})}
+        )
+    return JSONResponse(
+        content={"success": True, "pdf_base64": base64.b64encode(pdf_bytes).decode()},
+        headers=headers
+    )
+
+@app.post("/api/generate-pdf")
+async def generate_pdf(
+    request: PDFRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
+    """Gera PDF a partir dos resultados da análise
+
+    Por padrão responde JSON com o PDF em base64 (contrato atual do frontend).
+    Com ?format=pdf ou Accept: application/pdf, devolve o PDF binário direto.
+    """
+    binary = wants_binary_pdf(response_format, accept)
+    try:
+        pdf_bytes, cache_status = await build_clinic_pdf(
+            request.before_url, request.after_url, request.analysis_results, request.generated_at
+        )
+        return pdf_response(pdf_bytes, binary, PDF_FILENAME, headers={"X-PDF-Cache": cache_status})
+    except RenderPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/generate-report")
+async def generate_report(
+    request: PatientReportRequest,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
+    """Gera um único PDF com todas as sessões do paciente + página de evolução por região
+
+    Mesma negociação de formato do /api/generate-pdf (JSON base64 ou PDF binário).
+    """
+    if not request.sessions:
+        raise HTTPException(status_code=400, detail="Informe ao menos uma sessão")
+    if len(request.sessions) > REPORT_MAX_SESSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {REPORT_MAX_SESSIONS} sessões por relatório"
+        )
+    binary = wants_binary_pdf(response_format, accept)
+    try:
+        # Cada URL é baixada uma vez, todas em paralelo (a foto "antes" costuma se repetir)
+        urls = list(dict.fromkeys(
+            url for session in request.sessions for url in (session.before_url, session.after_url)
+        ))
+        downloaded = await asyncio.gather(*(image_cache.fetch(url) for url in urls))
+        prepared = await asyncio.gather(*(
+            print_images.prepare(data, PHOTO_BOX_PT, run=render_pool.run) for data in downloaded
+        ))
+        photos = dict(zip(urls, prepared))
         
-        # Limpar arquivos temporários
-        os.unlink(before_path)
-        os.unlink(after_path)
-        os.unlink(pdf_path)
+        # Foto repetida = mesmo objeto bytes: vai uma vez para o worker e é embutida uma vez no PDF
+        sessions = [
+            {
+                "before_image": photos[session.before_url],
+                "after_image": photos[session.after_url],
+                "analysis_results": session.analysis_results,
+                "label": session.label,
+            }
+            for session in request.sessions
+        ]
+        pdf_bytes = await render_pool.render_report(sessions, request.patient_name)
         
-        return {
-            "success": True,
-            "pdf_base64": pdf_base64
-        }
+        return pdf_response(pdf_bytes, binary, REPORT_FILENAME)
+    except RenderPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/export-pdfs")
+async def export_pdfs(request: ExportRequest):
+    """Exporta vários relatórios em um ZIP enviado em streaming
+
+    Cada PDF entra no arquivo assim que fica pronto; itens com erro são pulados.
+    O manifest.json no fim do ZIP traz o status, tamanho e tempo de cada item.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Informe ao menos um item")
+    if len(request.items) > EXPORT_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {EXPORT_MAX_ITEMS} itens por exportação")
+    
+    async def render_item(item):
+        pdf_bytes, _ = await build_clinic_pdf(
+            item.before_url, item.after_url, item.analysis_results, item.generated_at
+        )
+        return pdf_bytes
+    
+    concurrency = EXPORT_CONCURRENCY or max(1, render_pool.workers)
+    return StreamingResponse(
+        stream_zip_export(request.items, render_item, concurrency),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{EXPORT_FILENAME}"',
+            "X-Export-Items": str(len(request.items))
+        }
+    )
+
+@app.get("/api/stats")
+async def stats():
+    """Métricas operacionais do worker"""
+    return {
+        "openai_pool": pool_stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "vision_uploads": vision_files.stats(),
+        "analysis_backends": backend_latency.stats(),
+        "image_cache": image_cache.stats(),
+        "pdf_render": render_pool.stats(),
+        "pdf_images": print_images.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "jobs": {"pending": analysis_jobs.pending_count()},
+        "progress": progress_streams.stats(),
+        "coalescing": analysis_flights.stats(),
+        "profiling": profiles.stats()
+    }
+
+PROFILE_FORMATS = {
+    # formato → (media type, extensão do arquivo)
+    "folded": ("text/plain; charset=utf-8", "folded"),
+    "prof": ("application/octet-stream", "prof"),
+    "text": ("text/plain; charset=utf-8", "txt"),
+}
+
+def require_admin(authorization: Optional[str], x_admin_token: Optional[str]):
+    token = x_admin_token
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:].strip()
+    if not profiles.token:
+        raise HTTPException(status_code=404, detail="Endpoints de administração desativados (ADMIN_TOKEN)")
+    if not profiles.is_admin(token):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+@app.get("/api/admin/profiles")
+async def list_profiles(
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Capturas de perfil guardadas (mais recentes primeiro)"""
+    require_admin(authorization, x_admin_token)
+    return {"success": True, "profiles": profiles.list(), **profiles.stats()}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    profile_format: str = Query("folded", alias="format"),
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Baixa uma captura
+
+    ?format=folded (padrão) gera stacks para flamegraph.pl/speedscope; ?format=prof
+    é o arquivo do pstats (snakeviz); ?format=text é o resumo por tempo acumulado.
+    """
+    require_admin(authorization, x_admin_token)
+    if profile_format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido (opções: {', '.join(PROFILE_FORMATS)})")
+    capture = profiles.get(profile_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    
+    media_type, extension = PROFILE_FORMATS[profile_format]
+    if profile_format == "folded":
+        content = await asyncio.to_thread(capture.to_folded)
+    elif profile_format == "prof":
+        content = capture.to_prof()
+    else:
+        content = capture.to_text()
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="profile-{capture.id}.{extension}"'}
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas no formato texto do Prometheus (scrape)"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/")
 async def root():
     return {"message": "GlowMetrics Analysis API", "status": "running"}
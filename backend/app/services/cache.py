@@ -0,0 +1,179 @@
+# cache.py - Cache de resultados de análise (LRU em memória + disco limitado por tamanho)
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from app.services.logs import get_logger
+
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+ANALYSIS_CACHE_DIR = os.getenv(
+    "ANALYSIS_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "glowmetrics-cache", "analysis"),
+)
+ANALYSIS_CACHE_MEMORY_ITEMS = int(os.getenv("ANALYSIS_CACHE_MEMORY_ITEMS", "256"))
+ANALYSIS_CACHE_DISK_MB = float(os.getenv("ANALYSIS_CACHE_DISK_MB", "200"))
+
+log = get_logger("cache")
+
+
+def make_cache_key(before_bytes, after_bytes, procedures, assistant_id, prompt_version, extra=None):
+    """Chave de conteúdo: hash das duas imagens + procedimentos ordenados + assistant + prompt"""
+    parts = {
+        "before": hashlib.sha256(before_bytes).hexdigest(),
+        "after": hashlib.sha256(after_bytes).hexdigest(),
+        "procedures": sorted(procedures or []),
+        "assistant_id": assistant_id,
+        "prompt_version": prompt_version,
+        "extra": extra or {},
+    }
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Cache em dois níveis: LRU em memória na frente de um diretório com teto de tamanho"""
+
+    def __init__(self, directory=ANALYSIS_CACHE_DIR, memory_items=ANALYSIS_CACHE_MEMORY_ITEMS,
+                 disk_bytes=int(ANALYSIS_CACHE_DISK_MB * 1024 * 1024), enabled=ANALYSIS_CACHE_ENABLED):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()  # chave -> tamanho em bytes, ordem = LRU
+        self._disk_total = 0
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._opened = False
+
+    def open(self):
+        """Cria o diretório e carrega o índice do disco (idempotente; chamado no startup ou no 1º uso)"""
+        with self._lock:
+            if self._opened:
+                return
+            self._opened = True
+            if self.enabled and self.disk_bytes > 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_disk_index(self):
+        """Reconstrói o índice LRU do disco a partir do mtime dos arquivos"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_total += size
+
+    async def get(self, key):
+        """Retorna (valor, nível) ou (None, None)
+
+        Só a consulta à memória roda no event loop; leitura do disco vai para uma thread.
+        """
+        if not self.enabled:
+            return None, None
+        if not self._opened:
+            await asyncio.to_thread(self.open)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return self._memory[key], "memory"
+            if key not in self._disk:
+                self.misses += 1
+                return None, None
+        value = await asyncio.to_thread(self._read_disk, key)
+        if value is None:
+            return None, None
+        return value, "disk"
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(self._path(key))
+        except (OSError, ValueError):
+            with self._lock:
+                self._drop_disk(key)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            self._remember(key, value)
+            self.hits["disk"] += 1
+        return value
+
+    async def set(self, key, value):
+        """Guarda na memória na hora; a gravação em disco roda em uma thread"""
+        if not self.enabled:
+            return
+        if not self._opened:
+            await asyncio.to_thread(self.open)
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_bytes > 0:
+            await asyncio.to_thread(self._write_disk, key, value)
+
+    def _write_disk(self, key, value):
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.disk_bytes:
+            return
+        # Nome temporário único: gravações simultâneas da mesma chave não disputam o .tmp
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            log.warning("Falha ao gravar cache em disco", extra={"reason": str(e)})
+            return
+        with self._lock:
+            self._disk_total += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            while self._disk_total > self.disk_bytes and self._disk:
+                oldest = next(iter(self._disk))
+                self._drop_disk(oldest)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _drop_disk(self, key):
+        self._disk_total -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        self.open()
+        with self._lock:
+            hits = self.hits["memory"] + self.hits["disk"]
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_total,
+                "hits_memory": self.hits["memory"],
+                "hits_disk": self.hits["disk"],
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,77 +1,75 @@
 # chatgpt.py - Serviço de análise com ChatGPT
+import asyncio
 import os
 import time
 import warnings
-from dotenv import load_dotenv
+from collections import deque
+
+import httpx
+
+from app.services.openai_client import (
+    APIError,
+    APIStatusError,
+    get_openai_client,
+    track_openai_call,
+)
+from app.services.images import image_data_url
+from app.services.logs import get_logger
+from app.services.metrics import IN_FLIGHT, add_bytes, observe_stage, stage
+from app.services.progress import report
+from app.services.uploads import vision_files
 
 warnings.filterwarnings('ignore', category=DeprecationWarning)
 
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-    load_dotenv()
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-ASSISTANT_ID = "asst_Ghy8XTQEhfpjV7eWoTP1WXKw"
-
-def get_openai_token():
-    """Carrega token da API OpenAI"""
-    token = os.getenv("open_ai_token")
-    if not token:
-        token = os.getenv("OPENAI_API_KEY")
-    return token
-
-def analyze_with_chatgpt(before_path, after_path, procedures=None):
-    """Analisa imagens antes/depois usando OpenAI Assistants API"""
-    if not OPENAI_AVAILABLE:
-        raise Exception("OpenAI não disponível. Instale: pip install openai python-dotenv")
-    
-    token = get_openai_token()
-    if not token:
-        raise Exception("Token OpenAI não encontrado. Configure 'open_ai_token' no arquivo .env")
+# Sobrescrevível para apontar para outro assistant (ou para o mock local de testes de carga)
+ASSISTANT_ID = os.getenv("OPENAI_ASSISTANT_ID") or "asst_Ghy8XTQEhfpjV7eWoTP1WXKw"
+# Versão do prompt abaixo - incrementar sempre que o texto mudar (invalida o cache de análises)
+PROMPT_VERSION = "1"
+
+# Como aguardar o run: "stream" (eventos SSE), "poll" (backoff exponencial) ou "fixed" (1s, legado)
+RUN_WAIT_MODE = os.getenv("OPENAI_RUN_WAIT_MODE", "stream")
+RUN_MAX_WAIT_SECONDS = 300  # 5 minutos máximo
+RUN_ACTIVE_STATUSES = ("queued", "in_progress")
+# O assistant não tem tools: um run que pede ação nunca sairia desse estado
+RUN_ACTION_STATUS = "requires_action"
+# Backoff começa curto (runs rápidos) e não passa do intervalo do loop legado
+POLL_INITIAL_INTERVAL = float(os.getenv("OPENAI_POLL_INITIAL", "0.2"))
+POLL_MAX_INTERVAL = float(os.getenv("OPENAI_POLL_MAX", "1.0"))
+POLL_BACKOFF = 1.5
+
+# Backend de análise do deploy: "assistants" (thread/run) ou "direct" (uma chamada com imagens inline)
+ANALYSIS_BACKEND = os.getenv("ANALYSIS_BACKEND", "assistants")
+OPENAI_VISION_MODEL = os.getenv("OPENAI_VISION_MODEL", "gpt-4o")
+DIRECT_IMAGE_MAX_EDGE = int(os.getenv("DIRECT_IMAGE_MAX_EDGE", "1024"))
+DIRECT_IMAGE_DETAIL = os.getenv("DIRECT_IMAGE_DETAIL", "high")
+DIRECT_SYSTEM_PROMPT = (
+    "Você é um especialista em análise estética facial. A primeira imagem é a foto ANTES "
+    "e a segunda é a foto DEPOIS do mesmo paciente. Responda somente com o JSON solicitado."
+)
+
+# Reparo barato de respostas sem JSON válido: só texto, modelo pequeno, sem refazer o run
+# (vazio desativa; a análise falha como antes)
+OPENAI_REPAIR_MODEL = os.getenv("OPENAI_REPAIR_MODEL", "gpt-4o-mini")
+REPAIR_MAX_CHARS = int(os.getenv("OPENAI_REPAIR_MAX_CHARS", "20000"))
+REPAIR_SYSTEM_PROMPT = (
+    "Você corrige respostas de outro modelo. Reescreva a análise recebida como um único objeto "
+    "JSON válido com as chaves \"areas\" (forehead, nose, under_eye: score A-F, description, "
+    "metrics numéricas) e \"global\" (apparent_age: after, reduction; harmony 0-100). "
+    "Preserve os valores e textos originais; não invente regiões ausentes. Responda somente com o JSON."
+)
+
+log = get_logger("chatgpt")
+
+def build_prompt(procedures=None):
+    """Monta o prompt de análise (mesmo texto para todos os backends)"""
+    # Construir prompt com procedimentos
+    procedures_text = ""
+    if procedures and len(procedures) > 0:
+        procedures_list = ", ".join(procedures)
+        procedures_text = f"\n\nProcedimentos realizados: {procedures_list}"
     
-    try:
-        # Inicializar cliente OpenAI
-        # Versões recentes do openai (1.0+) não aceitam 'proxies' diretamente
-        # Precisamos criar um httpx.Client sem proxies para evitar conflitos
-        import httpx
-        
-        # Limpar qualquer variável de ambiente que possa causar conflito
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy']
-        for var in proxy_vars:
-            if var in os.environ:
-                print(f"   🗑️ Removendo variável de proxy: {var}")
-                del os.environ[var]
-        
-        print(f"🔑 Inicializando cliente OpenAI...")
-        print(f"   Token presente: {'Sim' if token else 'Não'}")
-        print(f"   Token length: {len(token) if token else 0}")
-        
-        # Criar httpx.Client sem proxies explicitamente
-        http_client = httpx.Client(
-            timeout=60.0,
-            # Não passar proxies aqui - isso causa o erro
-        )
-        
-        # Criar cliente OpenAI com http_client customizado
-        client = OpenAI(
-            api_key=token,
-            http_client=http_client
-        )
-        print("   ✓ Cliente OpenAI inicializado")
-        
-        # Construir prompt com procedimentos
-        print("📝 Construindo prompt...")
-        procedures_text = ""
-        if procedures and len(procedures) > 0:
-            procedures_list = ", ".join(procedures)
-            procedures_text = f"\n\nProcedimentos realizados: {procedures_list}"
-        print(f"   ✓ Procedimentos: {procedures}")
-        
-        # Prompt estruturado - explícito e objetivo
-        print("   📄 Criando prompt completo...")
-        prompt_text = f"""Para cada área facial, analise e descreva EXATAMENTE o que mudou da foto ANTES para a foto DEPOIS:{procedures_text}
+    # Prompt estruturado - explícito e objetivo
+    prompt_text = f"""Para cada área facial, analise e descreva EXATAMENTE o que mudou da foto ANTES para a foto DEPOIS:{procedures_text}
 
 1. REGIÃO FRONTAL (testa):
    - Conte e compare rugas/linhas horizontais: aumentaram ou diminuíram da ANTES para DEPOIS?
@@ -132,121 +130,346 @@ REGRAS FINAIS:
 - Se não houver diferença significativa → métricas próximas de ZERO, score D
 
 Retorne APENAS o JSON, sem texto adicional."""
-        
+    return prompt_text
+
+class AnalysisBackend:
+    """Interface dos backends: recebe as fotos (bytes JPEG) e devolve o texto JSON do modelo"""
+    name = "base"
+    
+    @property
+    def model_id(self):
+        """Identifica o modelo/assistant (entra na chave do cache de análises)"""
+        raise NotImplementedError
+    
+    async def analyze(self, client, before_image, after_image, prompt_text):
+        raise NotImplementedError
+
+class AssistantsBackend(AnalysisBackend):
+    """Fluxo Assistants: upload dos arquivos → thread → mensagem → run → resposta"""
+    name = "assistants"
+    
+    @property
+    def model_id(self):
+        return ASSISTANT_ID
+    
+    async def analyze(self, client, before_image, after_image, prompt_text):
         # 1. Upload das imagens
-        print("📤 Fazendo upload das imagens para OpenAI...")
-        print(f"   Before path: {before_path}")
-        print(f"   After path: {after_path}")
-        try:
-            with open(before_path, "rb") as f_before, open(after_path, "rb") as f_after:
-                print("   📎 Uploading before image...")
-                file_before = client.files.create(
-                    file=f_before,
-                    purpose="vision"
-                )
-                print(f"   ✓ Before uploaded: {file_before.id}")
-                
-                print("   📎 Uploading after image...")
-                file_after = client.files.create(
-                    file=f_after,
-                    purpose="vision"
-                )
-                print(f"   ✓ After uploaded: {file_after.id}")
-        except Exception as upload_error:
-            print(f"   ❌ Erro no upload: {upload_error}")
-            raise
+        # Fotos já enviadas (mesmo hash) reaproveitam o file_id; as duas sobem em paralelo
+        with stage("analysis", "upload", before_bytes=len(before_image), after_bytes=len(after_image)) as fields:
+            before_file_id, after_file_id = await asyncio.gather(
+                vision_files.get_or_upload(client, before_image, "before.jpg"),
+                vision_files.get_or_upload(client, after_image, "after.jpg")
+            )
+            fields.update(before_file_id=before_file_id, after_file_id=after_file_id)
+        report("upload", before_file_id=before_file_id, after_file_id=after_file_id)
         
         # 2. Criar thread
-        print("🧵 Criando thread...")
-        try:
-            thread = client.beta.threads.create()
-            print(f"   ✓ Thread criada: {thread.id}")
-        except Exception as thread_error:
-            print(f"   ❌ Erro ao criar thread: {thread_error}")
-            raise
+        with stage("analysis", "thread_create") as fields, track_openai_call("threads.create"):
+            thread = await client.beta.threads.create()
+            fields["thread_id"] = thread.id
+        report("thread_created", thread_id=thread.id)
         
         # 3. Enviar mensagem com imagens e prompt
-        print("💬 Enviando mensagem com imagens...")
-        try:
-            message = client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=[
-                {"type": "text", "text": prompt_text},
-                {
-                    "type": "image_file",
-                    "image_file": {"file_id": file_before.id}
-                },
-                {
-                    "type": "image_file",
-                    "image_file": {"file_id": file_after.id}
-                }
-            ]
-            )
-            print(f"   ✓ Mensagem enviada: {message.id}")
-        except Exception as message_error:
-            print(f"   ❌ Erro ao enviar mensagem: {message_error}")
-            raise
-        
-        # 4. Criar e executar run
-        print("▶️ Criando e executando run...")
-        try:
-            run = client.beta.threads.runs.create(
+        with stage("analysis", "message_create", thread_id=thread.id) as fields, \
+                track_openai_call("messages.create"):
+            message = await client.beta.threads.messages.create(
                 thread_id=thread.id,
-                assistant_id=ASSISTANT_ID
+                role="user",
+                content=[
+                    {"type": "text", "text": prompt_text},
+                    {
+                        "type": "image_file",
+                        "image_file": {"file_id": before_file_id}
+                    },
+                    {
+                        "type": "image_file",
+                        "image_file": {"file_id": after_file_id}
+                    }
+                ]
             )
-            print(f"   ✓ Run criado: {run.id}, status: {run.status}")
-        except Exception as run_error:
-            print(f"   ❌ Erro ao criar run: {run_error}")
-            raise
-        
-        # 5. Aguardar conclusão do run
-        max_wait_time = 300  # 5 minutos máximo
-        start_time = time.time()
+            fields["message_id"] = message.id
+        report("message_sent", message_id=message.id)
         
-        while run.status in ["queued", "in_progress", "requires_action"]:
-            if time.time() - start_time > max_wait_time:
-                raise Exception("Timeout aguardando resposta do assistant")
-            
-            time.sleep(1)
-            run = client.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
+        # 4/5. Criar run e aguardar conclusão
+        deadline = time.monotonic() + RUN_MAX_WAIT_SECONDS
+        response_text = None
+        mode = RUN_WAIT_MODE
+        phases = _RunPhases()
+        with stage("analysis", "run", thread_id=thread.id, wait_mode=mode) as fields, \
+                IN_FLIGHT.track(operation="openai_run"):
+            if mode == "stream":
+                try:
+                    run, response_text = await _stream_run(client, thread.id, deadline, phases)
+                except _StreamUnavailable as stream_error:
+                    log.warning("Streaming indisponível, usando polling adaptativo",
+                                extra={"reason": str(stream_error)})
+                    mode = fields["wait_mode"] = "poll"
             
-            if run.status == "failed":
-                error_msg = getattr(run, "last_error", "Erro desconhecido")
-                raise Exception(f"Run falhou: {error_msg}")
-            elif run.status == "cancelled":
-                raise Exception("Run foi cancelado")
+            if mode != "stream":
+                with track_openai_call("runs.create"):
+                    run = await client.beta.threads.runs.create(
+                        thread_id=thread.id,
+                        assistant_id=ASSISTANT_ID
+                    )
+                phases.update(run)
+                run = await _poll_run(client, thread.id, run, mode, deadline, phases)
+            fields.update(run_id=run.id, status=run.status)
         
+        if run.status == RUN_ACTION_STATUS:
+            await _cancel_run(client, thread.id, run)
+            raise Exception("Run pediu ação de ferramenta (requires_action), que este backend não atende")
         if run.status != "completed":
             raise Exception(f"Run terminou com status inesperado: {run.status}")
         
-        # 6. Ler resposta do assistant
-        messages = client.beta.threads.messages.list(
-            thread_id=thread.id,
-            order="asc"
-        )
-        
-        # A última mensagem do assistant contém a resposta
-        response_text = None
-        for msg in reversed(messages.data):
-            if msg.role == "assistant":
-                if msg.content:
-                    # Extrair texto da resposta
-                    for content_item in msg.content:
-                        if hasattr(content_item, 'text') and content_item.text:
-                            response_text = content_item.text.value
-                            break
-                if response_text:
-                    break
+        # 6. Ler resposta do assistant (no modo stream ela já veio nos eventos)
+        if not response_text:
+            with stage("analysis", "messages_list"), track_openai_call("messages.list"):
+                messages = await client.beta.threads.messages.list(
+                    thread_id=thread.id,
+                    order="asc"
+                )
+            
+            # A última mensagem do assistant contém a resposta
+            for msg in reversed(messages.data):
+                if msg.role == "assistant":
+                    response_text = _message_text(msg)
+                    if response_text:
+                        break
         
         if not response_text:
             raise Exception("Nenhuma resposta encontrada do assistant")
         
         return response_text
+
+class DirectVisionBackend(AnalysisBackend):
+    """Uma única chamada de chat completions com as fotos inline (base64) e resposta em JSON"""
+    name = "direct"
+    
+    @property
+    def model_id(self):
+        return f"direct:{OPENAI_VISION_MODEL}:{DIRECT_IMAGE_MAX_EDGE}"
+    
+    async def analyze(self, client, before_image, after_image, prompt_text):
+        # Reduz para o tamanho inline (CPU-bound: roda em thread)
+        with stage("analysis", "inline_images", max_edge=DIRECT_IMAGE_MAX_EDGE) as fields:
+            before_url, after_url = await asyncio.gather(
+                asyncio.to_thread(image_data_url, before_image, DIRECT_IMAGE_MAX_EDGE),
+                asyncio.to_thread(image_data_url, after_image, DIRECT_IMAGE_MAX_EDGE)
+            )
+            fields["inline_bytes"] = len(before_url) + len(after_url)
+        add_bytes("inline_image", fields["inline_bytes"])
         
+        report("model_request", model=OPENAI_VISION_MODEL)
+        with stage("analysis", "model_request", model=OPENAI_VISION_MODEL) as fields, \
+                IN_FLIGHT.track(operation="openai_run"), track_openai_call("chat.completions.create"):
+            completion = await client.chat.completions.create(
+                model=OPENAI_VISION_MODEL,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": DIRECT_SYSTEM_PROMPT},
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt_text},
+                            {"type": "text", "text": "Foto ANTES:"},
+                            {"type": "image_url", "image_url": {"url": before_url, "detail": DIRECT_IMAGE_DETAIL}},
+                            {"type": "text", "text": "Foto DEPOIS:"},
+                            {"type": "image_url", "image_url": {"url": after_url, "detail": DIRECT_IMAGE_DETAIL}}
+                        ]
+                    }
+                ]
+            )
+            fields["total_tokens"] = completion.usage.total_tokens if completion.usage else None
+        response_text = completion.choices[0].message.content if completion.choices else None
+        if not response_text:
+            raise Exception("Nenhuma resposta encontrada do modelo")
+        return response_text
+
+BACKENDS = {
+    AssistantsBackend.name: AssistantsBackend(),
+    DirectVisionBackend.name: DirectVisionBackend(),
+}
+
+def get_backend(name=None):
+    """Backend configurado para o deploy (ANALYSIS_BACKEND) ou o informado"""
+    name = name or ANALYSIS_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de análise desconhecido: '{name}' (opções: {', '.join(BACKENDS)})")
+    return BACKENDS[name]
+
+class BackendLatency:
+    """Janela das últimas latências por backend para comparar p50/p95"""
+    
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._errors = {}
+    
+    def record(self, backend, seconds, ok=True):
+        self._samples.setdefault(backend, deque(maxlen=self.window)).append(seconds)
+        if not ok:
+            self._errors[backend] = self._errors.get(backend, 0) + 1
+    
+    def stats(self):
+        result = {}
+        for backend, samples in self._samples.items():
+            ordered = sorted(samples)
+            result[backend] = {
+                "count": len(ordered),
+                "errors": self._errors.get(backend, 0),
+                "p50_ms": round(ordered[int(0.50 * (len(ordered) - 1))] * 1000, 1),
+                "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1),
+            }
+        return result
+
+backend_latency = BackendLatency()
+
+async def repair_model_output(response_text, error):
+    """Pede a um modelo barato que reescreva a resposta como JSON válido (sem fotos nem novo run)"""
+    client = get_openai_client()
+    with stage("analysis", "repair", model=OPENAI_REPAIR_MODEL) as fields, \
+            track_openai_call("chat.completions.repair"):
+        completion = await client.chat.completions.create(
+            model=OPENAI_REPAIR_MODEL,
+            temperature=0,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": REPAIR_SYSTEM_PROMPT},
+                {"role": "user", "content": f"Erro ao ler a resposta: {error}\n\nResposta original:\n{response_text[:REPAIR_MAX_CHARS]}"}
+            ]
+        )
+        fields["total_tokens"] = completion.usage.total_tokens if completion.usage else None
+    repaired = completion.choices[0].message.content if completion.choices else None
+    if not repaired:
+        raise Exception("Nenhuma resposta encontrada do modelo de reparo")
+    return repaired
+
+async def analyze_with_chatgpt(before_image, after_image, procedures=None, backend=None):
+    """Analisa imagens antes/depois (bytes JPEG) com o backend configurado"""
+    start = time.perf_counter()
+    ok = False
+    try:
+        selected = get_backend(backend)
+        # Cliente compartilhado do processo (pool de conexões criado no lifespan)
+        client = get_openai_client()
+        prompt_text = build_prompt(procedures)
+        response_text = await selected.analyze(client, before_image, after_image, prompt_text)
+        ok = True
+        return response_text
     except Exception as e:
         raise Exception(f"ChatGPT erro: {str(e)}")
+    finally:
+        backend_latency.record(backend or ANALYSIS_BACKEND, time.perf_counter() - start, ok)
+
+
+class _StreamUnavailable(Exception):
+    """A API recusou o run com stream=True (nenhum run foi criado)"""
+
+def _check_run_status(run):
+    if run.status == "failed":
+        error_msg = getattr(run, "last_error", "Erro desconhecido")
+        raise Exception(f"Run falhou: {error_msg}")
+    elif run.status == "cancelled":
+        raise Exception("Run foi cancelado")
+
+async def _cancel_run(client, thread_id, run):
+    """Cancela o run na OpenAI (melhor esforço: a falha original é a que importa)"""
+    try:
+        with track_openai_call("runs.cancel"):
+            await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+    except (APIError, httpx.HTTPError) as e:
+        log.warning("Falha ao cancelar run", extra={"run_id": run.id, "reason": str(e)})
 
+class _RunPhases:
+    """Tempo do run em cada status: queued = fila da OpenAI, in_progress = execução do modelo"""
+
+    def __init__(self):
+        self.status = None
+        self.since = None
+
+    def update(self, run):
+        if run.status == self.status:
+            return
+        now = time.perf_counter()
+        if self.status is None:
+            report("run_created", run_id=run.id, status=run.status)
+        else:
+            observe_stage("analysis", f"run_{self.status}", now - self.since)
+            report("run_status", run_id=run.id, status=run.status)
+        log.debug("Status do run", extra={"run_id": run.id, "status": run.status})
+        self.status, self.since = run.status, now
+
+def _message_text(message):
+    """Extrai o texto de uma mensagem do assistant"""
+    for content_item in message.content or []:
+        if hasattr(content_item, 'text') and content_item.text:
+            return content_item.text.value
+    return None
+
+async def _poll_run(client, thread_id, run, mode, deadline, phases):
+    """Aguarda o run por polling: intervalo fixo de 1s ('fixed') ou backoff exponencial ('poll')"""
+    interval = 1.0 if mode == "fixed" else POLL_INITIAL_INTERVAL
+    while run.status in RUN_ACTIVE_STATUSES:
+        if time.monotonic() > deadline:
+            raise Exception("Timeout aguardando resposta do assistant")
+        
+        await asyncio.sleep(interval)
+        with track_openai_call("runs.retrieve"):
+            run = await client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
+        phases.update(run)
+        _check_run_status(run)
+        if mode != "fixed":
+            interval = min(interval * POLL_BACKOFF, POLL_MAX_INTERVAL)
+    return run
+
+async def _stream_run(client, thread_id, deadline, phases):
+    """Cria o run com stream=True e consome os eventos até o estado final
+
+    Retorna (run, texto da resposta ou None). Se o stream cair no meio do
+    caminho, continua acompanhando o mesmo run por polling adaptativo.
+    """
+    try:
+        with track_openai_call("runs.create_stream"):
+            stream = await client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=ASSISTANT_ID,
+                stream=True
+            )
+    except APIStatusError as e:
+        if e.status_code in (400, 404, 405, 415, 501):
+            raise _StreamUnavailable(f"HTTP {e.status_code}")
+        raise
+    
+    run = None
+    response_text = None
+    try:
+        async with asyncio.timeout(max(0.0, deadline - time.monotonic())):
+            async for event in stream:
+                if event.event.startswith("thread.run.") and not event.event.startswith("thread.run.step."):
+                    run = event.data
+                    phases.update(run)
+                    _check_run_status(run)
+                    if run.status not in RUN_ACTIVE_STATUSES:
+                        break
+                elif event.event == "thread.message.completed" and event.data.role == "assistant":
+                    response_text = _message_text(event.data) or response_text
+    except TimeoutError:
+        raise Exception("Timeout aguardando resposta do assistant")
+    except (APIError, httpx.HTTPError) as stream_error:
+        if run is None:
+            raise
+        log.warning("Stream interrompido, continuando por polling",
+                    extra={"run_id": run.id, "reason": str(stream_error)})
+        return await _poll_run(client, thread_id, run, "poll", deadline, phases), None
+    finally:
+        await stream.close()
+    
+    if run is None:
+        raise Exception("Stream do run terminou sem eventos")
+    if run.status in RUN_ACTIVE_STATUSES:
+        # Stream terminou antes do estado final: segue pelo polling
+        return await _poll_run(client, thread_id, run, "poll", deadline, phases), response_text
+    return run, response_text
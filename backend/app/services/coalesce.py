@@ -0,0 +1,64 @@
+# coalesce.py - Single-flight: requisições idênticas simultâneas compartilham uma única execução
+import asyncio
+import hashlib
+import json
+import os
+
+# Tamanho máximo aceito para o header Idempotency-Key
+IDEMPOTENCY_KEY_MAX_LENGTH = int(os.getenv("IDEMPOTENCY_KEY_MAX_LENGTH", "255"))
+
+
+def make_request_key(before_url, after_url, procedures, bypass_cache=False, **extra):
+    """Chave da requisição normalizada: URLs sem espaços + procedimentos ordenados (como no cache)"""
+    parts = {
+        "before_url": (before_url or "").strip(),
+        "after_url": (after_url or "").strip(),
+        "procedures": sorted(procedures or []),
+        "bypass_cache": bool(bypass_cache),
+        **extra,
+    }
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Uma execução em andamento por chave; chamadas repetidas aguardam o mesmo resultado
+
+    A execução roda em uma task própria: se quem a iniciou desconectar, as demais
+    chamadas (e o cache, alimentado ao final) continuam recebendo o resultado.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self.leaders = 0
+        self.joined = 0
+
+    def __contains__(self, key):
+        return key in self._inflight
+
+    async def run(self, key, func):
+        """Retorna (resultado de `await func()`, True se reaproveitou uma execução em andamento)"""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.joined += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Consome o erro mesmo que todos os interessados tenham desistido
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "joined": self.joined,
+        }
@@ -0,0 +1,39 @@
+# concurrency.py - Fan-out limitado: no máximo N tarefas em andamento, resultados na ordem de término
+import asyncio
+import time
+
+
+async def as_completed_bounded(items, func, limit):
+    """Executa `await func(item)` para cada item com no máximo `limit` tarefas simultâneas
+
+    Gera (índice, item, resultado, erro, segundos) conforme cada tarefa termina; um erro
+    não interrompe as demais. Novas tarefas só são criadas quando há vaga, então a
+    memória fica limitada por `limit` e não pelo total de itens. Se o consumidor parar
+    (ex.: cliente desconectou), as tarefas em andamento são canceladas.
+    """
+    limit = max(1, limit)
+
+    async def run(index, item):
+        start = time.perf_counter()
+        try:
+            result = await func(item)
+        except Exception as e:
+            return index, item, None, e, time.perf_counter() - start
+        return index, item, result, None, time.perf_counter() - start
+
+    pending = set()
+    try:
+        for index, item in enumerate(items):
+            pending.add(asyncio.create_task(run(index, item)))
+            if len(pending) < limit:
+                continue
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,62 @@
+# downloads.py - Download das fotos (Supabase) em paralelo, em streaming e com limite de tamanho
+import os
+
+import httpx
+
+DOWNLOAD_MAX_BYTES = int(float(os.getenv("DOWNLOAD_MAX_MB", "20")) * 1024 * 1024)
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv("DOWNLOAD_CONNECT_TIMEOUT", "5"))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30"))
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", "20"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    """Imagem maior que DOWNLOAD_MAX_MB"""
+
+
+_client = None
+
+
+def init_download_client():
+    """Cria o pool de conexões compartilhado pelos downloads (idempotente)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(DOWNLOAD_READ_TIMEOUT, connect=DOWNLOAD_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=DOWNLOAD_MAX_CONNECTIONS),
+            follow_redirects=True,
+        )
+    return _client
+
+
+def get_download_client():
+    return _client if _client is not None else init_download_client()
+
+
+async def close_download_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+
+async def fetch_image(url: str, headers=None, max_bytes: int = DOWNLOAD_MAX_BYTES):
+    """GET em streaming; retorna (status, bytes ou None se 304, headers da resposta)"""
+    if not url or url.strip() == "":
+        raise ValueError(f"URL vazia ou inválida: '{url}'")
+
+    client = get_download_client()
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return 304, None, response.headers
+        response.raise_for_status()
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise ImageTooLargeError(f"Imagem excede o limite de {max_bytes} bytes: {url[:50]}")
+        buffer = bytearray()
+        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+            buffer += chunk
+            if len(buffer) > max_bytes:
+                raise ImageTooLargeError(f"Imagem excede o limite de {max_bytes} bytes: {url[:50]}")
+    return response.status_code, bytes(buffer), response.headers
+
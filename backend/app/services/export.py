@@ -0,0 +1,132 @@
+# export.py - Exportação em lote: PDFs renderizados em paralelo e enviados em um ZIP em streaming
+import json
+import os
+import re
+import time
+import zipfile
+from contextlib import aclosing
+from datetime import datetime, timezone
+
+import httpx
+
+from app.services.concurrency import as_completed_bounded
+from app.services.downloads import ImageTooLargeError
+from app.services.logs import get_logger
+from app.services.render_pool import RenderPoolBusy
+
+# PDFs gerados ao mesmo tempo na exportação (0 = um por worker do pool de PDF)
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "0"))
+EXPORT_MAX_ITEMS = int(os.getenv("EXPORT_MAX_ITEMS", "500"))
+MANIFEST_NAME = "manifest.json"
+
+log = get_logger("export")
+
+
+class _ChunkSink:
+    """Destino não-seekable do ZipFile: guarda o que foi escrito até o próximo envio ao cliente"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def safe_filename(name, index, used):
+    """Nome do PDF dentro do ZIP: sem caminhos/caracteres estranhos e sem repetição"""
+    base = re.sub(r"[^\w.\- ]+", "_", os.path.basename(name or "")).strip(" .")
+    if not base:
+        base = f"relatorio-{index + 1:03d}"
+    if base.lower().endswith(".pdf"):
+        base = base[:-4]
+    candidate = f"{base}.pdf"
+    suffix = 2
+    while candidate in used:
+        candidate = f"{base}-{suffix}.pdf"
+        suffix += 1
+    used.add(candidate)
+    return candidate
+
+
+def manifest_error(error):
+    """Mensagem do item com erro para o manifest.json (vai ao cliente)
+
+    O texto da exceção fica só no log: erros de arquivo e de cache trazem caminhos
+    do servidor (IMAGE_LOCAL_DIR, diretórios de cache).
+    """
+    if isinstance(error, RenderPoolBusy):
+        return "Muitos PDFs em geração, tente novamente em instantes"
+    if isinstance(error, ImageTooLargeError):
+        return "Imagem excede o tamanho máximo permitido"
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"Falha ao baixar a imagem (HTTP {error.response.status_code})"
+    if isinstance(error, httpx.HTTPError):
+        return "Falha ao baixar a imagem"
+    if isinstance(error, (OSError, ValueError)):
+        return "Imagem inválida ou inacessível"
+    return "Erro ao gerar o PDF"
+
+
+async def stream_zip_export(items, render, concurrency):
+    """Gera os bytes do ZIP conforme cada PDF fica pronto
+
+    `render(item)` retorna os bytes do PDF. No máximo `concurrency` itens ficam em
+    processamento (e em memória) ao mesmo tempo; os PDFs entram no ZIP na ordem em
+    que terminam. Itens com erro são pulados e registrados no manifest.json, que
+    fecha o arquivo com o status de cada item.
+    """
+    sink = _ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+    total = len(items)
+    used_names = set()
+    names = [safe_filename(getattr(item, "filename", None), index, used_names) for index, item in enumerate(items)]
+    manifest = [None] * total
+    finished = 0
+    started = time.perf_counter()
+
+    def add_to_archive(index, pdf_bytes, error, elapsed):
+        nonlocal finished
+        finished += 1
+        entry = {"index": index, "file": names[index], "render_ms": round(elapsed * 1000, 1)}
+        if error is None:
+            # PDF já é comprimido internamente: ZIP_STORED evita gastar CPU à toa
+            info = zipfile.ZipInfo(names[index], date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            archive.writestr(info, pdf_bytes)
+            entry.update(status="ok", bytes=len(pdf_bytes))
+            log.info("PDF adicionado à exportação", extra={"done": finished, "total": total, **entry})
+        else:
+            entry.update(status="error", error=manifest_error(error))
+            log.warning("Item da exportação ignorado", extra={
+                "done": finished, "total": total, **entry,
+                "reason": (str(error) or type(error).__name__).splitlines()[0]
+            })
+        manifest[index] = entry
+
+    # aclosing: se o cliente desconectar, as renderizações em andamento são canceladas
+    async with aclosing(as_completed_bounded(items, render, concurrency)) as results:
+        async for index, _, pdf_bytes, error, elapsed in results:
+            add_to_archive(index, pdf_bytes, error, elapsed)
+            yield sink.drain()
+
+    succeeded = sum(1 for entry in manifest if entry["status"] == "ok")
+    summary = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "total": total,
+        "succeeded": succeeded,
+        "failed": total - succeeded,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        "items": manifest,
+    }
+    archive.writestr(MANIFEST_NAME, json.dumps(summary, ensure_ascii=False, indent=2))
+    archive.close()
+    yield sink.drain()
@@ -0,0 +1,264 @@
+# image_cache.py - Cache local das fotos (por URL e hash do conteúdo) com revalidação condicional
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from app.services.downloads import fetch_image
+
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+IMAGE_CACHE_DIR = os.getenv(
+    "IMAGE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "glowmetrics-cache", "images"),
+)
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "500"))
+# Dentro dessa janela a cópia local é usada sem nem revalidar (análise → PDF)
+IMAGE_CACHE_FRESH_SECONDS = int(os.getenv("IMAGE_CACHE_FRESH_SECONDS", "300"))
+# Diretório liberado para URLs file:// (testes offline); vazio = file:// desabilitado
+IMAGE_LOCAL_DIR = os.getenv("IMAGE_LOCAL_DIR", "")
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path, data):
+    # Nome temporário único: gravações simultâneas do mesmo blob não disputam o mesmo .tmp
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def resolve_local_path(url, local_dir=IMAGE_LOCAL_DIR):
+    """Converte file:// em caminho dentro de IMAGE_LOCAL_DIR (nunca fora dele)"""
+    if not local_dir:
+        raise ValueError("URLs file:// exigem IMAGE_LOCAL_DIR configurado")
+    parsed = urlparse(url)
+    path = unquote(parsed.netloc + parsed.path)
+    root = os.path.realpath(local_dir)
+    full_path = os.path.realpath(path if os.path.isabs(path) else os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f"Caminho fora de IMAGE_LOCAL_DIR: '{url}'")
+    return full_path
+
+
+class ImageCache:
+    """Blobs por SHA-256 em disco + metadados por URL (ETag/Last-Modified), LRU com teto de tamanho"""
+
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_bytes=int(IMAGE_CACHE_MAX_MB * 1024 * 1024),
+                 fresh_seconds=IMAGE_CACHE_FRESH_SECONDS, enabled=IMAGE_CACHE_ENABLED,
+                 local_dir=IMAGE_LOCAL_DIR):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self.enabled = enabled
+        self.local_dir = local_dir
+        self._urls = {}  # url -> metadados
+        self._blobs = OrderedDict()  # sha256 -> tamanho, ordem = LRU
+        self._total = 0
+        self._pending = {}  # url -> Future (mesma URL pedida em paralelo baixa uma vez)
+        self.counts = {"fresh": 0, "revalidated": 0, "miss": 0, "local": 0}
+        self._opened = False
+
+    def open(self):
+        """Cria o diretório e carrega o índice do disco (idempotente; chamado no startup ou no 1º uso)"""
+        if self._opened:
+            return
+        self._opened = True
+        if self.enabled:
+            os.makedirs(self._blob_dir, exist_ok=True)
+            os.makedirs(self._meta_dir, exist_ok=True)
+            self._load_index()
+
+    @property
+    def _blob_dir(self):
+        return os.path.join(self.directory, "blobs")
+
+    @property
+    def _meta_dir(self):
+        return os.path.join(self.directory, "meta")
+
+    def _blob_path(self, sha):
+        return os.path.join(self._blob_dir, sha)
+
+    def _meta_path(self, url):
+        return os.path.join(self._meta_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_index(self):
+        """Reconstrói o índice a partir do disco (sobrevive a restarts)"""
+        blobs = []
+        for entry in os.scandir(self._blob_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, sha, size in sorted(blobs):
+            self._blobs[sha] = size
+            self._total += size
+        for entry in os.scandir(self._meta_dir):
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("sha256") in self._blobs:
+                self._urls[meta["url"]] = meta
+            else:
+                os.remove(entry.path)
+
+    async def fetch(self, url):
+        """Retorna os bytes da imagem, usando a cópia local sempre que ainda for válida"""
+        if url and url.startswith("file:"):
+            self.counts["local"] += 1
+            return await asyncio.to_thread(_read_file, resolve_local_path(url, self.local_dir))
+        if not self.enabled:
+            self.counts["miss"] += 1
+            _, data, _ = await fetch_image(url)
+            return data
+
+        self.open()
+        meta = self._urls.get(url)
+        if (meta is not None and meta["sha256"] in self._blobs
+                and time.time() - meta["checked_at"] < self.fresh_seconds):
+            data = await self._read_blob(meta["sha256"])
+            if data is not None:
+                self.counts["fresh"] += 1
+                return data
+        while url in self._pending:
+            pending = self._pending[url]
+            try:
+                data = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Quem baixava foi cancelado (cliente desconectou): este pedido tenta de novo
+                if pending.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self.counts["fresh"] += 1
+            return data
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[url] = future
+        try:
+            data = await self._download(url)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            # O cancelamento é só deste pedido: não é repassado como erro a quem aguarda
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Ninguém mais aguardando: evita "Future exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(url, None)
+
+    async def _download(self, url):
+        """Revalida a cópia local (ETag/Last-Modified) ou baixa de novo e grava no cache"""
+        meta = self._urls.get(url)
+        if meta is not None and meta["sha256"] in self._blobs:
+            conditional = {}
+            if meta.get("etag"):
+                conditional["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                conditional["If-Modified-Since"] = meta["last_modified"]
+            status, data, headers = await fetch_image(url, headers=conditional or None)
+            if status == 304:
+                data = await self._read_blob(meta["sha256"])
+                if data is not None:
+                    self.counts["revalidated"] += 1
+                    meta["checked_at"] = time.time()
+                    await asyncio.to_thread(self._write_meta, meta)
+                    return data
+                status, data, headers = await fetch_image(url)
+        else:
+            status, data, headers = await fetch_image(url)
+        self.counts["miss"] += 1
+        await self._store(url, data, headers)
+        return data
+
+    async def fetch_pair(self, before_url, after_url):
+        """Resolve as fotos antes/depois em paralelo"""
+        return await asyncio.gather(self.fetch(before_url), self.fetch(after_url))
+
+    async def _read_blob(self, sha):
+        try:
+            data = await asyncio.to_thread(_read_file, self._blob_path(sha))
+        except OSError:
+            self._drop_blob(sha)
+            return None
+        if sha in self._blobs:
+            self._blobs.move_to_end(sha)
+        try:
+            os.utime(self._blob_path(sha))
+        except OSError:
+            pass
+        return data
+
+    def _write_meta(self, meta):
+        _write_file(self._meta_path(meta["url"]), json.dumps(meta).encode("utf-8"))
+
+    async def _store(self, url, data, headers):
+        if len(data) > self.max_bytes:
+            return
+        sha = hashlib.sha256(data).hexdigest()
+        meta = {
+            "url": url,
+            "sha256": sha,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "checked_at": time.time(),
+        }
+        if sha not in self._blobs:
+            await asyncio.to_thread(_write_file, self._blob_path(sha), data)
+            # Outra URL com o mesmo conteúdo pode ter gravado o blob durante o await
+            self._total -= self._blobs.pop(sha, 0)
+            self._blobs[sha] = len(data)
+            self._total += len(data)
+        self._blobs.move_to_end(sha)
+        self._urls[url] = meta
+        await asyncio.to_thread(self._write_meta, meta)
+        while self._total > self.max_bytes and len(self._blobs) > 1:
+            self._drop_blob(next(iter(self._blobs)))
+
+    def _drop_blob(self, sha):
+        self._total -= self._blobs.pop(sha, 0)
+        for url in [u for u, m in self._urls.items() if m["sha256"] == sha]:
+            del self._urls[url]
+            try:
+                os.remove(self._meta_path(url))
+            except OSError:
+                pass
+        try:
+            os.remove(self._blob_path(sha))
+        except OSError:
+            pass
+
+    def stats(self):
+        self.open()
+        lookups = self.counts["fresh"] + self.counts["revalidated"] + self.counts["miss"]
+        hits = self.counts["fresh"] + self.counts["revalidated"]
+        return {
+            "enabled": self.enabled,
+            "urls": len(self._urls),
+            "blobs": len(self._blobs),
+            "bytes": self._total,
+            "hits_fresh": self.counts["fresh"],
+            "hits_revalidated": self.counts["revalidated"],
+            "misses": self.counts["miss"],
+            "local_reads": self.counts["local"],
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
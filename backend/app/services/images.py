@@ -0,0 +1,95 @@
+# images.py - Pré-processamento das fotos antes do upload para o modelo
+import base64
+import io
+import math
+import os
+
+from PIL import Image, ImageOps
+
+IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1536"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+# Fotos embutidas nos PDFs: resolução de impressão na caixa onde são desenhadas
+PDF_IMAGE_DPI = int(os.getenv("PDF_IMAGE_DPI", "300"))
+PDF_IMAGE_QUALITY = int(os.getenv("PDF_IMAGE_QUALITY", "85"))
+
+
+def preprocess_settings():
+    """Parâmetros que alteram os bytes enviados (entram na chave do cache de análises)"""
+    if not IMAGE_PREPROCESS_ENABLED:
+        return {"preprocess": False}
+    return {"preprocess": True, "max_edge": IMAGE_MAX_EDGE, "quality": IMAGE_JPEG_QUALITY}
+
+
+def preprocess_image(data, max_edge=IMAGE_MAX_EDGE, quality=IMAGE_JPEG_QUALITY):
+    """Aplica orientação EXIF, reduz para o lado máximo, remove metadados e recomprime em JPEG"""
+    if not IMAGE_PREPROCESS_ENABLED:
+        return data
+    return reencode_image(data, max_edge, quality)
+
+
+def image_data_url(data, max_edge, quality=IMAGE_JPEG_QUALITY):
+    """Reduz a foto e devolve como data URL base64 (imagem inline na chamada ao modelo)"""
+    encoded = base64.b64encode(reencode_image(data, max_edge, quality)).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def reencode_image(data, max_edge, quality):
+    """Orientação EXIF + redução + JPEG sem metadados (sempre aplicado, independente da config)"""
+    with Image.open(io.BytesIO(data)) as original:
+        has_metadata = bool(original.info.get("exif") or original.info.get("icc_profile"))
+        # JPEG: decodifica já reduzido (escala DCT 1/2, 1/4, 1/8) sem ficar abaixo do lado máximo
+        if original.format == "JPEG" and max(original.size) > max_edge:
+            scale = max_edge / max(original.size)
+            original.draft("RGB", (math.ceil(original.width * scale), math.ceil(original.height * scale)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        resized = max(image.size) > max_edge
+        if resized:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        # Sem exif=/icc_profile= o Pillow não copia metadados para o novo arquivo
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+
+    processed = output.getvalue()
+    # Foto já pequena e sem metadados: recomprimir só perderia qualidade
+    if not resized and not has_metadata and len(processed) >= len(data):
+        return data
+    return processed
+
+
+def fit_image_to_box(data, box_width_pt, box_height_pt, dpi=PDF_IMAGE_DPI, quality=PDF_IMAGE_QUALITY):
+    """Recorta no centro para a proporção da caixa e reduz para `dpi` no tamanho impresso (nunca amplia)"""
+    target_w = max(1, round(box_width_pt * dpi / 72))
+    target_h = max(1, round(box_height_pt * dpi / 72))
+    with Image.open(io.BytesIO(data)) as original:
+        if original.format == "JPEG":
+            # Orientações 5-8 giram 90°: o draft atua nas dimensões antes da rotação
+            draft_w, draft_h = target_w, target_h
+            if original.getexif().get(0x0112) in (5, 6, 7, 8):
+                draft_w, draft_h = target_h, target_w
+            # Escala de cobertura: depois do recorte ainda sobra >= alvo nos dois eixos
+            scale = max(draft_w / original.width, draft_h / original.height)
+            if scale < 1:
+                original.draft("RGB", (math.ceil(original.width * scale), math.ceil(original.height * scale)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        box_ratio = target_w / target_h
+        width, height = image.size
+        if width / height > box_ratio:
+            crop_w, crop_h = round(height * box_ratio), height
+        else:
+            crop_w, crop_h = width, round(width / box_ratio)
+        left = (width - crop_w) // 2
+        top = (height - crop_h) // 2
+        image = image.crop((left, top, left + crop_w, top + crop_h))
+        if crop_w > target_w:
+            image = image.resize((target_w, target_h), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
@@ -0,0 +1,309 @@
+# jobs.py - Fila de análises assíncronas (submit-and-poll)
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.services.logs import bind_request_id, get_logger, reset_request_id
+from app.services.metrics import observe_stage
+
+# Mesmo ciclo de vida modelado pela coluna analyses.status (001_initial.sql)
+JOB_STATUSES = ("pending", "processing", "completed", "failed")
+
+# ":memory:" mantém tudo em processo; um caminho de arquivo sobrevive a restarts
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", ":memory:")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+# Intervalo do janitor que apaga jobs, itens de lote e Idempotency-Keys vencidos
+JOB_PURGE_INTERVAL = int(os.getenv("JOB_PURGE_INTERVAL", "300"))
+# Lotes (/api/analyze/batch): análises simultâneas por lote (padrão e teto) e itens por chamada
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+
+log = get_logger("jobs")
+
+
+class QueueFullError(Exception):
+    """Fila de jobs cheia - cliente deve tentar novamente mais tarde"""
+
+
+class JobStore:
+    """Persistência dos jobs em SQLite (arquivo local ou memória)
+
+    Métodos síncronos protegidos por lock: chamadores no event loop usam asyncio.to_thread
+    (commits em arquivo fazem fsync).
+    """
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Conexão aberta no primeiro uso: importar o app (ex.: workers do pool de PDF) não toca no banco
+        self._open_lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _conn(self):
+        if self._connection is None:
+            with self._open_lock:
+                if self._connection is None:
+                    self._connection = self._connect()
+        return self._connection
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                  id TEXT PRIMARY KEY,
+                  status TEXT NOT NULL,
+                  payload TEXT NOT NULL,
+                  result TEXT,
+                  error_message TEXT,
+                  created_at REAL NOT NULL,
+                  started_at REAL,
+                  completed_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            # Ledger dos lotes (/api/analyze/batch): itens finalizados por batch_id
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batch_items (
+                  batch_id TEXT NOT NULL,
+                  item_id TEXT NOT NULL,
+                  status TEXT NOT NULL,
+                  result TEXT,
+                  error_message TEXT,
+                  completed_at REAL NOT NULL,
+                  PRIMARY KEY (batch_id, item_id)
+                )
+                """
+            )
+            # Respostas já entregues por Idempotency-Key (retries devolvem a mesma resposta)
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                  key TEXT PRIMARY KEY,
+                  request_key TEXT NOT NULL,
+                  status_code INTEGER NOT NULL,
+                  response TEXT NOT NULL,
+                  created_at REAL NOT NULL
+                )
+                """
+            )
+        return conn
+
+    def create(self, payload):
+        """Registra um novo job como 'pending' e retorna seu id"""
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, 'pending', ?, ?)",
+                (job_id, json.dumps(payload), time.time()),
+            )
+        return job_id
+
+    def mark_processing(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'processing', started_at = ? WHERE id = ?",
+                (time.time(), job_id),
+            )
+
+    def mark_completed(self, job_id, result):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, completed_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def mark_failed(self, job_id, error_message):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error_message = ?, completed_at = ? WHERE id = ?",
+                (error_message, time.time(), job_id),
+            )
+
+    def get(self, job_id):
+        """Retorna o job como dict ou None se não existir"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def record_batch_item(self, batch_id, item_id, status, result=None, error_message=None):
+        """Grava (ou sobrescreve, em uma nova tentativa) o desfecho de um item do lote"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_items "
+                "(batch_id, item_id, status, result, error_message, completed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (batch_id, item_id, status, json.dumps(result) if result is not None else None,
+                 error_message, time.time()),
+            )
+
+    def batch_items(self, batch_id):
+        """Itens já finalizados do lote: {item_id: {"status", "result", "error_message"}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, status, result, error_message FROM batch_items WHERE batch_id = ?",
+                (batch_id,),
+            ).fetchall()
+        return {
+            row["item_id"]: {
+                "status": row["status"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+                "error_message": row["error_message"],
+            }
+            for row in rows
+        }
+
+    def save_idempotent(self, key, request_key, status_code, response):
+        """Guarda a resposta de uma Idempotency-Key; a primeira gravada prevalece"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO idempotency_keys "
+                "(key, request_key, status_code, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, request_key, status_code, json.dumps(response), time.time()),
+            )
+
+    def idempotent_response(self, key):
+        """{"request_key", "status_code", "response"} da Idempotency-Key ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT request_key, status_code, response FROM idempotency_keys WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "request_key": row["request_key"],
+            "status_code": row["status_code"],
+            "response": json.loads(row["response"]),
+        }
+
+    def recover(self):
+        """Volta jobs interrompidos para 'pending' e retorna os ids a reprocessar"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL WHERE status = 'processing'"
+            )
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'pending' ORDER BY created_at"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, older_than):
+        """Remove jobs finalizados antes do timestamp informado"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND completed_at < ?",
+                (older_than,),
+            )
+            self._conn.execute("DELETE FROM batch_items WHERE completed_at < ?", (older_than,))
+            self._conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (older_than,))
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class JobQueue:
+    """Fila limitada processada por um pool fixo de workers asyncio
+
+    Cada job é executado como `await handler(job_id, payload)`. O SQLite é acessado
+    em threads (asyncio.to_thread), nunca no event loop.
+    """
+
+    def __init__(self, store, handler, workers=JOB_WORKERS, maxsize=JOB_QUEUE_SIZE):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._queue = None
+        self._tasks = []
+        self._submitting = 0  # jobs sendo gravados, ainda fora da fila (conta no limite)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        # Jobs que ficaram pendentes de uma execução anterior (SQLite em arquivo)
+        for job_id in await asyncio.to_thread(self.store.recover):
+            self._queue.put_nowait(job_id)
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        log.info("Fila de análises iniciada", extra={"workers": self.workers, "max_size": self.maxsize})
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, payload):
+        """Enfileira um job e retorna seu id; levanta QueueFullError se a fila estiver cheia"""
+        if self._queue is None:
+            raise RuntimeError("Fila de jobs não iniciada")
+        if self._queue.qsize() + self._submitting >= self.maxsize:
+            raise QueueFullError("Fila de análises cheia, tente novamente em instantes")
+        self._submitting += 1
+        try:
+            job_id = await asyncio.to_thread(self.store.create, payload)
+        finally:
+            self._submitting -= 1
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def run_janitor(self, interval=JOB_PURGE_INTERVAL, retention=JOB_RETENTION_SECONDS):
+        """Loop em background (iniciado no lifespan): apaga o que passou da retenção"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.store.purge, time.time() - retention)
+            except Exception as e:
+                log.warning("Janitor de jobs falhou", extra={"reason": str(e)})
+
+    def pending_count(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, index):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await asyncio.to_thread(self.store.get, job_id)
+                if job is None or job["status"] != "pending":
+                    continue
+                await asyncio.to_thread(self.store.mark_processing, job_id)
+                observe_stage("jobs", "queue_wait", time.time() - job["created_at"])
+                # Os logs do job carregam o job_id como request id
+                token = bind_request_id(job_id)
+                try:
+                    log.info("Processando job", extra={"worker": index})
+                    result = await self.handler(job_id, job["payload"])
+                except Exception as e:
+                    log.error("Job falhou", extra={"error": type(e).__name__, "reason": str(e)})
+                    await asyncio.to_thread(self.store.mark_failed, job_id, f"Erro na análise: {str(e)}")
+                else:
+                    await asyncio.to_thread(self.store.mark_completed, job_id, result)
+                    log.info("Job concluído")
+                finally:
+                    reset_request_id(token)
+            finally:
+                self._queue.task_done()
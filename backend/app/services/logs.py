@@ -0,0 +1,82 @@
+# logs.py - Logs estruturados em JSON (uma linha por evento) com o request id corrente
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (padrão, para agregadores) ou "text" (leitura no terminal durante o desenvolvimento)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Id da requisição HTTP (ou do job) em andamento; tarefas filhas herdam o contexto
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Atributos padrão do LogRecord; o que vier além disso (extra=...) vira campo do JSON
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def bind_request_id(request_id):
+    """Define o request id do contexto atual; retorna o token para reset"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None) or get_request_id()
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = _fields(record)
+        request_id = fields.pop("request_id", None) or get_request_id()
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if request_id:
+            line += f" [{request_id}]"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Instala o handler do logger "glowmetrics" (idempotente)"""
+    root = logging.getLogger("glowmetrics")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+        root.addHandler(handler)
+        root.propagate = False
+    root.setLevel(level)
+    return root
+
+
+def get_logger(name):
+    """Logger filho de "glowmetrics" (ex.: get_logger("analysis") → glowmetrics.analysis)"""
+    return logging.getLogger(f"glowmetrics.{name}")
@@ -0,0 +1,253 @@
+# metrics.py - Métricas em formato texto do Prometheus (contadores, gauges e histogramas)
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.logs import get_logger
+
+# Segundos: de operações locais (ms) até runs longos do Assistants (minutos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+log = get_logger("stages")
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _Value(_Metric):
+    """Um número por combinação de labels (base de Counter e Gauge)"""
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels_text(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Value):
+    kind = "counter"
+
+
+class Gauge(_Value):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track(self, **labels):
+        """Incrementa enquanto o bloco executa (operações em andamento)"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels_text(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Métricas registradas + coletores chamados no scrape (estatísticas que já existem nos serviços)"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """`collector()` retorna métricas já preenchidas (Counter/Gauge) a cada scrape"""
+        self._collectors.append(collector)
+
+    def render(self):
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "glowmetrics_http_requests_total", "Requisições HTTP por rota, método e status",
+    ("route", "method", "status"))
+HTTP_DURATION = REGISTRY.histogram(
+    "glowmetrics_http_request_duration_seconds", "Latência das requisições HTTP até a resposta (headers)",
+    ("route", "method"))
+IN_FLIGHT = REGISTRY.gauge(
+    "glowmetrics_in_flight", "Operações em andamento (http, analysis, openai_run, pdf)",
+    ("operation",))
+STAGE_DURATION = REGISTRY.histogram(
+    "glowmetrics_stage_duration_seconds", "Duração de cada etapa dos pipelines de análise e PDF",
+    ("pipeline", "stage"))
+OPENAI_CALLS = REGISTRY.counter(
+    "glowmetrics_openai_calls_total", "Chamadas à API da OpenAI por operação e resultado",
+    ("operation", "outcome"))
+OPENAI_DURATION = REGISTRY.histogram(
+    "glowmetrics_openai_call_duration_seconds", "Latência das chamadas à API da OpenAI",
+    ("operation",))
+PAYLOAD_BYTES = REGISTRY.counter(
+    "glowmetrics_payload_bytes_total", "Bytes processados por tipo (download, upload, PDF, ...)",
+    ("kind",))
+
+
+@contextmanager
+def stage(pipeline, name, **fields):
+    """Cronometra uma etapa: histograma + uma linha de log com a duração
+
+    O dict retornado recebe campos extras para o log (ex.: bytes processados).
+    Em caso de erro a duração também é registrada, com o campo "error".
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["error"] = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, pipeline=pipeline, stage=name)
+        log.info(f"{pipeline}.{name}", extra={
+            "pipeline": pipeline, "stage": name, "duration_ms": round(elapsed * 1000, 1), **fields
+        })
+
+
+def observe_stage(pipeline, name, seconds):
+    """Registra a duração de uma etapa medida fora de um bloco `with stage(...)`"""
+    STAGE_DURATION.observe(seconds, pipeline=pipeline, stage=name)
+
+
+def add_bytes(kind, amount):
+    PAYLOAD_BYTES.inc(amount, kind=kind)
+
+
+def cache_collector(caches):
+    """Coletor de hits/misses/hit ratio a partir do stats() de cada cache
+
+    `caches` mapeia nome → função stats(); os acertos são a soma das chaves "hits*"
+    (ex.: hits_memory + hits_disk) e as faltas vêm de "misses".
+    """
+    def collect():
+        hits = Counter("glowmetrics_cache_hits_total", "Acertos por cache", ("cache",))
+        misses = Counter("glowmetrics_cache_misses_total", "Faltas por cache", ("cache",))
+        ratio = Gauge("glowmetrics_cache_hit_ratio", "Taxa de acerto por cache desde o início do processo", ("cache",))
+        for name, read in caches.items():
+            stats = read()
+            cache_hits = sum(value for key, value in stats.items() if key.startswith("hits"))
+            cache_misses = stats["misses"]
+            hits.inc(cache_hits, cache=name)
+            misses.inc(cache_misses, cache=name)
+            lookups = cache_hits + cache_misses
+            ratio.set(round(cache_hits / lookups, 4) if lookups else 0.0, cache=name)
+        return [hits, misses, ratio]
+    return collect
+
+
+def gauge_collector(name, documentation, read):
+    """Coletor de um gauge sem labels lido no scrape (ex.: tamanho da fila de jobs)"""
+    def collect():
+        gauge = Gauge(name, documentation)
+        gauge.set(read())
+        return [gauge]
+    return collect
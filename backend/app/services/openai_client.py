@@ -0,0 +1,193 @@
+# openai_client.py - Cliente OpenAI compartilhado por worker (criado no lifespan do FastAPI)
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from dotenv import load_dotenv
+
+from app.services.logs import get_logger
+from app.services.metrics import OPENAI_CALLS, OPENAI_DURATION
+
+try:
+    from openai import APIConnectionError, APIError, APIStatusError, APITimeoutError, AsyncOpenAI
+    OPENAI_AVAILABLE = True
+    load_dotenv()
+except ImportError:
+    OPENAI_AVAILABLE = False
+    # Placeholders para os except; sem o pacote init_openai_client() já falha antes
+    class APIError(Exception):
+        pass
+
+    class APIStatusError(APIError):
+        status_code = None
+
+    class APIConnectionError(APIError):
+        pass
+
+    class APITimeoutError(APIConnectionError):
+        pass
+
+log = get_logger("openai")
+
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "50"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "false").lower() == "true"
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# Endpoint alternativo compatível (ex.: benchmarks/mock_openai.py para testes de carga sem custo)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+
+def get_openai_token():
+    """Carrega token da API OpenAI"""
+    token = os.getenv("open_ai_token")
+    if not token:
+        token = os.getenv("OPENAI_API_KEY")
+    return token
+
+
+class PoolStats:
+    """Contadores de uso do pool de conexões (reuso vs conexões novas)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.connection_failures = 0
+
+    def incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            requests = self.requests
+            opened = self.connections_opened
+            data = {
+                "requests": requests,
+                "connections_opened": opened,
+                "tls_handshakes": self.tls_handshakes,
+                "connection_failures": self.connection_failures,
+            }
+        data["connections_reused"] = max(0, requests - opened)
+        data["reuse_ratio"] = round(data["connections_reused"] / requests, 4) if requests else 0.0
+        return data
+
+
+_client = None
+_http_client = None
+_stats = PoolStats()
+
+
+async def _trace(event_name, info):
+    """Callback de trace do httpcore: identifica conexões novas no pool"""
+    if event_name == "connection.connect_tcp.complete":
+        _stats.incr("connections_opened")
+    elif event_name == "connection.start_tls.complete":
+        _stats.incr("tls_handshakes")
+    elif event_name == "connection.connect_tcp.failed":
+        _stats.incr("connection_failures")
+
+
+async def _on_request(request):
+    _stats.incr("requests")
+    request.extensions["trace"] = _trace
+
+
+def _http2_enabled():
+    if OPENAI_HTTP2 and importlib.util.find_spec("h2") is None:
+        log.warning("OPENAI_HTTP2=true mas o pacote 'h2' não está instalado; usando HTTP/1.1")
+        return False
+    return OPENAI_HTTP2
+
+
+def init_openai_client():
+    """Cria o cliente OpenAI/httpx do processo (idempotente)"""
+    global _client, _http_client
+    if _client is not None:
+        return _client
+    if not OPENAI_AVAILABLE:
+        raise Exception("OpenAI não disponível. Instale: pip install openai python-dotenv")
+
+    token = get_openai_token()
+    if not token:
+        raise Exception("Token OpenAI não encontrado. Configure 'open_ai_token' no arquivo .env")
+
+    http2 = _http2_enabled()
+    # trust_env=False ignora HTTP(S)_PROXY sem precisar alterar os.environ
+    _http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        http2=http2,
+        trust_env=False,
+        event_hooks={"request": [_on_request]},
+    )
+    _client = AsyncOpenAI(
+        api_key=token,
+        base_url=OPENAI_BASE_URL,
+        http_client=_http_client,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+    log.info("Cliente OpenAI inicializado", extra={
+        "max_connections": OPENAI_MAX_CONNECTIONS, "max_keepalive": OPENAI_MAX_KEEPALIVE, "http2": http2,
+        "base_url": str(_client.base_url)
+    })
+    return _client
+
+
+def get_openai_client():
+    """Retorna o cliente compartilhado, criando-o sob demanda (scripts sem lifespan)"""
+    return _client if _client is not None else init_openai_client()
+
+
+async def close_openai_client():
+    """Fecha o pool de conexões (shutdown do FastAPI)"""
+    global _client, _http_client
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _http_client = None
+
+
+def pool_stats():
+    """Métricas de reuso do pool de conexões da OpenAI"""
+    return _stats.snapshot()
+
+
+def classify_openai_error(error):
+    """Resultado da chamada para o contador de métricas (cardinalidade baixa)"""
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, APIStatusError):
+        return "rate_limited" if error.status_code == 429 else f"http_{error.status_code}"
+    if isinstance(error, (APITimeoutError, TimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, (APIConnectionError, httpx.TransportError)):
+        return "connection_error"
+    return "error"
+
+
+@contextmanager
+def track_openai_call(operation):
+    """Conta e cronometra uma chamada à OpenAI (operation: "files.create", "runs.stream", ...)"""
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException as e:
+        outcome = classify_openai_error(e)
+        raise
+    finally:
+        OPENAI_CALLS.inc(operation=operation, outcome=outcome)
+        OPENAI_DURATION.observe(time.perf_counter() - start, operation=operation)
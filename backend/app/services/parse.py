@@ -1,95 +1,262 @@
 # parse.py - Parser de resposta do ChatGPT
 import json
+import re
+from typing import Annotated, Optional, Union
+
+from pydantic import AfterValidator, TypeAdapter, ValidationError
+from typing_extensions import TypedDict
+
+VALID_SCORES = ("A", "B", "C", "D", "E", "F")
+DEFAULT_DESCRIPTION = "Região analisada"
+
+# Métricas por região, na ordem do prompt (build_prompt) e do resultado
+AREA_METRICS = {
+    "forehead": ("wrinkle_reduction", "smoothness_improvement"),
+    "nose": ("texture_improvement",),
+    "under_eye": ("brightness_improvement", "uniformity_improvement", "texture_improvement"),
+}
+# overall_score: testa = melhor métrica, nariz = textura, infraorbital = média
+OVERALL_SCORE = {
+    "forehead": max,
+    "nose": lambda values: values[0],
+    "under_eye": lambda values: sum(values) / len(values),
+}
+
+
+class ModelOutputError(Exception):
+    """Resposta do modelo sem um JSON válido no schema esperado (candidata ao reparo)"""
+
+
+def _number_text(value):
+    """Números enviados como texto: "22", "22%", "2,5" (vícios comuns do modelo)"""
+    value = value.strip().rstrip("%").strip().replace(",", ".")
+    return float(value) if "." in value else int(value)
+
+
+# int/float são validados no núcleo do pydantic; só texto passa por Python
+Number = Union[int, float, Annotated[str, AfterValidator(_number_text)]]
+# Score aceita número ("score": 3): _score normaliza, sem gastar um reparo com isso
+Score = Union[str, int, float, None]
+
+
+class ForeheadMetrics(TypedDict, total=False):
+    wrinkle_reduction: Number
+    smoothness_improvement: Number
+
+
+class NoseMetrics(TypedDict, total=False):
+    texture_improvement: Number
+
+
+class UnderEyeMetrics(TypedDict, total=False):
+    brightness_improvement: Number
+    uniformity_improvement: Number
+    texture_improvement: Number
+
+
+class ForeheadArea(TypedDict, total=False):
+    score: Score
+    description: Optional[str]
+    metrics: ForeheadMetrics
+
+
+class NoseArea(TypedDict, total=False):
+    score: Score
+    description: Optional[str]
+    metrics: NoseMetrics
+
+
+class UnderEyeArea(TypedDict, total=False):
+    score: Score
+    description: Optional[str]
+    metrics: UnderEyeMetrics
+
+
+class Areas(TypedDict, total=False):
+    forehead: Optional[ForeheadArea]
+    nose: Optional[NoseArea]
+    under_eye: Optional[UnderEyeArea]
+
+
+class ApparentAge(TypedDict, total=False):
+    after: Number
+    reduction: Number
+
+
+class GlobalAnalysis(TypedDict, total=False):
+    apparent_age: ApparentAge
+    harmony: Number
+
+
+# Schema do JSON pedido no prompt; "global" é palavra reservada, por isso a forma funcional
+ModelOutput = TypedDict("ModelOutput", {"areas": Areas, "global": GlobalAnalysis}, total=False)
+
+# Validador compilado uma vez (núcleo em Rust); TypedDicts evitam instanciar modelos por resposta
+MODEL_OUTPUT = TypeAdapter(ModelOutput)
+
+
+# Fora de strings só interessam aspas e delimitadores; dentro, a aspa de fechamento e escapes
+_STRUCTURAL = re.compile(r"[\"'{}\[\]]")
+_IN_STRING = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\"\\]")}
+
+
+def _drop_trailing_comma(out):
+    """Remove a vírgula (e espaços) emitida logo antes de um "}" ou "]" """
+    while out and not out[-1].strip():
+        out.pop()
+    if out and out[-1].rstrip().endswith(","):
+        out[-1] = out[-1].rstrip()[:-1]
+
+
+def _scan_object(text, start):
+    """Varre um objeto a partir do "{" em `start` em uma passada, normalizando vícios de LLM
+
+    Salta entre caracteres estruturais (regex pré-compiladas), copiando trechos inteiros.
+    Remove vírgulas finais antes de "}"/"]" e converte strings entre aspas simples para
+    aspas duplas. Retorna (json normalizado, índice após o objeto) ou (None, None) se o
+    objeto não fechar (resposta truncada).
+    """
+    out = []
+    depth = 0
+    i = start
+    while True:
+        match = _STRUCTURAL.search(text, i)
+        if match is None:
+            return None, None
+        j = match.start()
+        ch = text[j]
+        out.append(text[i:j])
+        i = j + 1
+        if ch in "{[":
+            depth += 1
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            out.append(ch)
+            depth -= 1
+            if depth == 0:
+                return "".join(out), i
+        else:
+            out.append('"')
+            inner = _IN_STRING[ch]
+            while True:
+                match = inner.search(text, i)
+                if match is None:
+                    return None, None
+                k = match.start()
+                found = text[k]
+                out.append(text[i:k])
+                if found == "\\":
+                    escaped = text[k + 1:k + 2]
+                    # \' só é válido entre aspas simples; em JSON vira apenas '
+                    out.append("'" if escaped == "'" else found + escaped)
+                    i = k + 2
+                elif found == ch:
+                    out.append('"')
+                    i = k + 1
+                    break
+                else:
+                    # Aspas duplas dentro de string entre aspas simples
+                    out.append('\\"')
+                    i = k + 1
+
+
+def _is_analysis(data):
+    # Objetos internos (ex.: "metrics") também são JSON válido: só vale o que tem as chaves da raiz
+    return isinstance(data, dict) and ("areas" in data or "global" in data)
+
+
+def extract_json_object(text):
+    """Primeiro objeto JSON da análise no texto, tolerando vícios comuns de LLM
+
+    Varre a partir de cada "{" fora de objetos já vistos (prosa com chaves, blocos
+    ```json); objetos balanceados sem "areas"/"global" são pulados inteiros.
+    Levanta ModelOutputError se não houver objeto completo.
+    """
+    position = text.find("{")
+    if position < 0:
+        raise ModelOutputError("Nenhum objeto JSON na resposta")
+    while position >= 0:
+        normalized, end = _scan_object(text, position)
+        if normalized is None:
+            break
+        try:
+            data = json.loads(normalized, strict=False)
+            if _is_analysis(data):
+                return data
+        except json.JSONDecodeError:
+            pass
+        position = text.find("{", end)
+    raise ModelOutputError("JSON incompleto ou inválido na resposta")
+
+
+def _schema_error(error):
+    first = error.errors()[0]
+    location = ".".join(map(str, first["loc"]))
+    return ModelOutputError(f"JSON fora do schema ({error.error_count()} erro(s)): {location}: {first['msg']}")
+
+
+def _score(value):
+    """Score A-F (maiúsculo); qualquer outro valor vira "D" (estável)"""
+    if isinstance(value, str) and value.strip().upper() in VALID_SCORES:
+        return value.strip().upper()
+    return "D"
+
 
 def parse_chatgpt_response(response_text):
-    """Converte resposta do ChatGPT para formato esperado pelo PDF"""
+    """Converte resposta do ChatGPT para formato esperado pelo PDF
+
+    Caminho rápido: valida direto o trecho entre o primeiro "{" e o último "}" (parse e
+    validação em uma passada no pydantic). Se não for JSON válido (prosa com chaves,
+    vírgulas finais, aspas simples...), extrai o objeto com extract_json_object.
+    Levanta ModelOutputError quando não há JSON válido no schema (a análise pode
+    então pedir um reparo barato em vez de refazer o run).
+    """
     if not response_text:
         return None
-    
+
+    start = response_text.find("{")
+    end = response_text.rfind("}") + 1
+    if start < 0 or end <= start:
+        raise ModelOutputError("Nenhum objeto JSON na resposta")
     try:
-        text = response_text.strip()
-        
-        # Remover markdown code blocks se existir
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        
-        # Tentar parse direto
-        data = json.loads(text)
-        
-        # Converter para formato esperado
-        result = {
-            "areas": {},
-            "global": {}
-        }
-        
-        # Áreas
-        areas_data = data.get("areas", {})
-        
-        # Validar scores (A-F)
-        def validate_score(score):
-            if isinstance(score, str) and score.upper() in ["A", "B", "C", "D", "E", "F"]:
-                return score.upper()
-            return "D"
-        
-        if "forehead" in areas_data:
-            fh = areas_data["forehead"]
-            metrics = fh.get("metrics", {})
-            result["areas"]["forehead"] = {
-                "wrinkle_reduction": metrics.get("wrinkle_reduction", 0),
-                "smoothness_improvement": metrics.get("smoothness_improvement", 0),
-                "overall_score": max(metrics.get("wrinkle_reduction", 0), metrics.get("smoothness_improvement", 0)),
-                "score": validate_score(fh.get("score", "D")),
-                "description": fh.get("description", "Região analisada")
-            }
-        
-        if "nose" in areas_data:
-            nose = areas_data["nose"]
-            metrics = nose.get("metrics", {})
-            result["areas"]["nose"] = {
-                "texture_improvement": metrics.get("texture_improvement", 0),
-                "overall_score": metrics.get("texture_improvement", 0),
-                "score": validate_score(nose.get("score", "D")),
-                "description": nose.get("description", "Região analisada")
-            }
-        
-        if "under_eye" in areas_data:
-            ue = areas_data["under_eye"]
-            metrics = ue.get("metrics", {})
-            improvements = [
-                metrics.get("brightness_improvement", 0),
-                metrics.get("uniformity_improvement", 0),
-                metrics.get("texture_improvement", 0)
-            ]
-            avg = sum(improvements) / len(improvements) if improvements else 0
-            result["areas"]["under_eye"] = {
-                "brightness_improvement": metrics.get("brightness_improvement", 0),
-                "uniformity_improvement": metrics.get("uniformity_improvement", 0),
-                "texture_improvement": metrics.get("texture_improvement", 0),
-                "overall_score": avg,
-                "score": validate_score(ue.get("score", "D")),
-                "description": ue.get("description", "Região analisada")
-            }
-        
-        # Global
-        global_data = data.get("global", {})
-        age_data = global_data.get("apparent_age", {})
-        
-        result["global"]["apparent_age"] = {
-            "after": age_data.get("after", 35),
-            "reduction": age_data.get("reduction", 0)
-        }
-        
-        result["global"]["symmetry"] = {
-            "after": global_data.get("harmony", 85),
-            "improvement": 0
+        data = MODEL_OUTPUT.validate_json(response_text[start:end])
+    except ValidationError as e:
+        if not any(error["type"] == "json_invalid" for error in e.errors()):
+            raise _schema_error(e) from e
+        try:
+            data = MODEL_OUTPUT.validate_python(extract_json_object(response_text))
+        except ValidationError as e:
+            raise _schema_error(e) from e
+    if "areas" not in data and "global" not in data:
+        raise ModelOutputError("JSON sem as chaves \"areas\"/\"global\"")
+
+    result = {
+        "areas": {},
+        "global": {}
+    }
+    areas = data.get("areas") or {}
+    for area_key, metric_keys in AREA_METRICS.items():
+        area = areas.get(area_key)
+        if area is None:
+            continue
+        metrics = area.get("metrics") or {}
+        values = {key: metrics.get(key, 0) for key in metric_keys}
+        result["areas"][area_key] = {
+            **values,
+            "overall_score": OVERALL_SCORE[area_key](list(values.values())),
+            "score": _score(area.get("score")),
+            "description": area.get("description") or DEFAULT_DESCRIPTION
         }
-        
-        return result
-        
-    except json.JSONDecodeError as e:
-        raise Exception(f"Erro ao parsear JSON: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Erro ao processar resposta: {str(e)}")
 
+    global_data = data.get("global") or {}
+    age_data = global_data.get("apparent_age") or {}
+    result["global"]["apparent_age"] = {
+        "after": age_data.get("after", 35),
+        "reduction": age_data.get("reduction", 0)
+    }
+    result["global"]["symmetry"] = {
+        "after": global_data.get("harmony", 85),
+        "improvement": 0
+    }
+    return result
@@ -1,9 +1,20 @@
 # pdf.py - Geração de PDF profissional
+import hashlib
+import io
+from functools import lru_cache
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from datetime import datetime
 
+# Versão do layout: incrementar a cada mudança visual neste arquivo (invalida o cache de PDFs)
+PDF_TEMPLATE_VERSION = "1"
+
+# Caixa (largura, altura em pt) onde cada foto antes/depois é desenhada
+PHOTO_BOX_PT = (115, 145)
+
 # Importar paleta do compare.py original
 class ClinicPalette:
     BG_MAIN = colors.HexColor('#FDF8F6')
@@ -25,16 +36,23 @@ class ClinicPalette:
     BORDER = colors.HexColor('#E8E0DC')
     BORDER_ACCENT = colors.HexColor('#D4A5A5')
 
+def blend_color(color, background, alpha):
+    """Cor já composta sobre um fundo liso. O chrome vira Form XObject e o reportlab não leva
+    o ExtGState (setFillAlpha) para os recursos do form, então a transparência é pré-calculada"""
+    return colors.Color(
+        color.red * alpha + background.red * (1 - alpha),
+        color.green * alpha + background.green * (1 - alpha),
+        color.blue * alpha + background.blue * (1 - alpha),
+    )
+
 def draw_clinic_background(c, w, h):
     """Desenha fundo elegante de clínica estética"""
     P = ClinicPalette
     c.setFillColor(P.BG_MAIN)
     c.rect(0, 0, w, h, fill=1, stroke=0)
-    c.setFillColor(P.ROSE_LIGHT)
-    c.setFillAlpha(0.3)
+    c.setFillColor(blend_color(P.ROSE_LIGHT, P.BG_MAIN, 0.3))
     c.circle(w + 50, h - 100, 200, fill=1, stroke=0)
     c.circle(-80, 150, 180, fill=1, stroke=0)
-    c.setFillAlpha(1)
 
 def draw_clinic_header(c, w, h):
     """Desenha header elegante com logo GlowMetrics"""
@@ -51,10 +69,8 @@ def draw_clinic_header(c, w, h):
     c.setFont("Helvetica", 11)
     c.drawString(30, h - 65, "Relatório de Resultados Estéticos")
     logo_x = w - 145
-    c.setFillColor(P.GOLD)
-    c.setFillAlpha(0.15)
+    c.setFillColor(blend_color(P.GOLD, colors.white, 0.15))
     c.circle(logo_x + 12, h - 45, 20, fill=1, stroke=0)
-    c.setFillAlpha(1)
     c.setStrokeColor(P.ROSE)
     c.setLineWidth(2)
     c.circle(logo_x + 12, h - 45, 12, fill=0, stroke=1)
@@ -68,10 +84,63 @@ def draw_clinic_header(c, w, h):
     c.setFillColor(P.TEXT_LIGHT)
     c.setFont("Helvetica", 7)
     c.drawString(logo_x + 32, h - 52, "Análise de Beleza Inteligente")
+
+# generated_at = UNDATED: PDF sem a linha de data (documento reaproveitável sem carimbo vencido).
+# Texto e não object(): o valor atravessa o pickle do pool de processos.
+UNDATED = "undated"
+
+def format_report_date(generated_at=None):
+    """Carimbo de data impresso no header (agora, se não informado; horário local do servidor)"""
+    if generated_at is None:
+        generated_at = datetime.now()
+    elif generated_at.tzinfo is not None:
+        generated_at = generated_at.astimezone()
+    return generated_at.strftime('%d/%m/%Y às %H:%M')
+
+def draw_clinic_date(c, w, h, generated_at=None):
+    """Data de geração no header (fica fora do form: muda a cada documento); nada com UNDATED"""
+    if generated_at == UNDATED:
+        return
+    P = ClinicPalette
+    c.setFillColor(P.TEXT_LIGHT)
+    c.setFont("Helvetica", 8)
+    c.drawRightString(w - 30, h - 78, format_report_date(generated_at))
+
+def draw_clinic_footer(c, w, h):
+    """Desenha rodapé com disclaimer e assinatura GlowMetrics"""
+    P = ClinicPalette
+    c.setStrokeColor(P.GOLD)
+    c.setLineWidth(0.8)
+    c.line(30, 62, w - 30, 62)
+    c.setFillColor(P.TEXT_LIGHT)
+    c.setFont("Helvetica", 7)
+    disclaimer = "*Análise realizada por Inteligência Artificial. Não substitui avaliação médica profissional."
+    c.drawCentredString(w/2, 48, disclaimer)
+    c.setFillColor(P.ROSE_DARK)
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(30, 28, "GlowMetrics")
     c.setFillColor(P.TEXT_LIGHT)
     c.setFont("Helvetica", 8)
-    date_str = datetime.now().strftime('%d/%m/%Y às %H:%M')
-    c.drawRightString(w - 30, h - 78, date_str)
+    c.drawString(92, 28, "• Análise de Beleza Inteligente")
+    c.setFillColor(P.TEXT_LIGHT)
+    c.setFont("Helvetica", 7)
+    c.drawRightString(w - 30, 28, "v2.0 Clinic Edition")
+
+CHROME_FORM = "clinic_chrome"
+
+def draw_clinic_chrome(c, w, h, generated_at=None):
+    """Fundo, header e rodapé estáticos: gravados uma vez por documento como Form XObject e
+    reutilizados (doForm) em todas as páginas em vez de repetir as operações de desenho"""
+    if not c.hasForm(CHROME_FORM):
+        c.saveState()
+        c.beginForm(CHROME_FORM, lowerx=0, lowery=0, upperx=w, uppery=h)
+        draw_clinic_background(c, w, h)
+        draw_clinic_header(c, w, h)
+        draw_clinic_footer(c, w, h)
+        c.endForm()
+        c.restoreState()
+    c.doForm(CHROME_FORM)
+    draw_clinic_date(c, w, h, generated_at)
 
 def draw_metric_card_clinic(c, x, y, w_card, h_card, title, value, suffix="", improvement=None, color=None, P=None):
     """Desenha um card de métrica estilo clínica"""
@@ -118,23 +187,32 @@ def get_score_color(score, P):
     }
     return colors_map.get(score, P.TEXT_MEDIUM)
 
+@lru_cache(maxsize=4096)
+def text_width(text, font_name, font_size):
+    """stringWidth memoizado por palavra/fonte/tamanho (as fontes base não têm kerning: larguras somam)"""
+    return stringWidth(text, font_name, font_size)
+
 def wrap_text(c, text, max_width, font_name, font_size):
-    """Quebra texto em múltiplas linhas baseado na largura máxima"""
+    """Quebra texto em múltiplas linhas baseado na largura máxima (cada palavra é medida uma vez)"""
     if not text:
         return []
     c.setFont(font_name, font_size)
+    space_width = text_width(' ', font_name, font_size)
     words = text.split()
     lines = []
     current_line = []
+    line_width = 0.0
     for word in words:
-        test_line = ' '.join(current_line + [word])
-        width = c.stringWidth(test_line, font_name, font_size)
+        word_width = text_width(word, font_name, font_size)
+        width = line_width + space_width + word_width if current_line else word_width
         if width <= max_width:
             current_line.append(word)
+            line_width = width
         else:
             if current_line:
                 lines.append(' '.join(current_line))
                 current_line = [word]
+                line_width = word_width
             else:
                 lines.append(word)
     if current_line:
@@ -199,13 +277,117 @@ def draw_region_card_clinic(c, x, y, w_card, title, subtitle, metrics, data, col
     c.drawText(subtitle_text)
     return h_card
 
-def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
-    """Gera PDF profissional com estética de Clínica Estética"""
+# Regiões do relatório, na ordem em que aparecem
+AREA_CONFIG = {
+    "forehead": {
+        "name": "Região Frontal",
+        "subtitle": "Toxina Botulínica",
+        "color": ClinicPalette.ROSE,
+        "metrics": [("wrinkle_reduction", "Linhas"), ("smoothness_improvement", "Suavização")],
+        "phrases": {
+            "A": "Linhas de expressão visivelmente mais suaves",
+            "B": "Boa redução nas linhas de expressão",
+            "C": "Melhoria moderada na região",
+            "D": "Região em estabilização",
+            "E": "Região em processo de adaptação"
+        }
+    },
+    "nose": {
+        "name": "Região Nasal",
+        "subtitle": "Refinamento",
+        "color": ClinicPalette.GOLD,
+        "metrics": [("texture_improvement", "Textura")],
+        "phrases": {
+            "A": "Textura visivelmente mais refinada",
+            "B": "Boa melhoria na textura da pele",
+            "C": "Melhoria moderada na textura",
+            "D": "Região em estabilização",
+            "E": "Região em processo de adaptação"
+        }
+    },
+    "under_eye": {
+        "name": "Área Infraorbital",
+        "subtitle": "Preenchimento",
+        "color": ClinicPalette.TAUPE,
+        "metrics": [("brightness_improvement", "Clareamento"), ("uniformity_improvement", "Uniformidade"), ("texture_improvement", "Textura")],
+        "phrases": {
+            "A": "Área visivelmente mais iluminada e uniforme",
+            "B": "Boa melhoria na luminosidade e textura",
+            "C": "Melhoria moderada na região",
+            "D": "Região em estabilização",
+            "E": "Verifique a ordem das imagens",
+            "F": "Consulte seu profissional"
+        }
+    }
+}
+AREA_ORDER = ["forehead", "nose", "under_eye"]
+
+def resolve_area_score(config, data):
+    """Score A-F e descrição da região (derivados das métricas quando o modelo não enviou)"""
+    score = data.get("score")
+    description = data.get("description")
+    if not score or not description:
+        avg_metrics = data.get("overall_score", 0)
+        if avg_metrics == 0:
+            metric_values = []
+            for metric_key, _ in config["metrics"]:
+                if metric_key in data:
+                    metric_values.append(data[metric_key])
+            avg_metrics = sum(metric_values) / len(metric_values) if metric_values else 0
+        if avg_metrics >= 30:
+            score = "A"
+        elif avg_metrics >= 15:
+            score = "B"
+        elif avg_metrics >= 5:
+            score = "C"
+        elif avg_metrics >= 0:
+            score = "D"
+        elif avg_metrics >= -10:
+            score = "E"
+        else:
+            score = "F"
+        if not description:
+            description = config["phrases"].get(score, "Região analisada")
+    return score, description
+
+def as_image_source(image, sources=None):
+    """Aceita caminho de arquivo ou bytes em memória para uso no drawImage
+
+    Com `sources` (dict por documento), a mesma foto vira um único ImageReader:
+    decodificada uma vez e embutida uma vez, referenciada nas demais páginas.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        if sources is None:
+            return ImageReader(io.BytesIO(image))
+        key = hashlib.sha256(image).hexdigest()
+        if key not in sources:
+            sources[key] = ImageReader(io.BytesIO(image))
+        return sources[key]
+    return image
+
+def warm_up():
+    """Carrega reportlab, métricas das fontes e o decoder de imagens (workers do pool de PDF)"""
+    from PIL import Image
+    photo = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(photo, format="JPEG")
+    c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+    for font_name in ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique"):
+        c.setFont(font_name, 10)
+        c.stringWidth("Análise Facial", font_name, 10)
+    c.drawImage(as_image_source(photo.getvalue()), 0, 0, width=8, height=8)
+    c.save()
+
+def make_clinic_pdf(before_image, after_image, analysis_results, out_pdf, generated_at=None):
+    """Gera PDF profissional com estética de Clínica Estética (fotos como caminho ou bytes)"""
     c = canvas.Canvas(out_pdf, pagesize=A4)
     w, h = A4
+    draw_clinic_chrome(c, w, h, generated_at)
+    draw_clinic_analysis(c, w, h, before_image, after_image, analysis_results)
+    c.save()
+
+def draw_clinic_analysis(c, w, h, before_image, after_image, analysis_results, sources=None, session_label=None):
+    """Desenha o corpo de uma análise (fotos antes/depois + cards por região) na página atual"""
     P = ClinicPalette
-    draw_clinic_background(c, w, h)
-    draw_clinic_header(c, w, h)
     y_pos = h - 118
     c.setFillColor(P.ROSE_DARK)
     c.setFont("Helvetica-Bold", 11)
@@ -213,9 +395,12 @@ def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
     c.setStrokeColor(P.GOLD)
     c.setLineWidth(1)
     c.line(145, y_pos + 4, 200, y_pos + 4)
+    if session_label:
+        c.setFillColor(P.TEXT_MEDIUM)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(w - 30, y_pos, session_label)
     y_pos -= 22
-    img_w = 115
-    img_h = 145
+    img_w, img_h = PHOTO_BOX_PT
     card_w = 145
     card_h = img_h + 38
     card_x = 30
@@ -229,7 +414,7 @@ def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
     c.drawCentredString(card_x + card_w/2, card_y + card_h - 18, "Antes")
     img_x = card_x + (card_w - img_w) / 2
     img_y = card_y + 10
-    c.drawImage(before_path, img_x, img_y, width=img_w, height=img_h, preserveAspectRatio=True, mask='auto')
+    c.drawImage(as_image_source(before_image, sources), img_x, img_y, width=img_w, height=img_h, preserveAspectRatio=True, mask='auto')
     arrow_x = card_x + card_w + 12
     arrow_y = card_y + card_h/2
     c.setStrokeColor(P.ROSE)
@@ -246,7 +431,7 @@ def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
     c.setFont("Helvetica-Bold", 9)
     c.drawCentredString(card_x2 + card_w/2, card_y + card_h - 18, "Depois")
     img_x2 = card_x2 + (card_w - img_w) / 2
-    c.drawImage(after_path, img_x2, img_y, width=img_w, height=img_h, preserveAspectRatio=True, mask='auto')
+    c.drawImage(as_image_source(after_image, sources), img_x2, img_y, width=img_w, height=img_h, preserveAspectRatio=True, mask='auto')
     y_pos = card_y - 28
     c.setFillColor(P.ROSE_DARK)
     c.setFont("Helvetica-Bold", 11)
@@ -255,78 +440,13 @@ def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
     c.setLineWidth(1)
     c.line(150, y_pos + 4, 205, y_pos + 4)
     y_pos -= 18
-    area_config = {
-        "forehead": {
-            "name": "Região Frontal",
-            "subtitle": "Toxina Botulínica",
-            "color": P.ROSE,
-            "metrics": [("wrinkle_reduction", "Linhas"), ("smoothness_improvement", "Suavização")],
-            "phrases": {
-                "A": "Linhas de expressão visivelmente mais suaves",
-                "B": "Boa redução nas linhas de expressão",
-                "C": "Melhoria moderada na região",
-                "D": "Região em estabilização",
-                "E": "Região em processo de adaptação"
-            }
-        },
-        "nose": {
-            "name": "Região Nasal",
-            "subtitle": "Refinamento",
-            "color": P.GOLD,
-            "metrics": [("texture_improvement", "Textura")],
-            "phrases": {
-                "A": "Textura visivelmente mais refinada",
-                "B": "Boa melhoria na textura da pele",
-                "C": "Melhoria moderada na textura",
-                "D": "Região em estabilização",
-                "E": "Região em processo de adaptação"
-            }
-        },
-        "under_eye": {
-            "name": "Área Infraorbital",
-            "subtitle": "Preenchimento",
-            "color": P.TAUPE,
-            "metrics": [("brightness_improvement", "Clareamento"), ("uniformity_improvement", "Uniformidade"), ("texture_improvement", "Textura")],
-            "phrases": {
-                "A": "Área visivelmente mais iluminada e uniforme",
-                "B": "Boa melhoria na luminosidade e textura",
-                "C": "Melhoria moderada na região",
-                "D": "Região em estabilização",
-                "E": "Verifique a ordem das imagens",
-                "F": "Consulte seu profissional"
-            }
-        }
-    }
     areas_data = analysis_results.get("areas", {})
-    for area_key in ["forehead", "nose", "under_eye"]:
+    for area_key in AREA_ORDER:
         if area_key not in areas_data:
             continue
-        config = area_config[area_key]
+        config = AREA_CONFIG[area_key]
         data = areas_data[area_key]
-        score = data.get("score")
-        description = data.get("description")
-        if not score or not description:
-            avg_metrics = data.get("overall_score", 0)
-            if avg_metrics == 0:
-                metric_values = []
-                for metric_key, _ in config["metrics"]:
-                    if metric_key in data:
-                        metric_values.append(data[metric_key])
-                avg_metrics = sum(metric_values) / len(metric_values) if metric_values else 0
-            if avg_metrics >= 30:
-                score = "A"
-            elif avg_metrics >= 15:
-                score = "B"
-            elif avg_metrics >= 5:
-                score = "C"
-            elif avg_metrics >= 0:
-                score = "D"
-            elif avg_metrics >= -10:
-                score = "E"
-            else:
-                score = "F"
-            if not description:
-                description = config["phrases"].get(score, "Região analisada")
+        score, description = resolve_area_score(config, data)
         card_h = draw_region_card_clinic(
             c, 30, y_pos, w - 60,
             config["name"], config["subtitle"],
@@ -334,21 +454,179 @@ def make_clinic_pdf(before_path, after_path, analysis_results, out_pdf):
             config["color"], P, description, score
         )
         y_pos -= card_h + 10
-    c.setStrokeColor(P.GOLD)
-    c.setLineWidth(0.8)
-    c.line(30, 62, w - 30, 62)
-    c.setFillColor(P.TEXT_LIGHT)
+
+# Escala numérica dos scores para o gráfico de evolução (F=0 ... A=5)
+SCORE_LEVELS = {"F": 0, "E": 1, "D": 2, "C": 3, "B": 4, "A": 5}
+
+def area_metric(data, metric_key):
+    """Valor de uma métrica da região (aceita {"metrics": {...}} ou chave direta)"""
+    value = (data.get("metrics") or {}).get(metric_key, data.get(metric_key))
+    return value if isinstance(value, (int, float)) else None
+
+def draw_page_number(c, w, page, total):
+    c.setFillColor(ClinicPalette.TEXT_LIGHT)
     c.setFont("Helvetica", 7)
-    disclaimer = "*Análise realizada por Inteligência Artificial. Não substitui avaliação médica profissional."
-    c.drawCentredString(w/2, 48, disclaimer)
-    c.setFillColor(P.ROSE_DARK)
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(30, 28, "GlowMetrics")
+    c.drawCentredString(w/2, 28, f"Página {page} de {total}")
+
+def draw_trend_card_clinic(c, x, y, w_card, config, trend, labels, P):
+    """Card de evolução de uma região: linha dos scores por sessão + métricas 1ª → última"""
+    h_card = 140
+    c.setFillColor(colors.white)
+    c.setStrokeColor(P.BORDER)
+    c.setLineWidth(1)
+    c.roundRect(x, y - h_card, w_card, h_card, 12, fill=1, stroke=1)
+    c.setFillColor(config["color"])
+    c.roundRect(x, y - h_card + 8, 4, h_card - 16, 2, fill=1, stroke=0)
+    c.setFillColor(P.TEXT_DARK)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(x + 18, y - 20, config["name"])
     c.setFillColor(P.TEXT_LIGHT)
-    c.setFont("Helvetica", 8)
-    c.drawString(92, 28, "• Análise de Beleza Inteligente")
+    c.setFont("Helvetica", 7)
+    c.drawString(x + 18, y - 31, config["subtitle"])
+
+    # Gráfico: eixo Y com as letras A-F, uma coluna por sessão
+    chart_x = x + 34
+    chart_w = w_card * 0.55 - 34
+    chart_bottom = y - h_card + 24
+    chart_h = h_card - 70
+    step_y = chart_h / (len(SCORE_LEVELS) - 1)
+    c.setFont("Helvetica", 6)
+    for letter, level in SCORE_LEVELS.items():
+        line_y = chart_bottom + level * step_y
+        c.setFillColor(P.TEXT_LIGHT)
+        c.drawRightString(chart_x - 6, line_y - 2, letter)
+        c.setStrokeColor(P.BORDER)
+        c.setLineWidth(0.5)
+        c.line(chart_x, line_y, chart_x + chart_w, line_y)
+    step_x = chart_w / (len(labels) - 1) if len(labels) > 1 else 0
+    for index, label in enumerate(labels):
+        c.setFillColor(P.TEXT_LIGHT)
+        c.drawCentredString(chart_x + index * step_x, chart_bottom - 10, label)
+    coords = [
+        (chart_x + index * step_x, chart_bottom + SCORE_LEVELS[score] * step_y, score)
+        for index, score in enumerate(trend["scores"]) if score in SCORE_LEVELS
+    ]
+    c.setStrokeColor(config["color"])
+    c.setLineWidth(1.5)
+    for (x1, y1, _), (x2, y2, _) in zip(coords, coords[1:]):
+        c.line(x1, y1, x2, y2)
+    for px, py, score in coords:
+        c.setFillColor(get_score_color(score, P))
+        c.circle(px, py, 3, fill=1, stroke=0)
+
+    # Métricas: primeira e última sessão em que aparecem
+    col_x = x + w_card * 0.6
+    row_y = y - 50
     c.setFillColor(P.TEXT_LIGHT)
     c.setFont("Helvetica", 7)
-    c.drawRightString(w - 30, 28, "v2.0 Clinic Edition")
-    c.save()
+    c.drawString(col_x, y - 20, "Métrica")
+    c.drawRightString(x + w_card - 90, y - 20, "Início")
+    c.drawRightString(x + w_card - 50, y - 20, "Atual")
+    c.drawRightString(x + w_card - 15, y - 20, "Δ")
+    for metric_key, metric_label in config["metrics"]:
+        values = [value for value in trend["metrics"].get(metric_key, []) if value is not None]
+        c.setFillColor(P.TEXT_MEDIUM)
+        c.setFont("Helvetica", 9)
+        c.drawString(col_x, row_y, metric_label)
+        if values:
+            first, last = values[0], values[-1]
+            c.drawRightString(x + w_card - 90, row_y, f"{first:.0f}%")
+            c.setFillColor(P.TEXT_DARK)
+            c.setFont("Helvetica-Bold", 9)
+            c.drawRightString(x + w_card - 50, row_y, f"{last:.0f}%")
+            delta = last - first
+            c.setFillColor(P.SUCCESS if delta >= 0 else P.WARNING)
+            c.drawRightString(x + w_card - 15, row_y, f"{delta:+.0f}")
+        else:
+            c.drawRightString(x + w_card - 50, row_y, "-")
+        row_y -= 18
+    return h_card
+
+def collect_trends(sessions):
+    """Agrupa scores e métricas de cada região ao longo das sessões (None quando ausente)"""
+    trends = {}
+    for area_key in AREA_ORDER:
+        config = AREA_CONFIG[area_key]
+        trend = {"scores": [], "metrics": {metric_key: [] for metric_key, _ in config["metrics"]}}
+        for session in sessions:
+            data = session["analysis_results"].get("areas", {}).get(area_key)
+            trend["scores"].append(resolve_area_score(config, data)[0] if data else None)
+            for metric_key, values in trend["metrics"].items():
+                values.append(area_metric(data, metric_key) if data else None)
+        if any(score is not None for score in trend["scores"]):
+            trends[area_key] = trend
+    return trends
+
+def global_harmony(global_data):
+    """Harmonia da análise: "symmetry.after" (saída do parse_chatgpt_response) ou "harmony" (JSON do modelo)"""
+    symmetry = global_data.get("symmetry")
+    if isinstance(symmetry, dict) and symmetry.get("after") is not None:
+        return symmetry["after"]
+    return global_data.get("harmony")
 
+def draw_trend_page(c, w, h, sessions, labels):
+    """Página de evolução: resumo global + um card de tendência por região"""
+    P = ClinicPalette
+    y_pos = h - 118
+    c.setFillColor(P.ROSE_DARK)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(30, y_pos, "Evolução por Região")
+    c.setStrokeColor(P.GOLD)
+    c.setLineWidth(1)
+    c.line(150, y_pos + 4, 205, y_pos + 4)
+    y_pos -= 20
+
+    first_global = sessions[0]["analysis_results"].get("global", {})
+    last_global = sessions[-1]["analysis_results"].get("global", {})
+    card_w = (w - 60 - 20) / 3
+    card_h = 78
+    card_y = y_pos - card_h
+    draw_metric_card_clinic(c, 30, card_y, card_w, card_h, "Sessões", len(sessions), color=P.GOLD)
+    harmony = global_harmony(last_global)
+    harmony_first = global_harmony(first_global)
+    improvement = None
+    if isinstance(harmony, (int, float)) and isinstance(harmony_first, (int, float)) and harmony_first:
+        improvement = (harmony - harmony_first) / harmony_first * 100
+    draw_metric_card_clinic(c, 30 + card_w + 10, card_y, card_w, card_h, "Harmonia",
+                            harmony if harmony is not None else "-", improvement=improvement)
+    apparent_age = (last_global.get("apparent_age") or {}).get("after")
+    draw_metric_card_clinic(c, 30 + 2 * (card_w + 10), card_y, card_w, card_h, "Idade Aparente",
+                            apparent_age if apparent_age is not None else "-",
+                            suffix="anos" if apparent_age is not None else "", color=P.TAUPE)
+    y_pos = card_y - 14
+
+    for area_key, trend in collect_trends(sessions).items():
+        card_h = draw_trend_card_clinic(c, 30, y_pos, w - 60, AREA_CONFIG[area_key], trend, labels, P)
+        y_pos -= card_h + 10
+
+def make_patient_report_pdf(sessions, out_pdf, patient_name=None, generated_at=None):
+    """PDF longitudinal: uma página por sessão + página de evolução por região
+
+    `sessions`: lista (ordem cronológica) de dicts com before_image, after_image,
+    analysis_results e label opcional. Fotos repetidas são embutidas uma única vez.
+    """
+    c = canvas.Canvas(out_pdf, pagesize=A4)
+    w, h = A4
+    if patient_name:
+        c.setTitle(f"GlowMetrics - {patient_name}")
+    sources = {}
+    total = len(sessions) + 1
+    labels = [f"S{index}" for index in range(1, len(sessions) + 1)]
+    for index, session in enumerate(sessions, start=1):
+        draw_clinic_chrome(c, w, h, generated_at)
+        session_label = f"Sessão {index}"
+        if session.get("label"):
+            session_label += f" • {session['label']}"
+        if patient_name:
+            session_label = f"{patient_name} • {session_label}"
+        draw_clinic_analysis(
+            c, w, h,
+            session["before_image"], session["after_image"], session["analysis_results"],
+            sources=sources, session_label=session_label
+        )
+        draw_page_number(c, w, index, total)
+        c.showPage()
+    draw_clinic_chrome(c, w, h, generated_at)
+    draw_trend_page(c, w, h, sessions, labels)
+    draw_page_number(c, w, total, total)
+    c.save()
@@ -0,0 +1,131 @@
+# pdf_cache.py - Cache em disco dos PDFs renderizados (LRU com teto de tamanho)
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() == "true"
+PDF_CACHE_DIR = os.getenv(
+    "PDF_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "glowmetrics-cache", "pdfs"),
+)
+PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def make_pdf_cache_key(before_bytes, after_bytes, analysis_results, template_version, date_stamp, extra=None):
+    """Chave de conteúdo: JSON canônico da análise + hash das fotos + versão do layout + carimbo de data
+
+    O carimbo (texto impresso no header, resolução de minuto) entra na chave: o PDF em
+    cache nunca mostra uma data diferente da pedida ("undated" = PDF sem data).
+    """
+    parts = {
+        "analysis": analysis_results,
+        "before": hashlib.sha256(before_bytes).hexdigest(),
+        "after": hashlib.sha256(after_bytes).hexdigest(),
+        "template_version": template_version,
+        "date_stamp": date_stamp,
+    }
+    if extra:
+        parts["extra"] = extra
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """PDFs prontos em disco, por chave de conteúdo, com LRU por tamanho total"""
+
+    def __init__(self, directory=PDF_CACHE_DIR, max_bytes=int(PDF_CACHE_MAX_MB * 1024 * 1024),
+                 enabled=PDF_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries = OrderedDict()  # chave -> tamanho, ordem = LRU
+        self._total = 0
+        self.hits = 0
+        self.misses = 0
+        self._opened = False
+
+    def open(self):
+        """Cria o diretório e carrega o índice do disco (idempotente; chamado no startup ou no 1º uso)"""
+        if self._opened:
+            return
+        self._opened = True
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _load_index(self):
+        """Reconstrói o índice LRU a partir do mtime dos arquivos (sobrevive a restarts)"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total += size
+
+    async def get(self, key):
+        """Bytes do PDF em cache ou None"""
+        if not self.enabled:
+            return None
+        self.open()
+        if key in self._entries:
+            try:
+                data = await asyncio.to_thread(_read_file, self._path(key))
+                os.utime(self._path(key))
+            except OSError:
+                self._drop(key)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        self.misses += 1
+        return None
+
+    async def set(self, key, data):
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        self.open()
+        await asyncio.to_thread(_write_file, self._path(key), data)
+        self._total -= self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self._total += len(data)
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._total -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        self.open()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
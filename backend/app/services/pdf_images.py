@@ -0,0 +1,152 @@
+# pdf_images.py - Derivadas das fotos em resolução de impressão para os PDFs (cache por conteúdo)
+import asyncio
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from app.services.images import PDF_IMAGE_DPI, PDF_IMAGE_QUALITY, fit_image_to_box
+
+PDF_IMAGE_CACHE_ENABLED = os.getenv("PDF_IMAGE_CACHE_ENABLED", "true").lower() == "true"
+PDF_IMAGE_CACHE_DIR = os.getenv(
+    "PDF_IMAGE_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "glowmetrics-cache", "pdf-images"),
+)
+PDF_IMAGE_CACHE_MAX_MB = float(os.getenv("PDF_IMAGE_CACHE_MAX_MB", "100"))
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class PrintImageCache:
+    """Foto recortada/reduzida para a caixa do PDF, em disco por hash (original + caixa + dpi + qualidade)"""
+
+    def __init__(self, directory=PDF_IMAGE_CACHE_DIR, max_bytes=int(PDF_IMAGE_CACHE_MAX_MB * 1024 * 1024),
+                 dpi=PDF_IMAGE_DPI, quality=PDF_IMAGE_QUALITY, enabled=PDF_IMAGE_CACHE_ENABLED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.quality = quality
+        self.enabled = enabled
+        self._entries = OrderedDict()  # chave -> tamanho, ordem = LRU
+        self._total = 0
+        self._pending = {}  # chave -> Future (mesma foto pedida em paralelo prepara uma vez)
+        self.hits = 0
+        self.misses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._opened = False
+
+    def open(self):
+        """Cria o diretório e carrega o índice do disco (idempotente; chamado no startup ou no 1º uso)"""
+        if self._opened:
+            return
+        self._opened = True
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def _load_index(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total += size
+
+    def make_key(self, data, box):
+        parts = f"{hashlib.sha256(data).hexdigest()}:{box[0]}x{box[1]}:{self.dpi}:{self.quality}"
+        return hashlib.sha256(parts.encode("utf-8")).hexdigest()
+
+    async def prepare(self, data, box, run=None):
+        """Retorna a derivada da foto para `box` (pt); `run(func, *args)` executa o trabalho de CPU"""
+        run = run or asyncio.to_thread
+        if not self.enabled:
+            self.misses += 1
+            return await run(fit_image_to_box, data, box[0], box[1], self.dpi, self.quality)
+
+        self.open()
+        key = self.make_key(data, box)
+        if key in self._entries:
+            try:
+                prepared = await asyncio.to_thread(_read_file, self._path(key))
+            except OSError:
+                self._drop(key)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prepared
+        if key in self._pending:
+            self.hits += 1
+            return await asyncio.shield(self._pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            prepared = await run(fit_image_to_box, data, box[0], box[1], self.dpi, self.quality)
+            self.misses += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(prepared)
+            await self._store(key, prepared)
+            future.set_result(prepared)
+            return prepared
+        except BaseException as e:
+            future.set_exception(e)
+            # Ninguém mais aguardando: evita "Future exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def prepare_pair(self, before_data, after_data, box, run=None):
+        return await asyncio.gather(
+            self.prepare(before_data, box, run),
+            self.prepare(after_data, box, run),
+        )
+
+    async def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        await asyncio.to_thread(_write_file, self._path(key), data)
+        if key not in self._entries:
+            self._entries[key] = len(data)
+            self._total += len(data)
+        self._entries.move_to_end(key)
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        self._total -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        self.open()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "dpi": self.dpi,
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "source_bytes": self.bytes_in,
+            "prepared_bytes": self.bytes_out,
+        }
@@ -0,0 +1,216 @@
+# profiling.py - Captura opcional de perfil (cProfile) por requisição, guardada em um ring buffer
+import contextvars
+import cProfile
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+
+# Fração das requisições perfiladas sem pedir (0 = só pelo header)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "20"))
+# Header que pede o perfil; o valor precisa ser o ADMIN_TOKEN (sem token, só amostragem)
+PROFILE_HEADER = "x-profile"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Captura da requisição corrente; o pool de PDF consulta para perfilar também o worker
+_current = contextvars.ContextVar("profile_capture", default=None)
+_ids = itertools.count(1)
+
+
+class _RawStats:
+    """Adaptador para pstats.Stats.add(): stats já coletadas (ex.: vindas de um worker)"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class ProfileCapture:
+    """Perfil de uma requisição: cProfile no event loop + stats dos workers do pool de PDF
+
+    O cProfile roda na thread do event loop, então requisições simultâneas aparecem no
+    mesmo perfil (o campo "concurrent" registra quantas estavam em andamento). Trabalho
+    enviado para threads (asyncio.to_thread) não é capturado. Em respostas com stream
+    (SSE, NDJSON, ZIP) a captura vai até o último chunk, inclusive o tempo de envio.
+    """
+
+    def __init__(self, method, path, trigger, concurrent=0):
+        self.id = f"{int(time.time())}-{next(_ids)}"
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.concurrent = concurrent
+        self.started_at = time.time()
+        self.duration_ms = None
+        self.status = None
+        self._profiler = cProfile.Profile()
+        self._worker_stats = []
+        self._start = None
+        self.stats = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._profiler.enable()
+
+    def stop(self, status):
+        self._profiler.disable()
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 1)
+        self.status = status
+        stats = pstats.Stats(self._profiler)
+        for worker_stats in self._worker_stats:
+            stats.add(_RawStats(worker_stats))
+        self.stats = stats.stats
+        self._profiler = None
+        self._worker_stats = []
+
+    def add_worker_stats(self, stats):
+        self._worker_stats.append(stats)
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status": self.status,
+            "concurrent": self.concurrent,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "functions": len(self.stats or {}),
+        }
+
+    def to_prof(self):
+        """Formato do pstats.dump_stats (abre no snakeviz, pstats, flameprof)"""
+        return marshal.dumps(self.stats)
+
+    def to_text(self, limit=60):
+        buffer = io.StringIO()
+        stats = pstats.Stats(_RawStats(self.stats), stream=buffer)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return buffer.getvalue()
+
+    def to_folded(self):
+        """Stacks "a;b;c <microssegundos>" para flamegraph.pl / speedscope / inferno
+
+        O cProfile só guarda arestas caller → callee; as pilhas são reconstruídas
+        repartindo o tempo de cada função entre quem a chamou, na proporção do
+        tempo de cada aresta (aproximação usual de flamegraphs sobre cProfile).
+        """
+        callees = {}
+        for func, (_, _, _, _, callers) in self.stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((func, edge[3]))
+        roots = [func for func, entry in self.stats.items() if not any(c in self.stats for c in entry[4])]
+        # Poda ramos abaixo de 0,01% do tempo total (grafos densos do asyncio explodem em caminhos)
+        min_micros = max(1.0, sum(entry[2] for entry in self.stats.values()) * 1e6 * 1e-4)
+        folded = {}
+
+        def walk(func, stack, weight, visiting):
+            _, _, own, _, _ = self.stats[func]
+            stack = stack + (_label(func),)
+            micros = own * weight * 1e6
+            if micros >= 1:
+                key = ";".join(stack)
+                folded[key] = folded.get(key, 0) + micros
+            if len(stack) >= 128:
+                return
+            for callee, edge_total in callees.get(func, ()):
+                callee_total = self.stats[callee][3]
+                if callee in visiting or callee_total <= 0:
+                    continue
+                child_weight = weight * edge_total / callee_total
+                if child_weight * callee_total * 1e6 < min_micros:
+                    continue
+                visiting.add(callee)
+                walk(callee, stack, child_weight, visiting)
+                visiting.discard(callee)
+
+        for root in roots:
+            walk(root, (), 1.0, {root})
+        lines = [f"{stack} {round(micros)}" for stack, micros in sorted(folded.items()) if round(micros) > 0]
+        return "\n".join(lines) + "\n"
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        label = name
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    return label.replace(";", ",")
+
+
+class ProfileStore:
+    """Ring buffer das últimas capturas (as mais antigas saem primeiro)"""
+
+    def __init__(self, size=PROFILE_BUFFER_SIZE, sample_rate=PROFILE_SAMPLE_RATE, token=ADMIN_TOKEN):
+        self.sample_rate = sample_rate
+        self.token = token
+        self._captures = deque(maxlen=max(1, size))
+        # cProfile é um por thread: só uma captura ativa no event loop por vez
+        self._active = threading.Lock()
+        self.skipped = 0
+
+    def is_admin(self, token):
+        """Confere o ADMIN_TOKEN (sem token configurado, nada é liberado)"""
+        return bool(self.token) and bool(token) and hmac.compare_digest(token, self.token)
+
+    def should_profile(self, header_value):
+        """Motivo da captura ("header" | "sample") ou None"""
+        if self.is_admin(header_value):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def begin(self, method, path, trigger, concurrent=0):
+        """Inicia a captura e a associa ao contexto; None se outra já estiver ativa"""
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None, None
+        capture = ProfileCapture(method, path, trigger, concurrent)
+        token = _current.set(capture)
+        capture.start()
+        return capture, token
+
+    def end(self, capture, token, status):
+        try:
+            capture.stop(status)
+            self._captures.append(capture)
+        finally:
+            _current.reset(token)
+            self._active.release()
+
+    def get(self, capture_id):
+        for capture in self._captures:
+            if capture.id == capture_id:
+                return capture
+        return None
+
+    def list(self):
+        return [capture.summary() for capture in reversed(self._captures)]
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "header_enabled": bool(self.token),
+            "stored": len(self._captures),
+            "capacity": self._captures.maxlen,
+            "skipped": self.skipped,
+        }
+
+
+def current_capture():
+    return _current.get()
+
+
+profiles = ProfileStore()
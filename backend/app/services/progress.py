@@ -0,0 +1,112 @@
+# progress.py - Eventos de progresso das análises (etapas do pipeline → SSE)
+import asyncio
+import contextvars
+import os
+import time
+
+PROGRESS_RETENTION_SECONDS = int(os.getenv("PROGRESS_RETENTION_SECONDS", "600"))
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_KEEPALIVE_SECONDS", "15"))
+
+# Etapas que encerram o stream
+TERMINAL_STAGES = ("completed", "failed")
+
+# Tracker da análise em execução; tarefas filhas (gather/to_thread) herdam o contexto
+_current = contextvars.ContextVar("analysis_progress", default=None)
+
+
+class ProgressTracker:
+    """Histórico de eventos de uma análise + notificação de quem está acompanhando"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.perf_counter()
+        self.events = []
+        self.finished_at = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def emit(self, stage, **data):
+        """Registra uma etapa com o tempo decorrido desde o início (chamar no event loop)"""
+        if self.done:
+            return
+        event = {
+            "id": len(self.events),
+            "stage": stage,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            **data,
+        }
+        self.events.append(event)
+        if stage in TERMINAL_STAGES:
+            self.finished_at = time.time()
+        # Acorda os assinantes e arma um novo Event para a próxima etapa
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self, after=-1, keepalive=PROGRESS_KEEPALIVE_SECONDS):
+        """Gera os eventos com id > after (histórico e depois ao vivo); None = keepalive"""
+        index = after + 1
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                event = self.events[index]
+                index += 1
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+
+
+class ProgressRegistry:
+    """Trackers por job_id; os finalizados ficam disponíveis por PROGRESS_RETENTION_SECONDS"""
+
+    def __init__(self, retention=PROGRESS_RETENTION_SECONDS):
+        self.retention = retention
+        self._trackers = {}
+
+    def get(self, job_id):
+        return self._trackers.get(job_id)
+
+    def get_or_create(self, job_id):
+        self._expire()
+        tracker = self._trackers.get(job_id)
+        if tracker is None:
+            tracker = self._trackers[job_id] = ProgressTracker(job_id)
+        return tracker
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j for j, t in self._trackers.items() if t.done and t.finished_at < cutoff]:
+            del self._trackers[job_id]
+
+    def stats(self):
+        return {
+            "tracked": len(self._trackers),
+            "running": sum(1 for t in self._trackers.values() if not t.done),
+        }
+
+
+def bind_progress(tracker):
+    """Associa o tracker ao contexto atual; retorna o token para reset"""
+    return _current.set(tracker)
+
+
+def reset_progress(token):
+    _current.reset(token)
+
+
+def report(stage, **data):
+    """Publica uma etapa no tracker da análise corrente (sem tracker: não faz nada)"""
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.emit(stage, **data)
+
+
+progress_streams = ProgressRegistry()
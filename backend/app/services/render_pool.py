@@ -0,0 +1,133 @@
+# render_pool.py - Renderização de PDFs em um pool de processos pré-aquecidos
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.services.logs import get_logger
+from app.services.metrics import IN_FLIGHT, observe_stage
+from app.services.profiling import current_capture
+from app.services.render_worker import _ready, _timed, _warm_worker, render_clinic_pdf, render_patient_report
+
+
+def _available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# 0 = renderiza em thread no próprio processo (ambientes com pouca memória)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(_available_cpus(), 4))))
+# Renders aceitos ao mesmo tempo (executando + aguardando worker)
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", str(max(1, PDF_WORKERS) * 4)))
+# Quanto uma requisição espera por vaga antes de receber 503
+PDF_QUEUE_TIMEOUT = float(os.getenv("PDF_QUEUE_TIMEOUT", "10"))
+
+
+log = get_logger("render_pool")
+
+
+class RenderPoolBusy(Exception):
+    """Fila de renderização cheia - cliente deve tentar novamente"""
+
+
+class RenderPool:
+    """Pool de processos com fila limitada (backpressure) para o make_clinic_pdf"""
+
+    def __init__(self, workers=PDF_WORKERS, max_pending=PDF_MAX_PENDING, queue_timeout=PDF_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.queue_timeout = queue_timeout
+        self._executor = None
+        self._slots = None
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.render_seconds = 0.0
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.max_pending)
+        if self.workers <= 0:
+            log.info("Renderização de PDF em thread (PDF_WORKERS=0)")
+            return
+        # spawn: não herda o event loop/threads do uvicorn como o fork herdaria
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+        )
+        loop = asyncio.get_running_loop()
+        # Sobe todos os workers agora, não no primeiro pedido
+        pids = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _ready) for _ in range(self.workers)
+        ))
+        log.info("Pool de PDF iniciado", extra={"processes": len(set(pids)), "max_pending": self.max_pending})
+
+    async def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, func, *args):
+        """Executa func(*args) no pool respeitando o limite de pendentes"""
+        if self._slots is None:
+            await self.start()
+        requested = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RenderPoolBusy("Muitos PDFs em geração, tente novamente em instantes")
+        self.in_flight += 1
+        start = time.perf_counter()
+        # Requisição sendo perfilada: o worker também roda sob cProfile
+        capture = current_capture()
+        try:
+            with IN_FLIGHT.track(operation="render_pool"):
+                if self._executor is None:
+                    run_seconds, result, stats = await asyncio.to_thread(_timed, capture is not None, func, *args)
+                else:
+                    run_seconds, result, stats = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, _timed, capture is not None, func, *args
+                    )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+        if stats is not None:
+            capture.add_worker_stats(stats)
+        elapsed = time.perf_counter() - start
+        self.completed += 1
+        self.render_seconds += elapsed
+        # Espera por vaga/worker livre x execução de fato no worker
+        observe_stage("render_pool", f"{func.__name__}.queue",
+                      max(0.0, time.perf_counter() - requested - run_seconds))
+        observe_stage("render_pool", func.__name__, run_seconds)
+        return result
+
+    async def render(self, before_image, after_image, analysis_results, generated_at=None):
+        """Gera o PDF do relatório e retorna os bytes"""
+        return await self.run(render_clinic_pdf, before_image, after_image, analysis_results, generated_at)
+
+    async def render_report(self, sessions, patient_name=None):
+        """Gera o PDF longitudinal do paciente e retorna os bytes"""
+        return await self.run(render_patient_report, sessions, patient_name)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_render_ms": round(self.render_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+render_pool = RenderPool()
@@ -0,0 +1,59 @@
+# render_worker.py - Funções executadas nos processos do pool de PDF
+#
+# Os workers (spawn) importam só este módulo, pdf.py e images.py: nada de FastAPI,
+# caches ou fila de jobs. Mantenha os imports aqui leves e os de reportlab/PIL locais.
+import cProfile
+import io
+import os
+import time
+
+
+def _warm_worker():
+    """Initializer dos workers: importa reportlab e carrega as fontes antes do 1º pedido"""
+    from app.services.pdf import warm_up
+    warm_up()
+
+
+def _ready():
+    return os.getpid()
+
+
+def run_profiled(func, *args):
+    """Executa func(*args) sob cProfile e retorna (resultado, stats brutas serializáveis)"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = func(*args)
+    finally:
+        profiler.disable()
+    profiler.create_stats()
+    return result, profiler.stats
+
+
+def _timed(profile, func, *args):
+    """Executa no worker e devolve (segundos de execução, resultado, stats do cProfile ou None)
+
+    O tempo medido aqui é só a execução; o resto do tempo do pedido é espera na fila.
+    """
+    start = time.perf_counter()
+    if profile:
+        result, stats = run_profiled(func, *args)
+    else:
+        result, stats = func(*args), None
+    return time.perf_counter() - start, result, stats
+
+
+def render_clinic_pdf(before_image, after_image, analysis_results, generated_at=None):
+    """Renderiza o relatório em memória e retorna os bytes do PDF (executa no worker)"""
+    from app.services.pdf import make_clinic_pdf
+    buffer = io.BytesIO()
+    make_clinic_pdf(before_image, after_image, analysis_results, buffer, generated_at)
+    return buffer.getvalue()
+
+
+def render_patient_report(sessions, patient_name=None):
+    """Renderiza o relatório longitudinal (várias sessões) e retorna os bytes do PDF"""
+    from app.services.pdf import make_patient_report_pdf
+    buffer = io.BytesIO()
+    make_patient_report_pdf(sessions, buffer, patient_name)
+    return buffer.getvalue()
@@ -0,0 +1,138 @@
+# uploads.py - Índice hash → file_id para não reenviar a mesma foto à OpenAI
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from app.services.logs import get_logger
+from app.services.metrics import add_bytes
+from app.services.openai_client import track_openai_call
+
+UPLOAD_DEDUP_ENABLED = os.getenv("UPLOAD_DEDUP_ENABLED", "true").lower() == "true"
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", "21600"))
+UPLOAD_INDEX_MAX = int(os.getenv("UPLOAD_INDEX_MAX", "1000"))
+UPLOAD_JANITOR_INTERVAL = int(os.getenv("UPLOAD_JANITOR_INTERVAL", "300"))
+# Um file_id só é reaproveitado se ainda tiver essa folga antes de expirar,
+# para que o janitor nunca apague um arquivo usado por um run em andamento
+UPLOAD_REUSE_MARGIN = int(os.getenv("UPLOAD_REUSE_MARGIN", "900"))
+
+log = get_logger("uploads")
+
+
+async def _upload(client, data, filename):
+    with track_openai_call("files.create"):
+        uploaded = await client.files.create(file=(filename, data, "image/jpeg"), purpose="vision")
+    add_bytes("openai_upload", len(data))
+    return uploaded
+
+
+class VisionFileIndex:
+    """Mapeia o SHA-256 da imagem para o file_id já enviado (TTL + LRU)"""
+
+    def __init__(self, ttl=UPLOAD_TTL_SECONDS, max_entries=UPLOAD_INDEX_MAX,
+                 enabled=UPLOAD_DEDUP_ENABLED, reuse_margin=UPLOAD_REUSE_MARGIN):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.reuse_margin = min(reuse_margin, ttl // 2)
+        self._entries = OrderedDict()  # hash -> (file_id, uploaded_at)
+        self._inflight = {}  # hash -> Future com o file_id
+        self._to_delete = []  # (file_id, apagar_apos)
+        self.hits = 0
+        self.uploads = 0
+        self.deleted = 0
+
+    async def get_or_upload(self, client, data, filename):
+        """Retorna o file_id da imagem, enviando-a apenas se ainda não estiver no índice"""
+        if not self.enabled:
+            self.uploads += 1
+            uploaded = await _upload(client, data, filename)
+            return uploaded.id
+
+        key = hashlib.sha256(data).hexdigest()
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] < self.ttl - self.reuse_margin:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        # Uploads simultâneos da mesma foto esperam o primeiro
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            uploaded = await _upload(client, data, filename)
+        except BaseException as e:
+            future.set_exception(e)
+            # Evita "exception was never retrieved" quando ninguém mais aguardava
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self.uploads += 1
+        if entry is not None:
+            # Versão antiga fica para o janitor (pode estar em uso até expirar)
+            self._to_delete.append((entry[0], entry[1] + self.ttl))
+        self._entries[key] = (uploaded.id, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            _, (old_id, _) = self._entries.popitem(last=False)
+            self._to_delete.append((old_id, time.time() + self.reuse_margin))
+        future.set_result(uploaded.id)
+        return uploaded.id
+
+    def _collect_expired(self, now):
+        expired = []
+        for key, (file_id, uploaded_at) in list(self._entries.items()):
+            if now - uploaded_at >= self.ttl:
+                del self._entries[key]
+                expired.append(file_id)
+        remaining = []
+        for file_id, delete_after in self._to_delete:
+            if now >= delete_after:
+                expired.append(file_id)
+            else:
+                remaining.append((file_id, delete_after))
+        self._to_delete = remaining
+        return expired
+
+    async def sweep(self, client):
+        """Apaga na OpenAI os arquivos expirados ou removidos do índice"""
+        expired = self._collect_expired(time.time())
+        for file_id in expired:
+            try:
+                with track_openai_call("files.delete"):
+                    await client.files.delete(file_id)
+                self.deleted += 1
+            except Exception as e:
+                log.warning("Falha ao apagar arquivo de visão", extra={"file_id": file_id, "reason": str(e)})
+        if expired:
+            log.info("Janitor removeu arquivos de visão expirados", extra={"count": len(expired)})
+        return len(expired)
+
+    async def run_janitor(self, get_client, interval=UPLOAD_JANITOR_INTERVAL):
+        """Loop em background do janitor (iniciado no lifespan)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep(get_client())
+            except Exception as e:
+                log.warning("Janitor de uploads falhou", extra={"reason": str(e)})
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "uploads": self.uploads,
+            "pending_deletes": len(self._to_delete),
+            "deleted": self.deleted,
+        }
+
+
+vision_files = VisionFileIndex()
@@ -0,0 +1 @@
+# Benchmarks e servidores de apoio (mock da OpenAI) para testes de carga locais
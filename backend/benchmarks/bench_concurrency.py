@@ -0,0 +1,87 @@
+# bench_concurrency.py - Análises concorrentes em um único worker uvicorn
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_concurrency --concurrency 1 8 32 --run-latency 2
+#
+# Sobe o mock da OpenAI e o backend em threads locais, dispara N análises
+# simultâneas e, em paralelo, mede a latência de GET / . Com o pipeline
+# bloqueante as análises eram atendidas uma a uma (tempo ≈ N × latência de
+# uma análise) e GET / esperava todas; com o pipeline assíncrono o tempo total
+# fica próximo de uma única análise.
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.mock_openai import ServerThread, create_mock_app
+
+
+async def probe_root(client, stop, samples):
+    """Mede a latência de GET / enquanto as análises rodam"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def run_level(backend_url, image_url, concurrency):
+    payload = {
+        "before_image_url": f"{image_url}/before.jpg",
+        "after_image_url": f"{image_url}/after.jpg",
+        "procedures": ["Toxina Botulínica"],
+        # Mede o pipeline completo, não o cache de resultados
+        "bypass_cache": True,
+    }
+    async with httpx.AsyncClient(base_url=backend_url, timeout=600) as client:
+        stop = asyncio.Event()
+        probe_samples = []
+        probe = asyncio.create_task(probe_root(client, stop, probe_samples))
+
+        async def one():
+            start = time.perf_counter()
+            response = await client.post("/api/analyze", json=payload)
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+        stop.set()
+        await probe
+    return wall, latencies, probe_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--run-latency", type=float, default=2.0)
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    mock = create_mock_app(args.run_latency, args.request_latency)
+    with ServerThread(mock) as mock_server:
+        os.environ["OPENAI_BASE_URL"] = f"{mock_server.url}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+        from app.main import app
+
+        with ServerThread(app) as backend:
+            print(f"{'N':>4} {'wall (s)':>9} {'p50 (s)':>8} {'serial (s)':>11} {'ganho':>6} {'GET / máx (ms)':>15}")
+            single = None
+            for n in args.concurrency:
+                wall, latencies, probes = asyncio.run(run_level(backend.url, mock_server.url + "/images", n))
+                p50 = statistics.median(latencies)
+                if single is None:
+                    single = p50
+                # Estimativa do pipeline bloqueante: uma análise por vez
+                serial = single * n
+                probe_max = max(probes) * 1000 if probes else 0.0
+                print(f"{n:>4} {wall:>9.2f} {p50:>8.2f} {serial:>11.2f} {serial / wall:>5.1f}x {probe_max:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# bench_hotpaths.py - Microbenchmarks de parse.py e pdf.py com comparação contra baseline
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_hotpaths --compare benchmarks/baseline.json --threshold 0.25
+#   python -m benchmarks.bench_hotpaths --filter make_clinic_pdf --repeat 3
+#   python -m benchmarks.bench_hotpaths --save benchmarks/baseline.json
+#
+# benchmarks/baseline.json é versionado (valores padrão de --repeat/--min-time); os
+# tempos dependem da máquina, então em outro hardware grave um baseline local com
+# --save antes da mudança e compare depois. Atualize o versionado quando uma mudança
+# alterar o desempenho de propósito (ou um caso novo entrar em build_cases).
+#
+# Mede parse_chatgpt_response (corpus de benchmarks/responses.py: JSON,
+# descrições longas, blocos de código e respostas defeituosas), wrap_text,
+# draw_region_card_clinic e make_clinic_pdf (fotos de várias resoluções).
+# Tempo: cada amostra repete a função até somar --min-time e divide pelo número
+# de chamadas; reporta mediana e melhor amostra de --repeat. Memória: pico do
+# tracemalloc em uma chamada separada (o tracemalloc deixa o código mais lento).
+#
+# Com --compare, sai com código 1 se algum caso ficar mais lento (melhor
+# amostra) ou usar mais memória (pico) que o baseline além do limite, ou se
+# uma resposta que era parseada passar a falhar.
+import argparse
+import io
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.services.parse import parse_chatgpt_response
+from app.services.pdf import (
+    AREA_CONFIG, AREA_ORDER, ClinicPalette, draw_region_card_clinic, make_clinic_pdf, resolve_area_score,
+    text_width, wrap_text,
+)
+from benchmarks.photos import PHONE_RESOLUTIONS, make_photo
+from benchmarks.responses import long_description, make_analysis, make_corpus
+
+# Diferenças de memória abaixo disso são ruído do alocador, não regressão
+MEMORY_NOISE_BYTES = 64 * 1024
+
+
+def build_cases(selected=lambda name: True):
+    """Lista de (nome, função sem argumentos); entradas preparadas fora da medição
+
+    Fotos grandes só são geradas para os casos aceitos por `selected(nome)`.
+    """
+    cases = []
+    for name, text in make_corpus().items():
+        cases.append((f"parse_chatgpt_response[{name}]", lambda text=text: parse_chatgpt_response(text)))
+
+    page = canvas.Canvas(io.BytesIO(), pagesize=A4)
+    texts = {"titulo": "Testa / Glabela", "descricao": long_description(300), "longo": long_description(3000)}
+    for name, text in texts.items():
+        cases.append((f"wrap_text[{name}]", lambda text=text: wrap_text(page, text, 400, "Helvetica-Oblique", 9)))
+
+    def wrap_cold():
+        # Sem o cache de larguras por palavra (primeiro documento do processo)
+        text_width.cache_clear()
+        wrap_text(page, texts["longo"], 400, "Helvetica-Oblique", 9)
+    cases.append(("wrap_text[longo_frio]", wrap_cold))
+
+    for name, analysis in (("curta", make_analysis()), ("longa", make_analysis(1500))):
+        parsed = parse_chatgpt_response(json.dumps(analysis, ensure_ascii=False))
+
+        def draw_cards(parsed=parsed):
+            # Inclui criar o canvas: desenhar sempre no mesmo acumularia operadores na página
+            c = canvas.Canvas(io.BytesIO(), pagesize=A4)
+            w, h = A4
+            y = h - 400
+            for area_key in AREA_ORDER:
+                config = AREA_CONFIG[area_key]
+                data = parsed["areas"][area_key]
+                score, description = resolve_area_score(config, data)
+                y -= draw_region_card_clinic(
+                    c, 30, y, w - 60, config["name"], config["subtitle"], config["metrics"], data,
+                    config["color"], ClinicPalette, description, score
+                ) + 10
+        cases.append((f"draw_region_card_clinic[3 cards, descrição {name}]", draw_cards))
+
+    parsed = parse_chatgpt_response(json.dumps(make_analysis(), ensure_ascii=False))
+    for name, width, height in PHONE_RESOLUTIONS:
+        if not selected(f"make_clinic_pdf[{name}]"):
+            continue
+        before = make_photo(width, height, seed=1)
+        after = make_photo(width, height, seed=2)
+        cases.append((
+            f"make_clinic_pdf[{name}]",
+            lambda before=before, after=after: make_clinic_pdf(before, after, parsed, io.BytesIO())
+        ))
+    return cases
+
+
+def guarded(func):
+    """Chama func() e retorna "ok" ou "erro" (respostas defeituosas também são medidas)"""
+    def call():
+        try:
+            func()
+            return "ok"
+        except Exception:
+            return "erro"
+    return call
+
+
+def measure_time(func, repeat, min_time):
+    """(mediana, melhor) em segundos por chamada"""
+    func()
+    # Como timeit.autorange: 1, 2, 5, 10, 20, 50... chamadas até a amostra somar min_time
+    for loops in (mult * 10 ** exp for exp in itertools.count() for mult in (1, 2, 5)):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return statistics.median(samples), min(samples)
+
+
+def measure_peak(func):
+    """Pico de memória alocada (bytes) durante uma chamada"""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        return max(0, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Lista de regressões (texto) em relação ao baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous["outcome"] == "ok" and current["outcome"] != "ok":
+            regressions.append(f"{name}: passou a falhar")
+        ratio = current["best_s"] / previous["best_s"] if previous["best_s"] else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: tempo {ratio:.2f}x do baseline")
+        grown = current["peak_bytes"] - previous["peak_bytes"]
+        if grown > MEMORY_NOISE_BYTES and current["peak_bytes"] > previous["peak_bytes"] * (1 + memory_threshold):
+            regressions.append(f"{name}: memória +{grown / 1024:.0f} KiB ({current['peak_bytes'] / previous['peak_bytes']:.2f}x)")
+    return regressions
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de parse.py e pdf.py")
+    parser.add_argument("--filter", help="só casos cujo nome contém este texto")
+    parser.add_argument("--repeat", type=int, default=5, help="amostras por caso")
+    parser.add_argument("--min-time", type=float, default=0.2, help="duração mínima de cada amostra (s)")
+    parser.add_argument("--save", help="grava os resultados como baseline neste arquivo")
+    parser.add_argument("--compare", help="baseline para comparar")
+    parser.add_argument("--threshold", type=float, default=0.25, help="regressão de tempo tolerada (0.25 = +25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="regressão de pico de memória tolerada")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'caso':<58} {'resultado':>9} {'mediana':>10} {'melhor':>10} {'pico mem':>10} {'vs base':>8}")
+    for name, func in build_cases(lambda name: not args.filter or args.filter in name):
+        if args.filter and args.filter not in name:
+            continue
+        call = guarded(func)
+        outcome = call()
+        median, best = measure_time(call, args.repeat, args.min_time)
+        peak = measure_peak(call)
+        results[name] = {"outcome": outcome, "median_s": median, "best_s": best, "peak_bytes": peak}
+        previous = baseline.get(name)
+        delta = f"{best / previous['best_s']:.2f}x" if previous and previous["best_s"] else "-"
+        print(f"{name:<58} {outcome:>9} {format_time(median):>10} {format_time(best):>10} "
+              f"{peak / 1024:>7.0f} KiB {delta:>8}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline gravado em {args.save}")
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) em relação a {args.compare}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\nSem regressões em relação a {args.compare} (tempo ≤ +{args.threshold:.0%}, memória ≤ +{args.memory_threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
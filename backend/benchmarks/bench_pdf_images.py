@@ -0,0 +1,57 @@
+# bench_pdf_images.py - Tamanho do PDF e tempo de geração com fotos originais x preparadas
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_pdf_images --dpi 300
+#
+# Para cada resolução típica de celular gera o relatório embutindo a foto
+# original e a derivada recortada/reduzida para a caixa do PDF no DPI alvo,
+# e imprime tamanho do PDF, tamanho em base64 e tempo de renderização.
+import argparse
+import base64
+import io
+import statistics
+import time
+
+from app.services.images import PDF_IMAGE_DPI, PDF_IMAGE_QUALITY, fit_image_to_box
+from app.services.pdf import PHOTO_BOX_PT, make_clinic_pdf
+from benchmarks.mock_openai import CANNED_ANALYSIS
+from benchmarks.photos import PHONE_RESOLUTIONS, make_photo
+
+
+def render(before, after, repeat):
+    timings = []
+    for _ in range(repeat):
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        make_clinic_pdf(before, after, CANNED_ANALYSIS, buffer)
+        timings.append(time.perf_counter() - start)
+    return buffer.getvalue(), statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dpi", type=int, default=PDF_IMAGE_DPI)
+    parser.add_argument("--quality", type=int, default=PDF_IMAGE_QUALITY)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"caixa={PHOTO_BOX_PT[0]}x{PHOTO_BOX_PT[1]} pt dpi={args.dpi} quality={args.quality}")
+    print(f"{'foto':>6} {'modo':>10} {'PDF':>10} {'base64':>10} {'render (ms)':>12} {'preparo (ms)':>13}")
+    for name, width, height in PHONE_RESOLUTIONS:
+        before = make_photo(width, height, seed=1, exif_orientation=6)
+        after = make_photo(width, height, seed=2, exif_orientation=6)
+        pdf, render_ms = render(before, after, args.repeat)
+        print(f"{name:>6} {'original':>10} {len(pdf) / 1e6:>8.2f}MB "
+              f"{len(base64.b64encode(pdf)) / 1e6:>8.2f}MB {render_ms:>12.1f} {'-':>13}")
+
+        start = time.perf_counter()
+        prepared = [fit_image_to_box(photo, *PHOTO_BOX_PT, dpi=args.dpi, quality=args.quality)
+                    for photo in (before, after)]
+        prep_ms = (time.perf_counter() - start) * 1000
+        pdf, render_ms = render(*prepared, args.repeat)
+        print(f"{name:>6} {'preparada':>10} {len(pdf) / 1e6:>8.2f}MB "
+              f"{len(base64.b64encode(pdf)) / 1e6:>8.2f}MB {render_ms:>12.1f} {prep_ms:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# bench_pdf_pool.py - Vazão de geração de PDFs por número de workers do pool
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_pdf_pool --reports 32
+#
+# Renderiza um lote de relatórios (fotos de celular reais em tamanho) com
+# PDF_WORKERS = 0 (thread no próprio processo) e 1..N processos, e imprime
+# relatórios/segundo e o ganho sobre 1 worker. O ganho só aparece se a
+# máquina tiver mais de um núcleo disponível.
+import argparse
+import asyncio
+import time
+
+from app.services.render_pool import RenderPool, _available_cpus
+from benchmarks.mock_openai import CANNED_ANALYSIS
+from benchmarks.photos import make_photo
+
+
+async def run_batch(workers, reports, before, after):
+    pool = RenderPool(workers=workers, max_pending=max(1, workers) * 4, queue_timeout=600)
+    await pool.start()
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            pool.render(before, after, CANNED_ANALYSIS) for _ in range(reports)
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        await pool.stop()
+    assert all(pdf.startswith(b"%PDF") for pdf in results)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=32)
+    parser.add_argument("--max-workers", type=int, default=_available_cpus())
+    parser.add_argument("--width", type=int, default=3264)
+    parser.add_argument("--height", type=int, default=2448)
+    args = parser.parse_args()
+
+    before = make_photo(args.width, args.height, seed=1)
+    after = make_photo(args.width, args.height, seed=2)
+    print(f"{args.reports} relatórios, fotos {args.width}x{args.height}, {_available_cpus()} CPU(s) disponíveis")
+    print(f"{'workers':>8} {'total (s)':>10} {'PDFs/s':>8} {'ganho':>7}")
+    baseline = None
+    for workers in [0] + list(range(1, args.max_workers + 1)):
+        elapsed = asyncio.run(run_batch(workers, args.reports, before, after))
+        rate = args.reports / elapsed
+        if workers == 1:
+            baseline = rate
+        speedup = f"{rate / baseline:.2f}x" if baseline else "-"
+        label = "thread" if workers == 0 else str(workers)
+        print(f"{label:>8} {elapsed:>10.2f} {rate:>8.2f} {speedup:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# bench_preprocess.py - Bytes economizados e latência por análise com o pré-processamento
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_preprocess --uplink-mbps 20
+#
+# Para cada resolução típica de celular, mede o tempo de preprocess_image e
+# compara o tempo estimado de upload das duas fotos (antes/depois) com e sem
+# o pré-processamento, no uplink informado.
+import argparse
+import statistics
+import time
+
+from app.services.images import IMAGE_JPEG_QUALITY, IMAGE_MAX_EDGE, preprocess_image
+from benchmarks.photos import PHONE_RESOLUTIONS, make_photo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    parser.add_argument("--max-edge", type=int, default=IMAGE_MAX_EDGE)
+    parser.add_argument("--quality", type=int, default=IMAGE_JPEG_QUALITY)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bytes_per_second = args.uplink_mbps * 1_000_000 / 8
+    print(f"max_edge={args.max_edge} quality={args.quality} uplink={args.uplink_mbps} Mbps")
+    print(f"{'foto':>6} {'original':>10} {'processada':>11} {'economia':>9} "
+          f"{'prep (ms)':>10} {'upload antes (ms)':>18} {'upload depois (ms)':>19} {'ganho/análise (ms)':>19}")
+    for name, width, height in PHONE_RESOLUTIONS:
+        photo = make_photo(width, height, exif_orientation=6)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            processed = preprocess_image(photo, args.max_edge, args.quality)
+            timings.append(time.perf_counter() - start)
+        prep_ms = statistics.median(timings) * 1000
+        # Duas fotos por análise; o pré-processamento das duas roda em paralelo
+        upload_before = 2 * len(photo) / bytes_per_second * 1000
+        upload_after = 2 * len(processed) / bytes_per_second * 1000
+        gain = upload_before - (upload_after + prep_ms)
+        saved = 1 - len(processed) / len(photo)
+        print(f"{name:>6} {len(photo) / 1e6:>8.2f}MB {len(processed) / 1e6:>9.2f}MB {saved:>8.0%} "
+              f"{prep_ms:>10.1f} {upload_before:>18.0f} {upload_after:>19.0f} {gain:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench_run_wait.py - Espera do run: polling fixo de 1s vs backoff adaptativo vs streaming de eventos
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.bench_run_wait --analyses 10 --run-latency 2 --run-jitter 2
+#
+# Roda o mesmo número de análises sequenciais em cada modo de
+# OPENAI_RUN_WAIT_MODE contra o mock local e reporta a latência extra
+# (tempo total - duração real do run no mock) e as chamadas à API por análise.
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.mock_openai import ServerThread, create_mock_app, make_test_jpeg
+
+MODES = ("fixed", "poll", "stream")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mock_app, mode, analyses, image):
+    from app.services import chatgpt
+
+    chatgpt.RUN_WAIT_MODE = mode
+    mock_app.state.calls.clear()
+    overheads = []
+    for _ in range(analyses):
+        start = time.perf_counter()
+        await chatgpt.analyze_with_chatgpt(image, image, ["Toxina Botulínica"])
+        elapsed = time.perf_counter() - start
+        run = mock_app.state.runs[max(mock_app.state.runs)]
+        overheads.append(elapsed - (run["done_at"] - run["created_at"]))
+    calls = sum(mock_app.state.calls.values()) / analyses
+    polls = mock_app.state.calls["GET /v1/threads/{thread_id}/runs/{run_id}"] / analyses
+    return overheads, calls, polls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--analyses", type=int, default=10)
+    parser.add_argument("--run-latency", type=float, default=2.0)
+    parser.add_argument("--run-jitter", type=float, default=2.0)
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    mock_app = create_mock_app(args.run_latency, args.request_latency, run_jitter=args.run_jitter)
+    with ServerThread(mock_app) as mock_server:
+        os.environ["OPENAI_BASE_URL"] = f"{mock_server.url}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+        from app.services.uploads import vision_files
+
+        # Todos os modos pagam os mesmos uploads
+        vision_files.enabled = False
+        image = make_test_jpeg()
+
+        async def bench():
+            results = {}
+            for mode in MODES:
+                results[mode] = await run_mode(mock_app, mode, args.analyses, image)
+            return results
+
+        results = asyncio.run(bench())
+        print(f"{'modo':>7} {'extra p50 (ms)':>15} {'extra p95 (ms)':>15} {'chamadas/análise':>17} {'polls/análise':>14}")
+        for mode, (overheads, calls, polls) in results.items():
+            print(f"{mode:>7} {statistics.median(overheads) * 1000:>15.0f} "
+                  f"{percentile(overheads, 95) * 1000:>15.0f} {calls:>17.1f} {polls:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
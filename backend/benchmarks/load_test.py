@@ -0,0 +1,168 @@
+# load_test.py - Teste de carga de /api/analyze e /api/generate-pdf contra o mock da OpenAI
+#
+# Uso (a partir de backend/):
+#   python -m benchmarks.load_test --concurrency 1 4 16 32 --requests 64 --run-latency lognormal:2,0.5
+#   python -m benchmarks.load_test --endpoints pdf --concurrency 1 2 4 --pdf-cache
+#   python -m benchmarks.load_test --error-rate 0.02 --rate-limit-rate 0.05 --json resultado.json
+#
+# Sem --target, sobe o mock (benchmarks/mock_openai.py) e o backend em threads
+# locais, com OPENAI_BASE_URL apontando para o mock: nenhuma chamada paga.
+# Com --target http://host:8000, usa um backend já rodando (que deve ter
+# OPENAI_BASE_URL apontando para o mock) e as fotos de --image-base.
+#
+# Cada nível de concorrência roda N clientes em loop fechado até completar
+# --requests requisições por endpoint; reporta vazão (req/s), erros e
+# latência média/p50/p95/p99. Análises usam bypass_cache e procedimentos
+# únicos (sem cache nem coalescing); PDFs variam a análise para não acertar o
+# cache de PDF, a não ser com --pdf-cache.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.bench_run_wait import percentile
+from benchmarks.mock_openai import CANNED_ANALYSIS, ServerThread, add_mock_arguments, mock_app_from_args
+
+ENDPOINTS = {"analyze": "/api/analyze", "pdf": "/api/generate-pdf"}
+
+
+def analyze_payload(image_base, seq):
+    return {
+        "before_image_url": f"{image_base}/before.jpg",
+        "after_image_url": f"{image_base}/after.jpg",
+        # Procedimento único por requisição: cada uma vira um run no mock
+        "procedures": ["Toxina Botulínica", f"carga-{seq}"],
+        "bypass_cache": True,
+    }
+
+
+def pdf_payload(image_base, analysis, seq, use_cache):
+    if not use_cache:
+        analysis = {**analysis, "load_test_seq": seq}
+    return {
+        "before_url": f"{image_base}/before.jpg",
+        "after_url": f"{image_base}/after.jpg",
+        "analysis_results": analysis,
+    }
+
+
+async def run_level(client, endpoint, make_payload, concurrency, total):
+    """Loop fechado: `concurrency` clientes disparam até somar `total` requisições
+
+    `make_payload(key)` monta o corpo de cada requisição a partir de uma chave única.
+    """
+    sequence = iter(range(total))
+    latencies = []
+    statuses = Counter()
+
+    async def worker():
+        for seq in sequence:
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=make_payload(f"{concurrency}-{seq}"))
+                statuses[response.status_code] += 1
+                if response.is_success:
+                    latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    row = {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+    }
+    if latencies:
+        row.update({
+            "mean_s": round(statistics.fmean(latencies), 3),
+            "p50_s": round(percentile(latencies, 50), 3),
+            "p95_s": round(percentile(latencies, 95), 3),
+            "p99_s": round(percentile(latencies, 99), 3),
+        })
+    return row
+
+
+async def sample_analysis(client, image_base):
+    """Resultado real de uma análise para alimentar os PDFs (CANNED_ANALYSIS se falhar)"""
+    try:
+        response = await client.post("/api/analyze", json=analyze_payload(image_base, "amostra"))
+        response.raise_for_status()
+        return response.json()["analysis"]
+    except (httpx.HTTPError, KeyError):
+        return CANNED_ANALYSIS
+
+
+async def run_suite(backend_url, image_base, args):
+    # Limites do httpx acima da maior concorrência: a fila deve ficar no backend, não no cliente
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=backend_url, timeout=args.timeout, limits=limits) as client:
+        analysis = await sample_analysis(client, image_base)
+        results = {}
+        # Chave única por requisição ("nível-sequência") evita cache e coalescing
+        builders = {
+            "analyze": lambda key: analyze_payload(image_base, key),
+            "pdf": lambda key: pdf_payload(image_base, analysis, key, args.pdf_cache),
+        }
+        for name in args.endpoints:
+            rows = []
+            print(f"\n{ENDPOINTS[name]}")
+            print(f"{'N':>4} {'req':>5} {'erros':>6} {'req/s':>7} {'média':>7} {'p50':>7} {'p95':>7} {'p99':>7}")
+            for level in args.concurrency:
+                total = max(args.requests, level)
+                row = await run_level(client, ENDPOINTS[name], builders[name], level, total)
+                rows.append(row)
+                print(
+                    f"{level:>4} {total:>5} {row['errors']:>6} {row['throughput_rps']:>7.2f} "
+                    + " ".join(f"{row.get(key, float('nan')):>7.2f}" for key in ("mean_s", "p50_s", "p95_s", "p99_s"))
+                )
+            results[name] = rows
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga de /api/analyze e /api/generate-pdf")
+    parser.add_argument("--endpoints", nargs="+", choices=sorted(ENDPOINTS), default=["analyze", "pdf"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=32, help="requisições por nível (mínimo = concorrência)")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--pdf-cache", action="store_true", help="permite acertos no cache de PDF")
+    parser.add_argument("--target", help="backend já rodando (padrão: sobe um local)")
+    parser.add_argument("--image-base", help="URL base das fotos before.jpg/after.jpg (padrão: mock)")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    if args.target:
+        if not args.image_base:
+            parser.error("--image-base é obrigatório com --target")
+        results = asyncio.run(run_suite(args.target, args.image_base, args))
+    else:
+        mock = mock_app_from_args(args)
+        with ServerThread(mock) as mock_server:
+            os.environ["OPENAI_BASE_URL"] = f"{mock_server.url}/v1"
+            os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+            from app.main import app
+
+            with ServerThread(app) as backend:
+                results = asyncio.run(run_suite(backend.url, args.image_base or f"{mock_server.url}/images", args))
+            print(f"\nChamadas ao mock: {sum(mock.state.calls.values())} | falhas injetadas: {dict(mock.state.injected)}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+# mock_openai.py - Servidor local que imita os endpoints da OpenAI usados pelo backend
+import asyncio
+import io
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+CANNED_ANALYSIS = {
+    "areas": {
+        "forehead": {
+            "score": "B",
+            "description": "Redução visível das linhas horizontais da testa",
+            "metrics": {"wrinkle_reduction": 22, "smoothness_improvement": 15}
+        },
+        "nose": {
+            "score": "C",
+            "description": "Leve melhoria na textura da região nasal",
+            "metrics": {"texture_improvement": 8}
+        },
+        "under_eye": {
+            "score": "B",
+            "description": "Área infraorbital mais iluminada e uniforme",
+            "metrics": {"brightness_improvement": 18, "uniformity_improvement": 12, "texture_improvement": 9}
+        }
+    },
+    "global": {
+        "apparent_age": {"after": 34, "reduction": 2},
+        "harmony": 88
+    }
+}
+
+
+# Variações reais de resposta de LLM: JSON puro, em bloco de código e com texto em volta
+CANNED_RESPONSES = [
+    json.dumps(CANNED_ANALYSIS, ensure_ascii=False),
+    "```json\n" + json.dumps(CANNED_ANALYSIS, ensure_ascii=False, indent=2) + "\n```",
+    "Segue a análise comparativa solicitada:\n\n```json\n"
+    + json.dumps(CANNED_ANALYSIS, ensure_ascii=False, indent=2)
+    + "\n```\n\nObservação: resultados dependem da iluminação das fotos.",
+]
+
+
+class Latency:
+    """Distribuição de latência em segundos a partir de uma especificação em texto
+
+    "0.05" (fixa), "uniform:0.02,0.2", "normal:1.0,0.3" (média, desvio; truncada em 0),
+    "lognormal:2.0,0.5" (mediana, sigma - cauda longa como a da OpenAI) e "exp:1.5" (média).
+    """
+
+    def __init__(self, spec, rng=None):
+        self.spec = str(spec)
+        self.rng = rng or random.Random()
+        kind, _, params = self.spec.partition(":")
+        if not params:
+            kind, params = "const", kind
+        self.kind = kind
+        self.params = [float(value) for value in params.split(",")]
+        expected = {"const": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if expected.get(kind) != len(self.params):
+            raise ValueError(f"Latência inválida: '{spec}'")
+
+    @classmethod
+    def of(cls, value, rng=None):
+        return value if isinstance(value, Latency) else cls(value, rng)
+
+    def sample(self):
+        p = self.params
+        if self.kind == "const":
+            return p[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, self.rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(math.log(p[0]), p[1])
+        return self.rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+
+    def __repr__(self):
+        return f"Latency({self.spec!r})"
+
+
+def load_responses(path):
+    """Respostas enlatadas de um arquivo JSON: lista de objetos (serializados) ou de textos"""
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"{path}: esperado uma lista não vazia de respostas")
+    return [item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in items]
+
+
+def make_test_jpeg(width=1024, height=1280, quality=90):
+    """Gera um JPEG sintético (gradiente) para servir como foto de teste"""
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def create_mock_app(run_latency=2.0, request_latency=0.05, response_text=None, run_jitter=0.0,
+                    queue_latency=0.0, error_rate=0.0, rate_limit_rate=0.0, run_failure_rate=0.0,
+                    responses=None, seed=None):
+    """Cria o app FastAPI do mock
+
+    Latências aceitam número ou especificação de `Latency` ("lognormal:2,0.5"). O run fica
+    `queued` por queue_latency e `in_progress` por run_latency + uniforme(0, run_jitter).
+    Falhas injetadas: error_rate (HTTP 500) e rate_limit_rate (HTTP 429) por chamada à API,
+    run_failure_rate (run termina "failed"). A resposta do assistant é sorteada de
+    `responses` (padrão: `response_text` ou o CANNED_ANALYSIS em JSON).
+    """
+    app = FastAPI(title="Mock OpenAI")
+    rng = random.Random(seed)
+    request_latency = Latency.of(request_latency, rng)
+    run_latency = Latency.of(run_latency, rng)
+    queue_latency = Latency.of(queue_latency, rng)
+    ids = itertools.count(1)
+    runs = {}
+    thread_answers = {}
+    app.state.runs = runs
+    # Chamadas recebidas por rota ("POST /v1/threads/{thread_id}/runs", ...)
+    app.state.calls = Counter()
+    # Falhas injetadas por tipo ("http_500", "http_429", "run_failed")
+    app.state.injected = Counter()
+    answers = responses or [response_text or json.dumps(CANNED_ANALYSIS, ensure_ascii=False)]
+
+    @app.middleware("http")
+    async def count_calls(request, call_next):
+        if request.url.path.startswith("/v1/"):
+            roll = rng.random()
+            if roll < rate_limit_rate:
+                app.state.injected["http_429"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    content={"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                    headers={"retry-after-ms": "200"}
+                )
+            if roll < rate_limit_rate + error_rate:
+                app.state.injected["http_500"] += 1
+                await asyncio.sleep(request_latency.sample())
+                return JSONResponse(
+                    status_code=500,
+                    content={"error": {"message": "The server had an error (mock)", "type": "server_error", "code": None}}
+                )
+        response = await call_next(request)
+        route = request.scope.get("route")
+        app.state.calls[f"{request.method} {route.path if route else request.url.path}"] += 1
+        return response
+
+    image_bytes = make_test_jpeg()
+
+    def new_id(prefix):
+        return f"{prefix}_{next(ids):06d}"
+
+    def run_status(run):
+        now = time.time()
+        if now < run["started_at"]:
+            return "queued"
+        if now < run["done_at"]:
+            return "in_progress"
+        return "failed" if run["fails"] else "completed"
+
+    def run_object(run_id):
+        run = runs[run_id]
+        status = run_status(run)
+        data = {
+            "id": run_id,
+            "object": "thread.run",
+            "created_at": int(run["created_at"]),
+            "thread_id": run["thread_id"],
+            "assistant_id": run["assistant_id"],
+            "status": status,
+            "model": "mock",
+            "instructions": "",
+            "tools": [],
+            "parallel_tool_calls": True,
+        }
+        if status == "failed":
+            data["last_error"] = {"code": "server_error", "message": "Run failed (mock)"}
+        return data
+
+    @app.post("/v1/files")
+    async def create_file(request: Request):
+        await asyncio.sleep(request_latency.sample())
+        body = await request.body()
+        return {
+            "id": new_id("file"),
+            "object": "file",
+            "bytes": len(body),
+            "created_at": int(time.time()),
+            "filename": "upload.jpg",
+            "purpose": "vision",
+            "status": "processed",
+        }
+
+    @app.delete("/v1/files/{file_id}")
+    async def delete_file(file_id: str):
+        await asyncio.sleep(request_latency.sample())
+        return {"id": file_id, "object": "file", "deleted": True}
+
+    @app.post("/v1/threads")
+    async def create_thread():
+        await asyncio.sleep(request_latency.sample())
+        return {"id": new_id("thread"), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str):
+        await asyncio.sleep(request_latency.sample())
+        return {
+            "id": new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": "user",
+            "content": [],
+            "attachments": [],
+            "metadata": {},
+        }
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        await asyncio.sleep(request_latency.sample())
+        payload = await request.json()
+        run_id = new_id("run")
+        now = time.time()
+        started_at = now + queue_latency.sample()
+        fails = rng.random() < run_failure_rate
+        if fails:
+            app.state.injected["run_failed"] += 1
+        runs[run_id] = {
+            "thread_id": thread_id,
+            "assistant_id": payload.get("assistant_id", ""),
+            "created_at": now,
+            "started_at": started_at,
+            "done_at": started_at + run_latency.sample() + rng.uniform(0, run_jitter),
+            "fails": fails,
+        }
+        thread_answers[thread_id] = rng.choice(answers)
+        data = run_object(run_id)
+        data["status"] = "queued"
+        if payload.get("stream"):
+            return StreamingResponse(stream_run(run_id, data), media_type="text/event-stream")
+        return data
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def stream_run(run_id, data):
+        run = runs[run_id]
+        yield sse("thread.run.created", data)
+        yield sse("thread.run.queued", data)
+        await asyncio.sleep(max(0.0, run["started_at"] - time.time()))
+        yield sse("thread.run.in_progress", {**data, "status": "in_progress"})
+        await asyncio.sleep(max(0.0, run["done_at"] - time.time()))
+        if run["fails"]:
+            yield sse("thread.run.failed", run_object(run_id))
+        else:
+            yield sse("thread.message.completed", assistant_message(data["thread_id"]))
+            yield sse("thread.run.completed", run_object(run_id))
+        yield "event: done\ndata: [DONE]\n\n"
+
+    def assistant_message(thread_id):
+        return {
+            "id": new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "text", "text": {"value": thread_answers.get(thread_id, answers[0]), "annotations": []}}],
+            "attachments": [],
+            "metadata": {},
+        }
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        await asyncio.sleep(request_latency.sample())
+        if run_id not in runs:
+            return JSONResponse(status_code=404, content={"error": {"message": "run not found"}})
+        return run_object(run_id)
+
+    @app.get("/v1/threads/{thread_id}/messages")
+    async def list_messages(thread_id: str):
+        await asyncio.sleep(request_latency.sample())
+        message = assistant_message(thread_id)
+        return {"object": "list", "data": [message], "first_id": message["id"], "last_id": message["id"], "has_more": False}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completion(request: Request):
+        payload = await request.json()
+        await asyncio.sleep(queue_latency.sample() + run_latency.sample() + rng.uniform(0, run_jitter))
+        if rng.random() < run_failure_rate:
+            app.state.injected["run_failed"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "The model failed to respond (mock)", "type": "server_error", "code": None}}
+            )
+        return {
+            "id": new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": rng.choice(answers)},
+            }],
+            "usage": {"prompt_tokens": 1200, "completion_tokens": 250, "total_tokens": 1450},
+        }
+
+    image_etag = '"mock-image-v1"'
+
+    @app.get("/images/{name}")
+    async def get_image(name: str, request: Request):
+        await asyncio.sleep(request_latency.sample())
+        if request.headers.get("if-none-match") == image_etag:
+            return Response(status_code=304, headers={"ETag": image_etag})
+        return Response(content=image_bytes, media_type="image/jpeg", headers={"ETag": image_etag})
+
+    return app
+
+
+class ServerThread:
+    """Roda um app ASGI com uvicorn em uma thread separada"""
+
+    def __init__(self, app, host="127.0.0.1", port=0):
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def add_mock_arguments(parser):
+    """Opções do mock compartilhadas pelo servidor avulso e pelo teste de carga"""
+    parser.add_argument("--run-latency", default="2.0", help='segundos ou distribuição ("lognormal:2,0.5")')
+    parser.add_argument("--queue-latency", default="0", help="tempo do run em 'queued'")
+    parser.add_argument("--request-latency", default="0.05", help="latência das demais chamadas")
+    parser.add_argument("--run-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de chamadas com HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fração de chamadas com HTTP 429")
+    parser.add_argument("--run-failure-rate", type=float, default=0.0, help='fração de runs que terminam "failed"')
+    parser.add_argument("--responses", help="arquivo JSON com a lista de respostas enlatadas")
+    parser.add_argument("--response-variants", action="store_true",
+                        help="sorteia entre JSON puro, bloco ```json e texto + JSON")
+    parser.add_argument("--seed", type=int)
+
+
+def mock_app_from_args(args):
+    if args.responses:
+        responses = load_responses(args.responses)
+    else:
+        responses = CANNED_RESPONSES if args.response_variants else None
+    return create_mock_app(
+        args.run_latency, args.request_latency, run_jitter=args.run_jitter,
+        queue_latency=args.queue_latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, run_failure_rate=args.run_failure_rate,
+        responses=responses, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    # Avulso: python -m benchmarks.mock_openai --port 8100 --run-latency lognormal:2,0.5
+    # e no backend: OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=sk-mock
+    parser = argparse.ArgumentParser(description="Mock local da OpenAI para testes de carga")
+    parser.add_argument("--port", type=int, default=8100)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(mock_app_from_args(args), host="127.0.0.1", port=args.port)
@@ -0,0 +1,29 @@
+# photos.py - Fotos sintéticas com entropia parecida com a de câmeras de celular
+import io
+import random
+
+from PIL import Image, ImageFilter
+
+# (nome, largura, altura) - resoluções típicas de fotos enviadas pelas clínicas
+PHONE_RESOLUTIONS = [
+    ("12MP", 4032, 3024),
+    ("8MP", 3264, 2448),
+    ("3MP", 2048, 1536),
+    ("1MP", 1280, 960),
+]
+
+
+def make_photo(width, height, quality=92, seed=0, exif_orientation=None):
+    """JPEG com gradiente + ruído (comprime como uma foto real, não como um gradiente liso)"""
+    rng = random.Random(seed)
+    base = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    noise = noise.filter(ImageFilter.GaussianBlur(1))
+    photo = Image.blend(base, noise, 0.35)
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = "GlowMetrics Bench"  # Make
+    if exif_orientation:
+        exif[0x0112] = exif_orientation
+    photo.save(buffer, format="JPEG", quality=quality, exif=exif.tobytes())
+    return buffer.getvalue()
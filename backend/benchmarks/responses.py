@@ -0,0 +1,73 @@
+# responses.py - Respostas sintéticas do modelo (formatos válidos e defeituosos) para benchmarks
+import json
+
+_SENTENCES = [
+    "Observa-se redução consistente das linhas de expressão na região avaliada",
+    "a textura da pele apresenta-se mais uniforme, com poros menos aparentes sob iluminação lateral",
+    "não foram identificados sinais de edema, equimose ou assimetria residual após o procedimento",
+    "recomenda-se manter a rotina de fotoproteção e hidratação para preservar o resultado obtido",
+    "a comparação considera diferenças de iluminação, ângulo e distância entre as duas fotografias",
+]
+
+
+def long_description(chars=1500):
+    """Parágrafo em português com ~`chars` caracteres (descrições verbosas do modelo)"""
+    text = ""
+    index = 0
+    while len(text) < chars:
+        sentence = _SENTENCES[index % len(_SENTENCES)]
+        text += (sentence[0].upper() + sentence[1:] if not text else sentence) + "; "
+        index += 1
+    return text.rstrip("; ") + "."
+
+
+def make_analysis(description_chars=None):
+    """Análise no formato pedido no prompt; descrições longas com `description_chars`"""
+    def describe(short):
+        return long_description(description_chars) if description_chars else short
+    return {
+        "areas": {
+            "forehead": {
+                "score": "B",
+                "description": describe("Redução visível das linhas horizontais da testa"),
+                "metrics": {"wrinkle_reduction": 22, "smoothness_improvement": 15}
+            },
+            "nose": {
+                "score": "C",
+                "description": describe("Leve melhoria na textura da região nasal"),
+                "metrics": {"texture_improvement": 8}
+            },
+            "under_eye": {
+                "score": "B",
+                "description": describe("Área infraorbital mais iluminada e uniforme"),
+                "metrics": {"brightness_improvement": 18, "uniformity_improvement": 12, "texture_improvement": 9}
+            }
+        },
+        "global": {
+            "apparent_age": {"after": 34, "reduction": 2},
+            "harmony": 88
+        }
+    }
+
+
+def make_corpus():
+    """Respostas por nome; as marcadas como defeituosas reproduzem vícios comuns de LLMs"""
+    analysis = make_analysis()
+    compact = json.dumps(analysis, ensure_ascii=False)
+    pretty = json.dumps(analysis, ensure_ascii=False, indent=2)
+    return {
+        "json": compact,
+        "json_longo": json.dumps(make_analysis(1500), ensure_ascii=False, indent=2),
+        "bloco_json": f"```json\n{pretty}\n```",
+        "bloco_sem_linguagem": f"```\n{pretty}\n```",
+        "texto_e_bloco": (
+            "Segue a análise comparativa das fotos enviadas:\n\n"
+            f"```json\n{pretty}\n```\n\n"
+            "Observação: os resultados dependem da padronização das fotos."
+        ),
+        # Defeituosas
+        "texto_e_json_sem_bloco": f"Claro! Aqui está a análise solicitada: {compact} Espero ter ajudado.",
+        "virgula_final": pretty.replace('"harmony": 88', '"harmony": 88,'),
+        "aspas_simples": compact.replace('"', "'"),
+        "truncado": pretty[: int(len(pretty) * 0.7)],
+    }
@@ -0,0 +1,42 @@
+# test_analysis_cache.py - Cache de análises: níveis memória/disco sem I/O no event loop
+import asyncio
+import threading
+
+from app.services import cache
+from app.services.cache import AnalysisCache
+
+RESULT = {"analysis": {"areas": {}, "global": {}}, "raw_response": "{}"}
+
+
+def test_disk_tier_survives_restart_and_is_read_off_the_loop(tmp_path, monkeypatch):
+    asyncio.run(AnalysisCache(directory=str(tmp_path)).set("chave", RESULT))
+    threads = []
+    original = cache.json.load
+
+    def load(f):
+        threads.append(threading.get_ident())
+        return original(f)
+
+    monkeypatch.setattr(cache.json, "load", load)
+    restarted = AnalysisCache(directory=str(tmp_path))
+
+    async def scenario():
+        return await restarted.get("chave"), await restarted.get("chave"), threading.get_ident()
+
+    from_disk, from_memory, loop_thread = asyncio.run(scenario())
+
+    assert from_disk == (RESULT, "disk")
+    assert from_memory == (RESULT, "memory")
+    assert threads and loop_thread not in threads
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    warm = AnalysisCache(directory=str(tmp_path))
+    asyncio.run(warm.set("chave", RESULT))
+    (tmp_path / "chave.json").write_text("{corrompido", encoding="utf-8")
+    restarted = AnalysisCache(directory=str(tmp_path))
+
+    assert asyncio.run(restarted.get("chave")) == (None, None)
+    stats = restarted.stats()
+    assert (stats["disk_items"], stats["misses"]) == (0, 1)
+    assert not (tmp_path / "chave.json").exists()
@@ -0,0 +1,63 @@
+# test_batch.py - Lote NDJSON: falha isolada por item e retomada pelo batch_id
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.jobs import JobQueue, JobStore
+
+
+def make_client(monkeypatch, failing):
+    """Análise substituída por um stub: itens cujo procedimento está em `failing` falham"""
+    calls = []
+
+    async def run_analysis(request):
+        calls.append(request.procedures[0])
+        if request.procedures[0] in failing:
+            raise RuntimeError("modelo indisponível")
+        return {"analysis": {"item": request.procedures[0]}, "cache": "MISS"}
+
+    monkeypatch.setattr(main, "run_analysis", run_analysis)
+    monkeypatch.setattr(main, "analysis_jobs", JobQueue(JobStore(":memory:"), handler=None))
+    return TestClient(main.app), calls
+
+
+def batch(batch_id, *ids):
+    items = [
+        {"id": item_id, "before_image_url": f"https://fotos/{item_id}-a.jpg",
+         "after_image_url": f"https://fotos/{item_id}-d.jpg", "procedures": [item_id]}
+        for item_id in ids
+    ]
+    return {"batch_id": batch_id, "items": items, "concurrency": 2}
+
+
+def post_batch(client, body):
+    response = client.post("/api/analyze/batch", json=body)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    items = {line["id"]: line for line in lines if line["type"] == "item"}
+    return items, lines[-1]
+
+
+def test_failed_item_does_not_stop_the_batch_and_rerun_resumes(monkeypatch):
+    failing = {"b"}
+    client, calls = make_client(monkeypatch, failing)
+
+    items, summary = post_batch(client, batch("lote-1", "a", "b", "c"))
+
+    assert {item_id: line["status"] for item_id, line in items.items()} == {
+        "a": "completed", "b": "failed", "c": "completed"
+    }
+    assert items["b"]["error"] == "Erro na análise: modelo indisponível"
+    assert (summary["type"], summary["completed"], summary["failed"]) == ("summary", 2, 1)
+
+    # Reenvio do mesmo lote: só o item que falhou é analisado de novo
+    failing.clear()
+    calls.clear()
+    items, summary = post_batch(client, batch("lote-1", "a", "b", "c"))
+
+    assert calls == ["b"]
+    assert items["a"]["resumed"] and items["c"]["resumed"]
+    assert items["a"]["analysis"] == {"item": "a"}
+    assert items["b"]["status"] == "completed" and "resumed" not in items["b"]
+    assert (summary["completed"], summary["failed"], summary["resumed"]) == (3, 0, 2)
@@ -0,0 +1,63 @@
+# test_bench_hotpaths.py - Baseline versionado e caminho --save/--compare do bench_hotpaths
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.bench_hotpaths import build_cases, compare
+from benchmarks.photos import PHONE_RESOLUTIONS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+
+
+def result(best_s, peak_bytes=100_000, outcome="ok"):
+    return {"outcome": outcome, "median_s": best_s, "best_s": best_s, "peak_bytes": peak_bytes}
+
+
+def run_bench(*args):
+    return subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_hotpaths", "--filter", "wrap_text[titulo]",
+         "--repeat", "1", "--min-time", "0.01", *args],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+def test_compare_reports_time_memory_and_outcome_regressions():
+    baseline = {"a": result(1.0), "b": result(1.0), "c": result(1.0), "d": result(1.0)}
+    current = {
+        "a": result(1.2),
+        "b": result(1.5),
+        "c": result(1.0, peak_bytes=1_000_000),
+        "d": result(1.0, outcome="erro"),
+        "novo": result(9.0),
+    }
+
+    regressions = compare(current, baseline, threshold=0.25, memory_threshold=0.25)
+
+    assert [line.split(":")[0] for line in regressions] == ["b", "c", "d"]
+
+
+def test_committed_baseline_covers_every_case():
+    with open(BASELINE, encoding="utf-8") as f:
+        saved = json.load(f)["results"]
+    names = {name for name, _ in build_cases(lambda name: False)}
+    names |= {f"make_clinic_pdf[{name}]" for name, _, _ in PHONE_RESOLUTIONS}
+
+    assert set(saved) == names
+    assert all(entry["best_s"] > 0 for entry in saved.values())
+
+
+def test_save_then_compare_exits_with_regressions(tmp_path):
+    path = tmp_path / "baseline.json"
+    assert run_bench("--save", str(path)).returncode == 0
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert list(saved["results"]) == ["wrap_text[titulo]"]
+
+    assert run_bench("--compare", str(path), "--threshold", "100").returncode == 0
+
+    saved["results"]["wrap_text[titulo]"]["best_s"] /= 1000
+    path.write_text(json.dumps(saved), encoding="utf-8")
+    regressed = run_bench("--compare", str(path))
+    assert regressed.returncode == 1
+    assert "wrap_text[titulo]: tempo" in regressed.stdout
@@ -0,0 +1,74 @@
+# test_coalesce.py - Single-flight de análises idênticas simultâneas
+import asyncio
+
+import pytest
+
+from app.services.coalesce import SingleFlight, make_request_key
+
+
+def test_request_key_normalizes_urls_and_procedure_order():
+    first = make_request_key(" https://a/1.jpg ", "https://a/2.jpg", ["Laser", "Botox"])
+    second = make_request_key("https://a/1.jpg", "https://a/2.jpg ", ["Botox", "Laser"])
+
+    assert first == second
+    assert first != make_request_key("https://a/1.jpg", "https://a/2.jpg", ["Botox", "Laser"], bypass_cache=True)
+
+
+def test_waiters_share_the_leader_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"score": "B"}
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("k", analyze) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert results == [({"score": "B"}, False), ({"score": "B"}, True), ({"score": "B"}, True)]
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "joined": 2}
+
+
+def test_cancelled_leader_does_not_cancel_the_execution():
+    flights = SingleFlight()
+    finished = []
+
+    async def analyze():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "resultado"
+
+    async def scenario():
+        leader = asyncio.create_task(flights.run("k", analyze))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.run("k", analyze))
+        await asyncio.sleep(0)
+        # Cliente que iniciou a análise desconecta
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(scenario()) == ("resultado", True)
+    assert finished == [True]
+
+
+def test_errors_reach_every_waiter_and_release_the_key():
+    flights = SingleFlight()
+
+    async def analyze():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("modelo indisponível")
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.run("k", analyze) for _ in range(2)), return_exceptions=True)
+        return results, "k" in flights
+
+    results, still_in_flight = asyncio.run(scenario())
+
+    assert [str(error) for error in results] == ["modelo indisponível"] * 2
+    assert not still_in_flight
@@ -0,0 +1,38 @@
+# test_export.py - manifest.json da exportação não expõe detalhes internos dos erros
+import asyncio
+import io
+import json
+import zipfile
+from types import SimpleNamespace
+
+from app.services.export import MANIFEST_NAME, stream_zip_export
+from app.services.render_pool import RenderPoolBusy
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_manifest_errors_hide_paths_and_exception_text():
+    items = [SimpleNamespace(filename=name) for name in ("ok", "sem-foto", "ocupado", "quebrado")]
+
+    async def render(item):
+        if item.filename == "sem-foto":
+            raise FileNotFoundError(2, "No such file or directory", "/srv/fotos/clinica-7/antes.jpg")
+        if item.filename == "ocupado":
+            raise RenderPoolBusy("Muitos PDFs em geração, tente novamente em instantes")
+        if item.filename == "quebrado":
+            raise KeyError("/var/cache/glowmetrics/pdf/ab12.pdf")
+        return b"%PDF-1.4 ok"
+
+    data = asyncio.run(collect(stream_zip_export(items, render, 2)))
+
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(data)).read(MANIFEST_NAME))
+    errors = {entry["file"]: entry.get("error") for entry in manifest["items"]}
+    assert errors == {
+        "ok.pdf": None,
+        "sem-foto.pdf": "Imagem inválida ou inacessível",
+        "ocupado.pdf": "Muitos PDFs em geração, tente novamente em instantes",
+        "quebrado.pdf": "Erro ao gerar o PDF",
+    }
+    assert (manifest["succeeded"], manifest["failed"]) == (1, 3)
@@ -0,0 +1,102 @@
+# test_generate_pdf.py - Novos downloads do mesmo relatório reaproveitam o cache de PDFs
+import json
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import pdf
+from app.services.image_cache import ImageCache
+from app.services.parse import parse_chatgpt_response
+from app.services.pdf_cache import PdfCache
+from app.services.render_pool import RenderPool
+from benchmarks.photos import make_photo
+from benchmarks.responses import make_analysis
+
+
+def make_client(tmp_path, monkeypatch):
+    """Fotos via file:// e caches vazios em tmp_path; PDF renderizado em thread"""
+    (tmp_path / "before.jpg").write_bytes(make_photo(64, 48, seed=1))
+    (tmp_path / "after.jpg").write_bytes(make_photo(64, 48, seed=2))
+    monkeypatch.setattr(main, "image_cache", ImageCache(directory=str(tmp_path / "images"), local_dir=str(tmp_path)))
+    monkeypatch.setattr(main, "pdf_cache", PdfCache(directory=str(tmp_path / "pdfs")))
+    monkeypatch.setattr(main, "render_pool", RenderPool(workers=0))
+    return TestClient(main.app)
+
+
+class LaterClock(datetime):
+    """Cada now() uma hora depois do anterior: downloads em momentos diferentes"""
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return datetime(2026, 3, 5, 9, 0, tzinfo=tz) + timedelta(hours=cls.calls)
+
+
+class NextDayClock(datetime):
+    """Cada now() um dia depois do anterior"""
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return datetime(2026, 3, 4, 9, 0, tzinfo=tz) + timedelta(days=cls.calls)
+
+
+def pdf_request(analysis_results):
+    return {
+        "before_url": "file://before.jpg",
+        "after_url": "file://after.jpg",
+        "analysis_results": analysis_results,
+    }
+
+
+def test_repeated_download_without_generated_at_hits_cache(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    monkeypatch.setattr(main, "datetime", LaterClock)
+    analysis = parse_chatgpt_response(json.dumps(make_analysis()))
+
+    first = client.post("/api/generate-pdf?format=pdf", json=pdf_request(analysis))
+    second = client.post("/api/generate-pdf?format=pdf", json=pdf_request(analysis))
+
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert [first.headers["X-PDF-Cache"], second.headers["X-PDF-Cache"]] == ["MISS", "HIT"]
+    assert second.content == first.content
+
+
+def test_analysis_date_is_the_default_report_date(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    analysis = parse_chatgpt_response(json.dumps(make_analysis()))
+    analysis["analyzed_at"] = "2026-03-05T14:30:00"
+
+    implicit = client.post("/api/generate-pdf?format=pdf", json=pdf_request(analysis))
+    explicit = client.post(
+        "/api/generate-pdf?format=pdf",
+        json={**pdf_request(analysis), "generated_at": "2026-03-05T14:30:00"},
+    )
+
+    assert [implicit.headers["X-PDF-Cache"], explicit.headers["X-PDF-Cache"]] == ["MISS", "HIT"]
+
+
+def test_undated_analysis_on_different_days_prints_no_stale_date(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    monkeypatch.setattr(main, "datetime", NextDayClock)
+    monkeypatch.setattr(pdf, "datetime", NextDayClock)
+    printed = []
+    original = pdf.format_report_date
+
+    def record(generated_at=None):
+        printed.append(original(generated_at))
+        return printed[-1]
+
+    monkeypatch.setattr(pdf, "format_report_date", record)
+    # Análise gravada antes do "analyzed_at": sem data própria
+    analysis = parse_chatgpt_response(json.dumps(make_analysis()))
+
+    first = client.post("/api/generate-pdf?format=pdf", json=pdf_request(analysis))
+    second = client.post("/api/generate-pdf?format=pdf", json=pdf_request(analysis))
+
+    assert [first.headers["X-PDF-Cache"], second.headers["X-PDF-Cache"]] == ["MISS", "HIT"]
+    # Nenhum carimbo do relógio no PDF reaproveitado no dia seguinte
+    assert printed == []
@@ -0,0 +1,61 @@
+# test_idempotency.py - Idempotency-Key em POST /api/analyze
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.jobs import JobQueue, JobStore
+
+BODY = {
+    "before_image_url": "https://fotos/antes.jpg",
+    "after_image_url": "https://fotos/depois.jpg",
+    "procedures": ["Toxina Botulínica"],
+}
+
+
+def make_client(monkeypatch):
+    """Análise substituída por um stub que conta as execuções; ledger em SQLite na memória"""
+    calls = []
+
+    async def run_analysis(request):
+        calls.append(request.procedures)
+        return {"analysis": {"areas": {}, "global": {}, "run": len(calls)}, "cache": "MISS"}
+
+    monkeypatch.setattr(main, "run_analysis", run_analysis)
+    monkeypatch.setattr(main, "analysis_jobs", JobQueue(JobStore(":memory:"), handler=None))
+    return TestClient(main.app), calls
+
+
+def test_retry_with_same_key_replays_the_first_response(monkeypatch):
+    client, calls = make_client(monkeypatch)
+    headers = {"Idempotency-Key": "pedido-1"}
+
+    first = client.post("/api/analyze", json=BODY, headers=headers)
+    # Espaços nas URLs não mudam a chave da requisição
+    retry = client.post("/api/analyze", json={**BODY, "before_image_url": " https://fotos/antes.jpg"}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(calls) == 1
+
+
+def test_same_key_with_another_body_is_rejected(monkeypatch):
+    client, calls = make_client(monkeypatch)
+    headers = {"Idempotency-Key": "pedido-2"}
+
+    client.post("/api/analyze", json=BODY, headers=headers)
+    other = client.post("/api/analyze", json={**BODY, "procedures": ["Preenchimento"]}, headers=headers)
+
+    assert other.status_code == 422
+    assert len(calls) == 1
+
+
+def test_invalid_key_is_rejected_before_analyzing(monkeypatch):
+    client, calls = make_client(monkeypatch)
+    monkeypatch.setattr(main, "IDEMPOTENCY_KEY_MAX_LENGTH", 8)
+
+    too_long = client.post("/api/analyze", json=BODY, headers={"Idempotency-Key": "x" * 9})
+    blank = client.post("/api/analyze", json=BODY, headers={"Idempotency-Key": "  "})
+
+    assert (too_long.status_code, blank.status_code) == (400, 400)
+    assert calls == []
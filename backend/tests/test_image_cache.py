@@ -0,0 +1,66 @@
+# test_image_cache.py - Downloads simultâneos da mesma foto no cache de imagens
+import asyncio
+
+from app.services import image_cache
+from app.services.image_cache import ImageCache
+
+PHOTO = b"\xff\xd8" + b"foto" * 1000
+
+
+def fake_downloads(monkeypatch):
+    """Substitui fetch_image por um download lento que registra as URLs pedidas"""
+    calls = []
+
+    async def fetch_image(url, headers=None):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return 200, PHOTO, {"etag": '"v1"'}
+
+    monkeypatch.setattr(image_cache, "fetch_image", fetch_image)
+    return calls
+
+
+def test_same_url_in_parallel_downloads_once(tmp_path, monkeypatch):
+    calls = fake_downloads(monkeypatch)
+    cache = ImageCache(directory=str(tmp_path), max_bytes=len(PHOTO) * 2)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.fetch("https://fotos/a.jpg") for _ in range(4)))
+
+    assert asyncio.run(scenario()) == [PHOTO] * 4
+    assert calls == ["https://fotos/a.jpg"]
+    assert cache.stats()["bytes"] == len(PHOTO)
+
+
+def test_same_content_in_parallel_counts_blob_once(tmp_path, monkeypatch):
+    fake_downloads(monkeypatch)
+    # Espaço para um único blob: contar duas vezes despejaria a foto recém-gravada
+    cache = ImageCache(directory=str(tmp_path), max_bytes=len(PHOTO) + 10)
+
+    async def scenario():
+        return await cache.fetch_pair("https://fotos/a.jpg", "https://fotos/b.jpg")
+
+    assert asyncio.run(scenario()) == [PHOTO, PHOTO]
+    stats = cache.stats()
+    assert (stats["urls"], stats["blobs"], stats["bytes"]) == (2, 1, len(PHOTO))
+    assert not [name for name in (tmp_path / "blobs").iterdir() if name.suffix == ".tmp"]
+
+
+def test_cancelled_download_does_not_cancel_other_waiters(tmp_path, monkeypatch):
+    calls = fake_downloads(monkeypatch)
+    cache = ImageCache(directory=str(tmp_path))
+
+    async def scenario():
+        leader = asyncio.create_task(cache.fetch("https://fotos/a.jpg"))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.fetch("https://fotos/a.jpg"))
+        await asyncio.sleep(0.01)
+        # Cliente do primeiro pedido desconecta no meio do download
+        leader.cancel()
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader_result, waiter_result = asyncio.run(scenario())
+
+    assert isinstance(leader_result, asyncio.CancelledError)
+    assert waiter_result == PHOTO
+    assert calls == ["https://fotos/a.jpg", "https://fotos/a.jpg"]
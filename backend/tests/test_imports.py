@@ -0,0 +1,37 @@
+# test_imports.py - Importar o app não toca no disco; os workers do pool de PDF não importam a API
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code, env=None):
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env={**os.environ, **(env or {})},
+        capture_output=True, text=True, check=True
+    )
+    return completed.stdout.strip().splitlines()[-1]
+
+
+def test_importing_main_creates_no_files(tmp_path):
+    env = {
+        "ANALYSIS_CACHE_DIR": str(tmp_path / "analysis"),
+        "IMAGE_CACHE_DIR": str(tmp_path / "images"),
+        "PDF_IMAGE_CACHE_DIR": str(tmp_path / "pdf-images"),
+        "PDF_CACHE_DIR": str(tmp_path / "pdfs"),
+        "JOB_DB_PATH": str(tmp_path / "jobs.db"),
+    }
+    run_python("import app.main\nprint('ok')", env)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_render_worker_does_not_import_the_api():
+    code = (
+        "import sys\n"
+        "from app.services import render_worker\n"
+        "render_worker._warm_worker()\n"
+        "print(sorted(name for name in ('app.main', 'fastapi', 'openai', 'app.services.jobs') if name in sys.modules))\n"
+    )
+    assert run_python(code) == "[]"
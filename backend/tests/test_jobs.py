@@ -0,0 +1,109 @@
+# test_jobs.py - Fila de análises assíncronas (SQLite em memória; em arquivo para o restart)
+import asyncio
+import time
+
+import pytest
+
+from app.services.jobs import JobQueue, JobStore, QueueFullError
+
+
+def test_janitor_purges_expired_jobs_instead_of_workers():
+    store = JobStore(":memory:")
+    purged = []
+    original = store.purge
+
+    def purge(older_than):
+        purged.append(older_than)
+        original(older_than)
+
+    store.purge = purge
+
+    async def handler(job_id, payload):
+        return {"ok": payload["n"]}
+
+    async def scenario():
+        queue = JobQueue(store, handler, workers=1)
+        await queue.start()
+        job_id = await queue.submit({"n": 1})
+        await queue._queue.join()
+        after_job = list(purged)
+        janitor = asyncio.create_task(queue.run_janitor(interval=0.01, retention=0))
+        await asyncio.sleep(0.1)
+        janitor.cancel()
+        await queue.stop()
+        return job_id, after_job
+
+    job_id, after_job = asyncio.run(scenario())
+
+    assert after_job == []
+    assert purged and purged[-1] <= time.time()
+    assert store.get(job_id) is None
+
+
+async def run_until_idle(queue, *payloads):
+    """Sobe a fila, enfileira `payloads`, espera esvaziar e para; retorna os ids"""
+    await queue.start()
+    job_ids = [await queue.submit(payload) for payload in payloads]
+    await queue._queue.join()
+    await queue.stop()
+    return job_ids
+
+
+def test_jobs_go_from_pending_to_completed_or_failed():
+    store = JobStore(":memory:")
+
+    async def handler(job_id, payload):
+        assert store.get(job_id)["status"] == "processing"
+        if payload["fail"]:
+            raise RuntimeError("modelo indisponível")
+        return {"analysis": {"ok": True}}
+
+    done, failed = asyncio.run(run_until_idle(JobQueue(store, handler), {"fail": False}, {"fail": True}))
+
+    completed = store.get(done)
+    assert completed["status"] == "completed"
+    assert completed["result"] == {"analysis": {"ok": True}}
+    assert completed["started_at"] <= completed["completed_at"]
+    assert store.get(failed)["status"] == "failed"
+    assert store.get(failed)["error_message"] == "Erro na análise: modelo indisponível"
+
+
+def test_jobs_interrupted_by_a_restart_are_requeued(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    before_restart = JobStore(path)
+    stuck = before_restart.create({"n": 1})
+    before_restart.mark_processing(stuck)
+    waiting = before_restart.create({"n": 2})
+    before_restart.close()
+
+    store = JobStore(path)
+    processed = []
+
+    async def handler(job_id, payload):
+        processed.append(payload["n"])
+        return {"n": payload["n"]}
+
+    async def scenario():
+        queue = JobQueue(store, handler, workers=1)
+        await queue.start()
+        await queue._queue.join()
+        await queue.stop()
+
+    asyncio.run(scenario())
+
+    assert processed == [1, 2]
+    assert [store.get(job_id)["status"] for job_id in (stuck, waiting)] == ["completed", "completed"]
+
+
+def test_submit_rejects_when_the_queue_is_full():
+    async def handler(job_id, payload):
+        await asyncio.sleep(1)
+
+    async def scenario():
+        queue = JobQueue(JobStore(":memory:"), handler, workers=1, maxsize=1)
+        queue._queue = asyncio.Queue()  # sem workers: nada sai da fila
+        await queue.submit({"n": 1})
+        with pytest.raises(QueueFullError):
+            await queue.submit({"n": 2})
+
+    asyncio.run(scenario())
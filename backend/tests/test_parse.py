@@ -0,0 +1,70 @@
+# test_parse.py - Respostas do modelo que o parser deve aceitar sem pedir reparo
+import json
+
+import pytest
+
+from app.services.parse import ModelOutputError, extract_json_object, parse_chatgpt_response
+from benchmarks.responses import make_analysis
+
+
+def test_numeric_score_is_normalized_instead_of_rejected():
+    analysis = make_analysis()
+    analysis["areas"]["forehead"]["score"] = 3
+    analysis["areas"]["nose"]["score"] = 2.5
+    analysis["areas"]["under_eye"]["score"] = " b "
+
+    result = parse_chatgpt_response(json.dumps(analysis))
+
+    scores = {area: data["score"] for area, data in result["areas"].items()}
+    assert scores == {"forehead": "D", "nose": "D", "under_eye": "B"}
+
+
+def test_missing_score_falls_back_to_default():
+    analysis = make_analysis()
+    analysis["areas"]["nose"]["score"] = None
+
+    result = parse_chatgpt_response(f"Segue a análise:\n```json\n{json.dumps(analysis)},\n```")
+
+    assert result["areas"]["nose"]["score"] == "D"
+
+
+def test_trailing_commas_are_tolerated():
+    text = json.dumps(make_analysis(), indent=2).replace('"harmony": 88', '"harmony": 88,').replace(
+        '"texture_improvement": 8', '"texture_improvement": 8,'
+    )
+
+    result = parse_chatgpt_response(text)
+
+    assert result["global"]["symmetry"]["after"] == 88
+    assert result["areas"]["nose"]["texture_improvement"] == 8
+
+
+def test_single_quoted_json_keeps_quotes_inside_strings():
+    text = (
+        "{'areas': {'forehead': {'score': 'B', 'description': 'Linhas \"dinâmicas\" suavizadas', "
+        "'metrics': {'wrinkle_reduction': 22}}}, 'global': {'harmony': 88}}"
+    )
+
+    result = parse_chatgpt_response(text)
+
+    assert result["areas"]["forehead"]["description"] == 'Linhas "dinâmicas" suavizadas'
+
+
+def test_escaped_single_quote_inside_single_quoted_string():
+    text = "{'areas': {'nose': {'score': 'C', 'description': 'Textura d\\'água', 'metrics': {}}}}"
+
+    assert extract_json_object(text)["areas"]["nose"]["description"] == "Textura d'água"
+
+
+def test_code_fence_with_prose_and_braces_around_it():
+    analysis = json.dumps(make_analysis(), indent=2)
+    text = f"Critérios {{iluminação}} considerados.\n```json\n{analysis}\n```\nObs.: fotos {{padronizadas}}."
+
+    assert parse_chatgpt_response(text)["areas"]["forehead"]["score"] == "B"
+
+
+def test_truncated_response_raises_model_output_error():
+    text = json.dumps(make_analysis(), indent=2)
+
+    with pytest.raises(ModelOutputError):
+        parse_chatgpt_response(text[: len(text) // 2])
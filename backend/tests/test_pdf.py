@@ -0,0 +1,34 @@
+# test_pdf.py - Relatório longitudinal a partir da saída real do parser
+import io
+import json
+
+from app.services import pdf
+from app.services.parse import parse_chatgpt_response
+from benchmarks.photos import make_photo
+from benchmarks.responses import make_analysis
+
+
+def parsed_analysis(harmony):
+    analysis = make_analysis()
+    analysis["global"]["harmony"] = harmony
+    return parse_chatgpt_response(json.dumps(analysis))
+
+
+def test_trend_page_harmony_uses_parsed_symmetry(monkeypatch):
+    cards = []
+    original = pdf.draw_metric_card_clinic
+
+    def capture(c, x, y, w_card, h_card, title, value, suffix="", improvement=None, color=None, P=None):
+        cards.append((title, value, improvement))
+        return original(c, x, y, w_card, h_card, title, value, suffix, improvement, color, P)
+
+    monkeypatch.setattr(pdf, "draw_metric_card_clinic", capture)
+    photo = make_photo(64, 48)
+    sessions = [
+        {"before_image": photo, "after_image": photo, "analysis_results": parsed_analysis(80)},
+        {"before_image": photo, "after_image": photo, "analysis_results": parsed_analysis(88)},
+    ]
+    pdf.make_patient_report_pdf(sessions, io.BytesIO())
+
+    harmony = [card for card in cards if card[0] == "Harmonia"]
+    assert harmony == [("Harmonia", 88, 10.0)]
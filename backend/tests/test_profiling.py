@@ -0,0 +1,31 @@
+# test_profiling.py - Perfil de rotas com StreamingResponse cobre o trabalho feito no corpo
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.jobs import JobQueue, JobStore
+from app.services.profiling import ProfileStore
+
+
+def score_item(name):
+    return {"item": name}
+
+
+def test_streaming_response_is_profiled_until_the_last_chunk(monkeypatch):
+    async def run_analysis(request):
+        # Roda dentro do corpo do NDJSON, depois que call_next já retornou
+        return {"analysis": score_item(request.procedures[0]), "cache": "MISS"}
+
+    monkeypatch.setattr(main, "run_analysis", run_analysis)
+    monkeypatch.setattr(main, "analysis_jobs", JobQueue(JobStore(":memory:"), handler=None))
+    monkeypatch.setattr(main, "profiles", ProfileStore(token="segredo"))
+    body = {"items": [{"id": "a", "before_image_url": "https://fotos/a.jpg",
+                       "after_image_url": "https://fotos/d.jpg", "procedures": ["a"]}]}
+
+    response = TestClient(main.app).post("/api/analyze/batch", json=body, headers={"X-Profile": "segredo"})
+
+    assert response.status_code == 200
+    capture = main.profiles.get(response.headers["X-Profile-Id"])
+    assert capture.status == 200
+    assert any(name == "score_item" for _, _, name in capture.stats)
+    # A captura foi encerrada: outra requisição pode ser perfilada
+    assert not main.profiles._active.locked()
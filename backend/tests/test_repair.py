@@ -0,0 +1,76 @@
+# test_repair.py - Resposta fora do schema → reparo barato em vez de refazer o run
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app import main
+from app.services import chatgpt
+from app.services.cache import AnalysisCache
+from app.services.image_cache import ImageCache
+from benchmarks.photos import make_photo
+from benchmarks.responses import make_analysis
+
+TRUNCATED = json.dumps(make_analysis(), indent=2)[:300]
+
+
+def stub_pipeline(tmp_path, monkeypatch, repaired_text):
+    """Fotos locais, caches vazios, modelo que devolve JSON truncado e reparo que devolve `repaired_text`"""
+    (tmp_path / "before.jpg").write_bytes(make_photo(64, 48, seed=1))
+    (tmp_path / "after.jpg").write_bytes(make_photo(64, 48, seed=2))
+    monkeypatch.setattr(main, "image_cache", ImageCache(directory=str(tmp_path / "images"), local_dir=str(tmp_path)))
+    monkeypatch.setattr(main, "analysis_cache", AnalysisCache(directory=str(tmp_path / "analysis")))
+    monkeypatch.setattr(main, "OPENAI_REPAIR_MODEL", "modelo-de-reparo")
+    repairs = []
+
+    async def analyze_with_chatgpt(before_image, after_image, procedures=None, backend=None):
+        return TRUNCATED
+
+    async def repair_model_output(response_text, error):
+        repairs.append((response_text, error))
+        return repaired_text
+
+    monkeypatch.setattr(main, "analyze_with_chatgpt", analyze_with_chatgpt)
+    monkeypatch.setattr(main, "repair_model_output", repair_model_output)
+    request = main.AnalysisRequest(before_image_url="file://before.jpg", after_image_url="file://after.jpg")
+    return request, repairs
+
+
+def test_invalid_model_output_is_repaired(tmp_path, monkeypatch):
+    request, repairs = stub_pipeline(tmp_path, monkeypatch, json.dumps(make_analysis()))
+
+    result = asyncio.run(main.execute_analysis(request))
+
+    assert result["repaired"] is True
+    assert result["raw_response"] == TRUNCATED
+    assert result["analysis"]["areas"]["forehead"]["score"] == "B"
+    assert [text for text, _ in repairs] == [TRUNCATED]
+    assert "JSON incompleto" in repairs[0][1]
+
+
+def test_unrepairable_output_fails_after_one_repair(tmp_path, monkeypatch):
+    request, repairs = stub_pipeline(tmp_path, monkeypatch, "ainda sem JSON")
+
+    with pytest.raises(Exception, match="após reparo"):
+        asyncio.run(main.execute_analysis(request))
+    assert len(repairs) == 1
+
+
+def test_repair_asks_for_json_with_the_parse_error(monkeypatch):
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content='{"areas": {}}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(chatgpt, "get_openai_client", lambda: client)
+
+    repaired = asyncio.run(chatgpt.repair_model_output(TRUNCATED, "JSON incompleto"))
+
+    assert repaired == '{"areas": {}}'
+    assert requests[0]["response_format"] == {"type": "json_object"}
+    assert "JSON incompleto" in requests[0]["messages"][1]["content"]
+    assert TRUNCATED in requests[0]["messages"][1]["content"]
@@ -0,0 +1,45 @@
+# test_run_status.py - Run que pede ação de ferramenta falha na hora em vez de esperar o timeout
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import chatgpt
+
+
+def fake_client(statuses):
+    """Cliente OpenAI mínimo: o run passa por `statuses` a cada retrieve; registra os cancelamentos"""
+    cancelled = []
+    statuses = iter(statuses)
+
+    async def create(**kwargs):
+        return SimpleNamespace(id="obj_1")
+
+    async def create_run(**kwargs):
+        return SimpleNamespace(id="run_1", status="queued")
+
+    async def retrieve(thread_id, run_id):
+        return SimpleNamespace(id=run_id, status=next(statuses))
+
+    async def cancel(thread_id, run_id):
+        cancelled.append(run_id)
+
+    runs = SimpleNamespace(create=create_run, retrieve=retrieve, cancel=cancel)
+    threads = SimpleNamespace(create=create, messages=SimpleNamespace(create=create), runs=runs)
+    return SimpleNamespace(beta=SimpleNamespace(threads=threads)), cancelled
+
+
+def test_requires_action_cancels_the_run_and_fails_fast(monkeypatch):
+    async def get_or_upload(client, data, filename):
+        return f"file_{filename}"
+
+    monkeypatch.setattr(chatgpt.vision_files, "get_or_upload", get_or_upload)
+    monkeypatch.setattr(chatgpt, "RUN_WAIT_MODE", "poll")
+    monkeypatch.setattr(chatgpt, "POLL_INITIAL_INTERVAL", 0.01)
+    client, cancelled = fake_client(["in_progress", "requires_action"])
+
+    with pytest.raises(Exception, match="requires_action"):
+        asyncio.run(asyncio.wait_for(
+            chatgpt.AssistantsBackend().analyze(client, b"antes", b"depois", "prompt"), timeout=5
+        ))
+    assert cancelled == ["run_1"]
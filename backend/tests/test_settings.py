@@ -0,0 +1,43 @@
+# test_settings.py - Variáveis do .env valem para as constantes lidas no import dos serviços
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def value_after_import(dotenv_values, expression):
+    """Importa app.main em um processo novo com o .env simulado e avalia `expression`
+
+    O load_dotenv é substituído por um que aplica `dotenv_values`: se algum serviço
+    ler o ambiente antes do load_dotenv do main, o valor do .env não aparece.
+    """
+    code = (
+        "import os, dotenv\n"
+        f"dotenv.load_dotenv = lambda *args, **kwargs: os.environ.update({dotenv_values!r}) or True\n"
+        "import app.main\n"
+        f"print(repr({expression}))\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key not in dotenv_values}
+    completed = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return completed.stdout.strip().splitlines()[-1]
+
+
+def test_analysis_cache_settings_come_from_dotenv():
+    value = value_after_import({"ANALYSIS_CACHE_MEMORY_ITEMS": "7"}, "app.main.analysis_cache.memory_items")
+    assert value == "7"
+
+
+def test_idempotency_key_limit_comes_from_dotenv():
+    value = value_after_import({"IDEMPOTENCY_KEY_MAX_LENGTH": "9"}, "app.main.IDEMPOTENCY_KEY_MAX_LENGTH")
+    assert value == "9"
+
+
+def test_log_format_comes_from_dotenv():
+    expression = "type(__import__('logging').getLogger('glowmetrics').handlers[0].formatter).__name__"
+    value = value_after_import({"LOG_FORMAT": "text", "LOG_LEVEL": "DEBUG"}, expression)
+    assert value == "'TextFormatter'"
+    level = value_after_import({"LOG_LEVEL": "DEBUG"}, "__import__('logging').getLogger('glowmetrics').level")
+    assert level == "10"
@@ -6,7 +6,58 @@ const getApiUrl = () => {
 }
 const API_URL = getApiUrl()
 
-export async function analyzeImages(beforeFile, afterFile, procedures, patientId = null) {
+// Acompanha uma análise enfileirada pelo stream SSE; sem EventSource (ou se a conexão
+// falhar de vez) cai para polling do status
+function waitForAnalysis(jobId, onProgress) {
+  const statusUrl = `${API_URL}/api/analyze/${jobId}`
+
+  const fetchResult = async () => {
+    const response = await fetch(statusUrl)
+    const job = await response.json()
+    if (!response.ok) throw new Error(job.detail || 'Erro na análise')
+    if (job.status === 'failed') throw new Error(job.error_message || 'Erro na análise')
+    return job.status === 'completed' ? job : null
+  }
+
+  const poll = async () => {
+    while (true) {
+      const job = await fetchResult()
+      if (job) return job
+      await new Promise(resolve => setTimeout(resolve, 2000))
+    }
+  }
+
+  if (typeof EventSource === 'undefined') return poll()
+
+  return new Promise((resolve, reject) => {
+    const source = new EventSource(`${statusUrl}/events`)
+    let settled = false
+    const finish = (promise) => {
+      if (settled) return
+      settled = true
+      source.close()
+      promise.then(resolve, reject)
+    }
+
+    const stages = ['queued', 'started', 'download', 'cache_hit', 'preprocess', 'upload',
+      'thread_created', 'message_sent', 'run_created', 'run_status', 'model_request',
+      'model_response', 'repair', 'parse', 'coalesced']
+    stages.forEach(stage => {
+      source.addEventListener(stage, (event) => onProgress?.(JSON.parse(event.data)))
+    })
+    source.addEventListener('completed', () => finish(fetchResult().then(job => job || poll())))
+    source.addEventListener('failed', (event) => {
+      const data = JSON.parse(event.data)
+      finish(Promise.reject(new Error(data.error || 'Erro na análise')))
+    })
+    // O EventSource reconecta sozinho; só desiste quando o navegador fecha a conexão
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) finish(poll())
+    }
+  })
+}
+
+export async function analyzeImages(beforeFile, afterFile, procedures, patientId = null, onProgress = null) {
   // Upload imagens para Supabase Storage primeiro
   const { supabase } = await import('./supabase')
   
@@ -84,8 +135,8 @@ export async function analyzeImages(beforeFile, afterFile, procedures, patientId
     console.error('Erro ao salvar foto depois:', afterPhotoError)
   }
   
-  // Chamar backend para análise
-  const response = await fetch(`${API_URL}/api/analyze`, {
+  // Chamar backend para análise (com onProgress: enfileira e acompanha as etapas via SSE)
+  const response = await fetch(`${API_URL}/api/analyze${onProgress ? '?async=true' : ''}`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({
@@ -100,7 +151,10 @@ export async function analyzeImages(beforeFile, afterFile, procedures, patientId
     throw new Error(error.detail || 'Erro na análise')
   }
   
-  const result = await response.json()
+  let result = await response.json()
+  if (response.status === 202) {
+    result = await waitForAnalysis(result.job_id, onProgress)
+  }
   
   // Retornar também os IDs das fotos para usar na análise
   return {
@@ -110,7 +164,8 @@ export async function analyzeImages(beforeFile, afterFile, procedures, patientId
   }
 }
 
-export async function generatePDF(beforeUrl, afterUrl, analysisResults) {
+// generatedAt: data impressa no PDF; a da análise mantém o mesmo PDF (cache) em novos downloads
+export async function generatePDF(beforeUrl, afterUrl, analysisResults, generatedAt = analysisResults?.analyzed_at) {
   if (!beforeUrl || beforeUrl.trim() === '') {
     throw new Error('URL da foto antes está vazia ao gerar PDF')
   }
@@ -124,7 +179,8 @@ export async function generatePDF(beforeUrl, afterUrl, analysisResults) {
     body: JSON.stringify({
       before_url: beforeUrl,
       after_url: afterUrl,
-      analysis_results: analysisResults
+      analysis_results: analysisResults,
+      generated_at: generatedAt ?? null
     })
   })
   
@@ -18,6 +18,25 @@ const PROCEDURES = [
   'PDRN'
 ]
 
+// Texto do botão para cada etapa do stream de progresso da análise
+const PROGRESS_LABELS = {
+  queued: 'Na fila...',
+  started: 'Iniciando análise...',
+  download: 'Baixando imagens...',
+  cache_hit: 'Resultado encontrado...',
+  coalesced: 'Aguardando análise idêntica em andamento...',
+  preprocess: 'Preparando imagens...',
+  upload: 'Enviando imagens...',
+  thread_created: 'Enviando imagens...',
+  message_sent: 'Aguardando a IA...',
+  run_created: 'Aguardando a IA...',
+  run_status: 'IA analisando...',
+  model_request: 'IA analisando...',
+  model_response: 'Interpretando resultado...',
+  repair: 'Corrigindo resposta da IA...',
+  parse: 'Finalizando...'
+}
+
 export default function AnalysisNew() {
   const [searchParams] = useSearchParams()
   const patientIdParam = searchParams.get('patientId')
@@ -28,6 +47,7 @@ export default function AnalysisNew() {
   const [afterFile, setAfterFile] = useState(null)
   const [procedures, setProcedures] = useState([])
   const [loading, setLoading] = useState(false)
+  const [progress, setProgress] = useState(null)
   const navigate = useNavigate()
 
   const { data: patients } = useQuery({
@@ -98,7 +118,11 @@ export default function AnalysisNew() {
 
       // Analisar imagens
       toast.info('Analisando imagens...')
-      const analysisResult = await analyzeImages(beforeFile, afterFile, procedures, finalPatientId)
+      const analysisResult = await analyzeImages(
+        beforeFile, afterFile, procedures, finalPatientId,
+        (event) => setProgress(PROGRESS_LABELS[event.stage] || null)
+      )
+      setProgress(null)
       
       // Obter URLs das imagens do Supabase Storage para gerar PDF
       // Usar os IDs das fotos que foram retornados pela análise
@@ -204,6 +228,7 @@ export default function AnalysisNew() {
       toast.error(error.message || 'Erro ao processar análise')
     } finally {
       setLoading(false)
+      setProgress(null)
     }
   }
 
@@ -358,7 +383,7 @@ export default function AnalysisNew() {
               disabled={loading}
               className="w-full bg-rose-500 text-white py-3 px-4 rounded-lg font-medium hover:bg-rose-600 transition-colors disabled:opacity-50"
             >
-              {loading ? 'Processando...' : 'Analisar'}
+              {loading ? (progress || 'Processando...') : 'Analisar'}
             </button>
           </form>
           )}